@@ -1,52 +1,480 @@
 import cv2
-import easyocr
+import os
+import threading
+import time
+import src.detector as detector
+import src.metrics as metrics
+import src.ocr_cache as ocr_cache
 import src.utils as utils
-from ultralytics import YOLO  # Import YOLO
 import numpy as np
 
+easyocr = utils.lazy_import('easyocr') # Imported (with torch) when the reader is first created
+
+
+def YOLO(*args, **kwargs):
+    """Creates an Ultralytics YOLO model, importing ultralytics (and torch) only when a model is needed."""
+    from ultralytics import YOLO as UltralyticsYOLO
+    return UltralyticsYOLO(*args, **kwargs)
+
+
+OCR_ROW_GAP = 8 # Blank pixels between stacked plate crops in the batched OCR image
+
+# Per-stage latency histograms, see src/metrics.py
+YOLO_SECONDS = metrics.stage_timer('yolo')
+CROP_SECONDS = metrics.stage_timer('crop')
+OCR_SECONDS = metrics.stage_timer('ocr')
+PLATE_EXTRACTION_SECONDS = metrics.stage_timer('plate_extraction')
+
 class ALPRProcessor:
-    def __init__(self, config): # No db_conn passed here anymore.
+    def __init__(self, config, model=None, reader=None): # No db_conn passed here anymore.
         self.config = config
-        self.model = YOLO('yolov8n.pt')  # Load a pre-trained YOLOv8n model
-        self.reader = easyocr.Reader(['en'])  # Initialize EasyOCR for English
+        # A model and reader can be passed in, e.g. stubs for benchmarking the pipeline itself.
+        # Otherwise they are loaded on first use, or ahead of time by start_warmup()
+        self._model = model
+        self._reader = reader
+        self.load_lock = threading.Lock()
+        self.models_loaded = False
+        self.ready = threading.Event() # Set once the models are loaded and warmed up
+        self.warmup_thread = None
+        # Batched inference settings, frames are sent to YOLO in groups of batch_size
+        self.batch_size = max(1, config.getint('Inference', 'BatchSize', fallback=4))
+        self.max_batch_wait = config.getfloat('Inference', 'MaxBatchWaitMs', fallback=100) / 1000
+        # Batched OCR settings, tight plate crops skip the EasyOCR text detector
+        self.skip_text_detection = config.getboolean('OCR', 'SkipTextDetection', fallback=True)
+        self.plate_aspect_min = config.getfloat('OCR', 'PlateAspectMin', fallback=2.5)
+        self.plate_aspect_max = config.getfloat('OCR', 'PlateAspectMax', fallback=6.0)
+        self.ocr_batch_size = max(1, config.getint('OCR', 'BatchSize', fallback=16))
+        self.ocr_row_height = config.getint('OCR', 'RowHeight', fallback=64)
+        # Crops that need the text detector are resized to one size so they can share a batch
+        self.ocr_detect_size = (config.getint('OCR', 'DetectWidth', fallback=640),
+                                config.getint('OCR', 'DetectHeight', fallback=480))
+        # Near-duplicate crops (parked or queued cars) reuse the previous read, None when disabled
+        self.ocr_cache = ocr_cache.OCRCache.from_config(config)
+        # Detection runs on a downscaled copy, OCR crops still come from the full resolution frame
+        self.detect_width = config.getint('Inference', 'DetectWidth', fallback=0)
+        # Two-stage mode looks for the plate inside each car box before OCR
+        self.two_stage = config.getboolean('Inference', 'TwoStage', fallback=False)
+        self.plate_model_path = config.get('Inference', 'PlateModel', fallback='').strip()
+        self._plate_model = None
+        self.warmup_size = config.getint('Inference', 'ImageSize', fallback=640)
         utils.log_message("Using local YOLOv8 and EasyOCR for license plate detection and recognition.")
 
+    @property
+    def model(self):
+        if self._model is None:
+            self.load_models()
+        return self._model
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self.load_models()
+        return self._reader
+
+    @property
+    def plate_model(self):
+        if not self.models_loaded and self.two_stage and self.plate_model_path:
+            self.load_models()
+        return self._plate_model
+
+    def load_models(self):
+        """Loads the models that were not passed in. Safe to call from several threads, they load once."""
+        with self.load_lock:
+            if self.models_loaded:
+                return
+            start = time.perf_counter()
+            if self._model is None:
+                # The pre-trained YOLOv8n model, run by the backend set in [Inference] Backend
+                self._model = detector.load_detector(self.config, YOLO)
+            if self._reader is None:
+                self._reader = easyocr.Reader(['en'])  # Initialize EasyOCR for English
+            if self.two_stage and self.plate_model_path and self._plate_model is None:
+                self._plate_model = YOLO(self.plate_model_path)
+            self.models_loaded = True
+            utils.log_message(f"Models loaded in {time.perf_counter() - start:.1f}s")
+
+    def warm_up(self):
+        """
+        Loads the models and runs them once on a dummy frame and plate, so lazy
+        initialisation is paid here rather than on the first real frame.
+        """
+        try:
+            self.load_models()
+            start = time.perf_counter()
+            self.model([np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)])
+            dummy_plate = np.full((self.ocr_row_height, self.ocr_row_height * 4, 3), 255, dtype=np.uint8)
+            if self.skip_text_detection:
+                self.recognize_tight_crops([dummy_plate])
+            else:
+                self.read_loose_crops([dummy_plate])
+            utils.log_message(f"Warm-up inference took {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            utils.log_message(f"Error warming up the models: {e}", level="ERROR")
+        finally:
+            self.ready.set() # Frames are processed either way, warm or not
+
+    def start_warmup(self):
+        """Warms the models up in a background thread. The ready event is set when it is done."""
+        if self.ready.is_set() or self.warmup_thread is not None:
+            return None
+        self.warmup_thread = threading.Thread(target=self.warm_up, name='model-warmup', daemon=True)
+        self.warmup_thread.start()
+        return self.warmup_thread
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Blocks until a warm-up started by start_warmup has finished: the models are not
+        thread-safe, real frames must not run them alongside the dummy inference.
+        Returns True at once when no warm-up was started.
+        """
+        if self.warmup_thread is None:
+            return True
+        return self.ready.wait(timeout)
+
+
+    def process_frame(self, frame, db_conn, evidence=None): # db_conn is now passed as argument
+        """
+        Processes a single frame and returns the first detected plate, or None.
+        Every plate in the frame is still written to the database, use process_batch to get them all.
+        """
+        plates = self.process_batch([frame], db_conn, evidence=evidence)[0]
+        return plates[0] if plates else None # Return the first detected plate
+
+    def process_batch(self, frames, db_conn=None, roi=None, evidence=None, timestamps=None):
+        """
+        Processes a list of frames with batched YOLOv8 inference and batched OCR.
+        Returns one list of plate data dicts per frame, in input order, holding every
+        plate read in that frame. Plates are only written to the database when db_conn is given.
+        With an EvidenceStore, their images are written in the background and image_path is
+        filled in afterwards; db_conn must then be a BatchWriter. timestamps are passed on to read_plates.
+        """
+        # 1. License Plate Detection (YOLOv8), one model call per batch
+        coords_per_frame = self.detect(frames, roi)
 
-    def process_frame(self, frame, db_conn): # db_conn is now passed as argument
-        # 1. License Plate Detection (YOLOv8)
-        results = self.model(frame)  # Run YOLOv8 inference
-        license_plate_coords = self.extract_license_plate_coordinates(results)
+        # 2. Crop and OCR (EasyOCR) over every frame of the batch at once
+        plates_per_frame = self.read_plates(frames, coords_per_frame, timestamps=timestamps)
 
-        if license_plate_coords is None:
-            return None  # No plate detected
+        # 3. Data Logging (Database) - Use the passed db_conn
+        if db_conn is not None:
+            for frame, plates in zip(frames, plates_per_frame):
+                for plate_data in plates:
+                    db_id = db_conn.insert_plate_data(plate_data) # Use the passed db_conn to insert
+                    if db_id is not None: # A BatchWriter sets the id itself once the row is written
+                        plate_data['id'] = db_id
+                    if evidence is not None:
+                        evidence.submit(plate_data, frame, on_stored=db_conn.set_image_path)
+        return plates_per_frame
 
-        # 2. Crop and OCR (EasyOCR)
-        for x1, y1, x2, y2 in license_plate_coords:
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-            license_plate_crop = frame[y1:y2, x1:x2]
+    def detect(self, frames, roi=None):
+        """
+        Runs YOLOv8 over the frames in chunks of batch_size, returns the car coordinates per frame
+        in full resolution frame coordinates. Only the region of interest is searched, when given.
+        In two-stage mode the coordinates are those of the plates found inside the cars.
+        """
+        coords_per_frame = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = list(frames[start:start + self.batch_size])
+            inputs, transforms = [], []
+            for frame in chunk:
+                detection_input, transform = self.prepare_detection_input(frame, roi)
+                inputs.append(detection_input)
+                transforms.append(transform)
+            with YOLO_SECONDS.time():
+                results = self.model(inputs)  # Run YOLOv8 inference on the whole chunk
+            for frame, result, (offset_x, offset_y, scale) in zip(chunk, results, transforms):
+                # Map the boxes back from the downscaled region to the full frame
+                coords = [(x1 / scale + offset_x, y1 / scale + offset_y, x2 / scale + offset_x, y2 / scale + offset_y)
+                          for x1, y1, x2, y2 in self.extract_license_plate_coordinates([result])]
+                if self.two_stage:
+                    coords = self.localize_plates(frame, coords)
+                coords_per_frame.append(coords)
+        return coords_per_frame
 
-            # Run EasyOCR on the cropped image
-            ocr_result = self.reader.readtext(license_plate_crop)
+    def prepare_detection_input(self, frame, roi=None):
+        """
+        Cuts the region of interest out of the frame and downscales it to detect_width.
+        Returns the detection input and the (offset_x, offset_y, scale) needed to map boxes back.
+        """
+        offset_x, offset_y = 0, 0
+        if roi is not None:
+            height, width = frame.shape[:2]
+            offset_x, offset_y = int(roi[0] * width), int(roi[1] * height)
+            frame = frame[offset_y:int(roi[3] * height), offset_x:int(roi[2] * width)] # A view, no copy
+        scale = 1.0
+        if self.detect_width and frame.shape[1] > self.detect_width:
+            scale = self.detect_width / float(frame.shape[1])
+            frame = cv2.resize(frame, (self.detect_width, max(1, int(frame.shape[0] * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return frame, (offset_x, offset_y, scale)
 
-            plate_number = self.extract_plate_number(ocr_result) # Extract the plate number
+    def roi_for_source(self, source):
+        """
+        The region of interest configured for a camera index or video file in the [ROI] section,
+        as x1,y1,x2,y2 fractions of the frame. Falls back to the Default entry, None means the whole frame.
+        """
+        source = str(source)
+        keys = [source, os.path.basename(source), 'default']
+        for key in keys:
+            value = self.config.get('ROI', key, fallback='').strip()
+            if value:
+                roi = tuple(float(part) for part in value.split(','))
+                if len(roi) != 4 or not (0 <= roi[0] < roi[2] <= 1 and 0 <= roi[1] < roi[3] <= 1):
+                    raise ValueError(f"Invalid region of interest for {key}: {value}")
+                return roi
+        return None
+
+    def localize_plates(self, frame, car_coords):
+        """
+        Second stage: finds the plate inside each car box, so OCR gets a tight plate crop.
+        Uses the plate model when one is configured, otherwise a contour based localiser.
+        Cars where no plate is found keep their whole box.
+        """
+        car_crops, kept_coords = [], []
+        for car_box in car_coords:
+            crop = self.crop_plates(frame, [car_box])
+            if crop: # Skip boxes that are empty after clipping
+                car_crops.append(crop[0])
+                kept_coords.append(car_box)
+        if self.plate_model is not None and car_crops:
+            plate_boxes = [self.best_model_box(result) for result in self.plate_model(car_crops)]
+        else:
+            plate_boxes = [self.find_plate_contour(crop) for crop in car_crops]
+
+        coords = []
+        for car_box, plate_box in zip(kept_coords, plate_boxes):
+            car_x, car_y = max(0, int(car_box[0])), max(0, int(car_box[1]))
+            if plate_box is None:
+                coords.append(car_box)
+            else:
+                coords.append((car_x + plate_box[0], car_y + plate_box[1], car_x + plate_box[2], car_y + plate_box[3]))
+        return coords
+
+    def best_model_box(self, result):
+        """The most confident box of a plate model result, or None."""
+        boxes = result.boxes.cpu().numpy()
+        if len(boxes) == 0:
+            return None
+        best = max(boxes, key=lambda box: float(box.conf[0]))
+        return tuple(best.xyxy[0])
+
+    def find_plate_contour(self, car_crop):
+        """
+        Classic plate localiser: dark text on a light plate gives strong vertical edges,
+        which are closed into blobs and filtered by plate aspect ratio and size.
+        """
+        grey = cv2.cvtColor(car_crop, cv2.COLOR_BGR2GRAY) if car_crop.ndim == 3 else car_crop
+        height, width = grey.shape[:2]
+        if height < 10 or width < 20:
+            return None
+        blackhat = cv2.morphologyEx(grey, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+        edges = cv2.convertScaleAbs(cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=3))
+        edges = cv2.GaussianBlur(edges, (5, 5), 0)
+        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+        _, mask = cv2.threshold(edges, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        best, best_area = None, 0
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            area = w * h
+            if h == 0 or not self.plate_aspect_min <= w / h <= self.plate_aspect_max:
+                continue
+            if area < 0.002 * width * height or area > 0.25 * width * height:
+                continue # Too small to read, or too large to be a plate
+            if area > best_area:
+                best, best_area = (x, y, x + w, y + h), area
+        return best
+
+    def read_plates(self, frames, coords_per_frame, timestamps=None):
+        """
+        Gathers the crops of all frames and OCRs them together.
+        Returns one list of (not yet persisted) plate data dicts per frame.
+        timestamps gives the detection time (epoch seconds) of each frame, the default is now.
+        """
+        timestamps = timestamps or [None] * len(frames)
+        crops, boxes, owners = [], [], []
+        for frame_index, (frame, coords) in enumerate(zip(frames, coords_per_frame)):
+            frame_crops, frame_boxes = self.crop_plates_with_boxes(frame, coords)
+            crops.extend(frame_crops)
+            boxes.extend(frame_boxes)
+            owners.extend([frame_index] * len(frame_crops))
+
+        plates_per_frame = [[] for _ in frames]
+        for frame_index, box, (plate_number, _) in zip(owners, boxes, self.read_crops(crops, boxes)):
             if not plate_number:
                 continue # If no plate was found, continue to the next detection.
+            plate_data = self.build_plate_data(plate_number, timestamps[frame_index])
+            plate_data['box'] = tuple(int(value) for value in box) # Where the evidence crop is
+            plates_per_frame[frame_index].append(plate_data)
+        return plates_per_frame
 
+    def read_crops(self, crops, boxes):
+        """
+        Returns the (plate_number, confidence) read of every crop. Crops found in the
+        OCR cache skip OCR, the others are OCR'd together and added to the cache.
+        """
+        reads, keys, misses = [None] * len(crops), [None] * len(crops), []
+        for index, (crop, box) in enumerate(zip(crops, boxes)):
+            if self.ocr_cache is not None:
+                keys[index] = self.ocr_cache.key(crop, box)
+                reads[index] = self.ocr_cache.get(keys[index])
+            if reads[index] is None:
+                misses.append(index)
 
-            # 3. Data Logging (Database) - Use the passed db_conn
-            timestamp = utils.get_current_timestamp()
-            plate_data = {
-                'plate_number': plate_number,
-                'image_path': 'N/A',
-                'detection_time': timestamp,
-                'location': 'N/A',
-                'user_id': 'N/A'
-            }
-            db_id = db_conn.insert_plate_data(plate_data) # Use the passed db_conn to insert
-            plate_data['id'] = db_id
-            return plate_data # Return the first detected plate
+        for index, ocr_result in zip(misses, self.ocr_crops([crops[i] for i in misses])):
+            reads[index] = self.extract_plate_read(ocr_result) # Extract the plate number
+            if self.ocr_cache is not None:
+                self.ocr_cache.put(keys[index], reads[index])
+        return reads
 
-        return None # Nothing detected
+    def read_tracked_plates(self, frames, coords_per_frame, frame_indexes, tracker, timestamps=None):
+        """
+        Like read_plates, but boxes are followed across frames by the PlateTracker.
+        Only tracks that still need a read are OCR'd, and each finished track yields one
+        plate, voted from its reads. Returns the finished plates per frame.
+        """
+        # 1. Match boxes to tracks, frame by frame, and pick the crops that need OCR
+        crops, crop_tracks, crop_sources, finished_per_frame = [], [], [], []
+        timestamps = timestamps or [None] * len(frames)
+        for frame, coords, frame_index, detection_ts in zip(frames, coords_per_frame, frame_indexes, timestamps):
+            box_tracks, finished = tracker.update(coords, frame_index)
+            finished_per_frame.append(finished)
+            for box, track in zip(coords, box_tracks):
+                if not tracker.needs_ocr(track):
+                    continue
+                crop = self.crop_plates(frame, [box])
+                if crop:
+                    tracker.request_ocr(track)
+                    crops.append(crop[0])
+                    crop_tracks.append(track)
+                    crop_sources.append((frame, tuple(int(value) for value in box), detection_ts))
+
+        # 2. OCR all selected crops together and add the reads to their tracks
+        for track, source, ocr_result in zip(crop_tracks, crop_sources, self.ocr_crops(crops)):
+            plate_number, confidence = self.extract_plate_read(ocr_result)
+            track.add_read(plate_number, confidence)
+            if plate_number and confidence >= track.best_confidence:
+                track.evidence, track.read_ts = source[:2], source[2] # The best read, kept for the evidence image
+
+        # 3. One plate per finished track
+        return [[self.build_track_plate_data(track) for track in finished if track.voted_plate()]
+                for finished in finished_per_frame]
+
+    def build_track_plate_data(self, track):
+        """Builds the plate record of a finished track from its voted read."""
+        plate_data = self.build_plate_data(track.voted_plate(), track.read_ts)
+        plate_data['track_id'] = track.track_id
+        if track.evidence is not None: # The frame is gone by the time the track finishes, so it travels along
+            plate_data['frame'], plate_data['box'] = track.evidence
+        return plate_data
+
+    def crop_plates(self, frame, license_plate_coords):
+        """Cuts the detected boxes out of the frame, skipping boxes that are empty after clipping."""
+        return self.crop_plates_with_boxes(frame, license_plate_coords)[0]
+
+    def crop_plates_with_boxes(self, frame, license_plate_coords):
+        """Like crop_plates, but also returns the box each crop was cut from."""
+        with CROP_SECONDS.time():
+            height, width = frame.shape[:2]
+            crops, boxes = [], []
+            for box in license_plate_coords:
+                x1, y1, x2, y2 = box
+                x1, y1 = max(0, int(x1)), max(0, int(y1))
+                x2, y2 = min(width, int(x2)), min(height, int(y2))
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                crops.append(frame[y1:y2, x1:x2])
+                boxes.append(box)
+        return crops, boxes
+
+    def ocr_crops(self, crops):
+        """
+        Runs EasyOCR over a list of crops and returns one OCR result list per crop.
+        Crops shaped like a tight plate skip the text detector and are recognised together
+        in one call; other crops go through the text detector together in readtext_batched.
+        """
+        if not crops:
+            return []
+        with OCR_SECONDS.time():
+            return self._ocr_crops(crops)
+
+    def _ocr_crops(self, crops):
+        ocr_results = [[] for _ in crops]
+        tight, loose = [], []
+        for index, crop in enumerate(crops):
+            if self.skip_text_detection and self.is_tight_plate(crop):
+                tight.append(index)
+            else:
+                loose.append(index)
+        for indexes, recognize in ((tight, self.recognize_tight_crops), (loose, self.read_loose_crops)):
+            for start in range(0, len(indexes), self.ocr_batch_size):
+                chunk = indexes[start:start + self.ocr_batch_size]
+                for index, ocr_result in zip(chunk, recognize([crops[i] for i in chunk])):
+                    ocr_results[index] = ocr_result
+        return ocr_results
+
+    def is_tight_plate(self, crop):
+        """True when the crop has the aspect ratio of a plate rather than a whole vehicle."""
+        height, width = crop.shape[:2]
+        return height > 0 and self.plate_aspect_min <= width / height <= self.plate_aspect_max
+
+    def recognize_tight_crops(self, crops):
+        """
+        Stacks the crops as rows of one greyscale image and runs only the EasyOCR
+        recogniser over them, with one box per row.
+        """
+        row_height = self.ocr_row_height
+        row_pitch = row_height + OCR_ROW_GAP
+        rows = []
+        for crop in crops:
+            grey = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+            row_width = max(1, round(grey.shape[1] * row_height / grey.shape[0]))
+            rows.append(cv2.resize(grey, (row_width, row_height)))
+
+        canvas = np.zeros((row_pitch * len(rows), max(row.shape[1] for row in rows)), dtype=np.uint8)
+        horizontal_list = []
+        for index, row in enumerate(rows):
+            top = index * row_pitch
+            canvas[top:top + row_height, :row.shape[1]] = row
+            horizontal_list.append([0, row.shape[1], top, top + row_height])
+
+        ocr_results = [[] for _ in crops]
+        recognized = self.reader.recognize(canvas, horizontal_list=horizontal_list, free_list=[],
+                                           batch_size=self.ocr_batch_size)
+        for bbox, text, prob in recognized:
+            # Map the box back to the row it was read from, and to that row's coordinates
+            index = min(len(crops) - 1, max(0, int(bbox[0][1]) // row_pitch))
+            top = index * row_pitch
+            local_bbox = [[x, y - top] for x, y in bbox]
+            ocr_results[index].append((local_bbox, text, prob))
+        return ocr_results
+
+    def read_loose_crops(self, crops):
+        """
+        Runs full detection and recognition over crops that are not plate shaped, in one
+        readtext_batched call at ocr_detect_size, and scales the boxes back to each crop.
+        """
+        width, height = self.ocr_detect_size
+        batched = self.reader.readtext_batched(crops, n_width=width, n_height=height,
+                                               batch_size=self.ocr_batch_size)
+        ocr_results = []
+        for crop, recognized in zip(crops, batched):
+            scale_x, scale_y = crop.shape[1] / width, crop.shape[0] / height
+            ocr_results.append([([[x * scale_x, y * scale_y] for x, y in bbox], text, prob)
+                                for bbox, text, prob in recognized])
+        return ocr_results
+
+    def build_plate_data(self, plate_number, detection_ts=None):
+        """Builds the record stored in the license_plates table for a plate read at detection_ts, default now."""
+        detection_ts = int(time.time() if detection_ts is None else detection_ts)
+        return {
+            'plate_number': plate_number,
+            'image_path': 'N/A',
+            'detection_time': utils.format_timestamp(detection_ts),
+            'detection_ts': detection_ts,
+            'location': 'N/A',
+            'user_id': 'N/A'
+        }
 
     def extract_license_plate_coordinates(self, results):
         """Extracts bounding box coordinates of detected license plates."""
@@ -65,8 +493,18 @@ class ALPRProcessor:
         Extracts the license plate number from the EasyOCR result.
         Applies filtering and returns the most likely candidate.
         """
+        return self.extract_plate_read(ocr_result)[0]
+
+    def extract_plate_read(self, ocr_result):
+        """Like extract_plate_number, but returns (plate_number, confidence)."""
         if not ocr_result:
-            return None
+            return None, 0.0
+        with PLATE_EXTRACTION_SECONDS.time():
+            best_candidate, highest_confidence = self._best_plate_candidate(ocr_result)
+        utils.log_message(f"Extracted text: {best_candidate}, confidence = {highest_confidence}")
+        return best_candidate, highest_confidence
+
+    def _best_plate_candidate(self, ocr_result):
 
         best_candidate = ""
         highest_confidence = 0.0
@@ -83,5 +521,4 @@ class ALPRProcessor:
                 if prob > highest_confidence:
                     best_candidate = text
                     highest_confidence = prob
-        utils.log_message(f"Extracted text: {best_candidate}, confidence = {highest_confidence}")
-        return best_candidate
\ No newline at end of file
+        return best_candidate, highest_confidence
@@ -0,0 +1,107 @@
+import argparse
+import datetime
+import os
+import src.database as db
+import src.utils as utils
+
+ARCHIVE_COLUMNS = (('id', 'int64'), ('plate_number', 'string'), ('image_path', 'string'),
+                   ('detection_time', 'string'), ('location', 'string'), ('user_id', 'string'),
+                   ('detection_ts', 'int64'))
+
+
+def import_parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow, install it with 'pip install pyarrow'") from e
+    return pyarrow, pyarrow.parquet
+
+
+def archive_path(directory, table):
+    """A free path for the archive of table: <table>.parquet, or <table>-2.parquet etc. when that exists."""
+    path = os.path.join(directory, f"{table}.parquet")
+    copy = 1
+    while os.path.exists(path):
+        copy += 1
+        path = os.path.join(directory, f"{table}-{copy}.parquet")
+    return path
+
+
+def export_table(db_conn, table, directory, batch_rows=50000, compression='zstd'):
+    """
+    Streams a plate table into <directory>/<table>.parquet, batch_rows rows at a time, so
+    memory stays flat however large the table is. An existing archive is never overwritten,
+    the table goes to a new numbered file next to it. Returns the path of the file.
+    """
+    pa, pq = import_parquet()
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in ARCHIVE_COLUMNS])
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, table)
+    temp_path = path + '.tmp'
+    cursor = db_conn.conn.execute(f"SELECT {', '.join(name for name, _ in ARCHIVE_COLUMNS)} FROM {table} "
+                                  f"ORDER BY detection_ts, id")
+    rows_written = 0
+    with pq.ParquetWriter(temp_path, schema, compression=compression) as writer:
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(column, type=field.type)
+                                                for column, field in zip(columns, schema)], schema=schema))
+            rows_written += len(rows)
+    os.replace(temp_path, path) # A half written export never looks complete
+    utils.log_message(f"Exported {rows_written} rows of {table} to {path}")
+    return path
+
+
+def export_partitions(db_conn, directory, before_day, compression='zstd', skip_archived=True):
+    """
+    Exports every day partition older than before_day, returns the paths of the new files.
+    With skip_archived, partitions that already have an archive are left out.
+    """
+    paths = []
+    for table in db_conn.plate_tables():
+        day = db.partition_day(table)
+        if day is None or day >= before_day:
+            continue
+        if skip_archived and os.path.exists(os.path.join(directory, f"{table}.parquet")):
+            continue # Archived by an earlier run
+        paths.append(export_table(db_conn, table, directory, compression=compression))
+    return paths
+
+
+def archiver(directory, compression='zstd'):
+    """A DatabaseConnection before_drop hook that exports each partition before it is dropped."""
+    def archive_table(db_conn, table):
+        if db_conn.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None:
+            return # Nothing to archive
+        export_table(db_conn, table, directory, compression=compression)
+    return archive_table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export old day partitions of the plate database to Parquet.")
+    parser.add_argument('--out', required=True, help="Directory for the .parquet files")
+    parser.add_argument('--older-than', type=int, default=1, metavar='DAYS',
+                        help="Export the partitions of days at least this many days ago")
+    parser.add_argument('--compression', default='zstd', help="Parquet codec: zstd, snappy, gzip or none")
+    parser.add_argument('--drop', action='store_true', help="Drop each partition once it has been exported")
+    args = parser.parse_args()
+
+    db_conn = db.connect_to_db()
+    try:
+        before_day = datetime.date.today() - datetime.timedelta(days=args.older_than - 1)
+        # Partitions about to be dropped are exported again, rows may have been added since an earlier export
+        for path in export_partitions(db_conn, args.out, before_day, args.compression,
+                                      skip_archived=not args.drop):
+            print(path)
+        if args.drop:
+            for table in db_conn.plate_tables():
+                day = db.partition_day(table)
+                if day is not None and day < before_day:
+                    db_conn.drop_partition(table)
+                    print(f"Dropped {table}")
+    finally:
+        db_conn.close()
@@ -0,0 +1,277 @@
+import argparse
+import configparser
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+import src.database as db
+import src.utils as utils
+import src.video as video
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+STAGES = ('decode', 'detect', 'ocr', 'db_insert')
+
+
+class StubBox:
+    def __init__(self, box, cls=2, conf=0.9):
+        self.xyxy = [np.array(box, dtype=np.float32)]
+        self.cls = [cls]
+        self.conf = [conf]
+
+
+class StubBoxes:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.boxes
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class StubResult:
+    names = {2: 'car'}
+
+    def __init__(self, boxes):
+        self.boxes = StubBoxes(boxes)
+
+
+class StubYOLO:
+    """Stands in for YOLO: reports one car in the lower middle of every frame, in no time."""
+    def __call__(self, frames, **kwargs):
+        results = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            results.append(StubResult([StubBox((width * 0.3, height * 0.55, width * 0.7, height * 0.9))]))
+        return results
+
+
+class StubReader:
+    """Stands in for easyocr.Reader: reads the same plate from every crop."""
+    def readtext(self, image, **kwargs):
+        height, width = image.shape[:2]
+        return [([[0, 0], [width, 0], [width, height], [0, height]], "BENCH123", 0.9)]
+
+    def readtext_batched(self, images, n_width=None, n_height=None, **kwargs):
+        return [[([[0, 0], [n_width, 0], [n_width, n_height], [0, n_height]], "BENCH123", 0.9)]
+                for _ in images]
+
+    def recognize(self, image, horizontal_list=None, free_list=None, **kwargs):
+        return [([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], "BENCH123", 0.9)
+                for x1, x2, y1, y2 in horizontal_list or []]
+
+
+def synthetic_frames(count, width=1280, height=720, seed=0):
+    """Reproducible frames with a plate-like box driving across a noisy background."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for index in range(count):
+        frame = background.copy()
+        x = int((index * 7) % max(1, width - 240))
+        y = int(height * 0.7)
+        frame[y:y + 50, x:x + 200] = 255
+        cv2.putText(frame, f"AB{index % 1000:03d}CD", (x + 8, y + 38), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 0, 0), 2)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(path, limit):
+    """Frames from a video file, or from the images in a directory, with the decode time of each."""
+    frames, decode_times = [], []
+    if os.path.isdir(path):
+        for image_path in sorted(glob.glob(os.path.join(path, '*')))[:limit]:
+            if not image_path.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            start = time.perf_counter()
+            image = cv2.imread(image_path)
+            decode_times.append(time.perf_counter() - start)
+            if image is not None:
+                frames.append(image)
+        return frames, decode_times
+
+    start = time.perf_counter()
+    for _, frame in video.read_frames(path):
+        decode_times.append(time.perf_counter() - start)
+        frames.append(frame)
+        if len(frames) >= limit:
+            break
+        start = time.perf_counter()
+    return frames, decode_times
+
+
+def percentiles(samples):
+    """p50/p95/p99 and mean of a list of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples) * 1000.0
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process; ru_maxrss is in KB on Linux and bytes on macOS."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0, 1)
+
+
+def make_processor(bench_config, stub):
+    import src.alpr as alpr
+    if stub:
+        return alpr.ALPRProcessor(bench_config, model=StubYOLO(), reader=StubReader())
+    return alpr.ALPRProcessor(bench_config)
+
+
+def run_pipeline_benchmark(processor, frames, db_path, warmup=2):
+    """Runs the frames through detection, OCR and database inserts batch by batch, timing every stage."""
+    timings = {stage: [] for stage in STAGES if stage != 'decode'}
+    frame_latencies = []
+    db_conn = db.DatabaseConnection(db_path).connect()
+    try:
+        for frame in frames[:warmup]: # Let lazy initialisation happen outside the measurement
+            processor.read_plates([frame], processor.detect([frame]))
+
+        plates_found = 0
+        start = time.perf_counter()
+        for batch_start in range(0, len(frames), processor.batch_size):
+            batch = frames[batch_start:batch_start + processor.batch_size]
+            t0 = time.perf_counter()
+            coords_per_frame = processor.detect(batch)
+            t1 = time.perf_counter()
+            plates_per_frame = processor.read_plates(batch, coords_per_frame)
+            t2 = time.perf_counter()
+            plates = [plate for plates in plates_per_frame for plate in plates]
+            db_conn.insert_many(plates)
+            t3 = time.perf_counter()
+            timings['detect'].append(t1 - t0)
+            timings['ocr'].append(t2 - t1)
+            timings['db_insert'].append(t3 - t2)
+            frame_latencies.extend([(t3 - t0)] * len(batch)) # Every frame of a batch waits for the whole batch
+            plates_found += len(plates)
+        elapsed = time.perf_counter() - start
+    finally:
+        db_conn.close()
+
+    return {
+        'frames': len(frames),
+        'plates': plates_found,
+        'elapsed_s': round(elapsed, 3),
+        'frames_per_sec': round(len(frames) / elapsed, 2) if elapsed else None,
+        'frame_latency': percentiles(frame_latencies),
+        'stages_per_batch': {stage: percentiles(samples) for stage, samples in timings.items()},
+    }
+
+
+def run_db_benchmark(db_path, rows, batch_size):
+    """Inserts per second, row by row with a commit each, and through the BatchWriter."""
+    plates = [{'plate_number': f"DB{index:06d}", 'image_path': 'N/A',
+               'detection_time': utils.get_current_timestamp()} for index in range(rows)]
+    results = {}
+
+    db_conn = db.DatabaseConnection(db_path).connect()
+    start = time.perf_counter()
+    for plate in plates:
+        db_conn.insert_plate_data(dict(plate))
+    elapsed = time.perf_counter() - start
+    db_conn.close()
+    results['single_inserts_per_sec'] = round(rows / elapsed, 1)
+
+    writer = db.BatchWriter(db_path, batch_size=batch_size, flush_interval=1.0).start()
+    start = time.perf_counter()
+    for plate in plates:
+        writer.insert_plate_data(dict(plate))
+    writer.close()
+    elapsed = time.perf_counter() - start
+    results['batched_inserts_per_sec'] = round(rows / elapsed, 1)
+    return results
+
+
+def compare(current, baseline, tolerance=0.10):
+    """Lists the throughput and latency figures that got worse than the baseline by more than tolerance."""
+    regressions = []
+    checks = [('pipeline', 'frames_per_sec', True), ('db', 'single_inserts_per_sec', True),
+              ('db', 'batched_inserts_per_sec', True)]
+    for section, key, higher_is_better in checks:
+        new, old = current.get(section, {}).get(key), baseline.get(section, {}).get(key)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{section}.{key}: {old} -> {new} ({change:+.1%})")
+    new_p95 = current.get('pipeline', {}).get('frame_latency', {}).get('p95_ms')
+    old_p95 = baseline.get('pipeline', {}).get('frame_latency', {}).get('p95_ms')
+    if new_p95 and old_p95 and (new_p95 - old_p95) / old_p95 > tolerance:
+        regressions.append(f"pipeline.frame_latency.p95_ms: {old_p95} -> {new_p95}")
+    return regressions
+
+
+def run(frames_source=None, frame_count=100, stub=False, db_rows=2000, seed=0, bench_config=None):
+    """Runs the whole benchmark and returns the report as a dict."""
+    bench_config = bench_config or config
+    if frames_source:
+        frames, decode_times = recorded_frames(frames_source, frame_count)
+    else:
+        frames, decode_times = synthetic_frames(frame_count, seed=seed), []
+
+    processor = make_processor(bench_config, stub)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pipeline_report = run_pipeline_benchmark(processor, frames, os.path.join(temp_dir, 'pipeline.db'))
+        pipeline_report['decode'] = percentiles(decode_times)
+        db_report = run_db_benchmark(os.path.join(temp_dir, 'inserts.db'), db_rows,
+                                     bench_config.getint('Database', 'WriteBatchSize', fallback=100))
+
+    return {
+        'created': utils.get_current_timestamp(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(), 'opencv': cv2.__version__},
+        'settings': {'frames_source': frames_source or 'synthetic', 'frame_count': len(frames),
+                     'frame_shape': list(frames[0].shape) if frames else None, 'stub_models': stub,
+                     'batch_size': processor.batch_size, 'seed': seed, 'db_rows': db_rows},
+        'pipeline': pipeline_report,
+        'db': db_report,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the VisionGuard ALPR pipeline.")
+    parser.add_argument('--frames', help="Video file or image directory, synthetic frames are used when omitted")
+    parser.add_argument('--count', type=int, default=100, help="Number of frames to process")
+    parser.add_argument('--stub', action='store_true', help="Replace YOLO and EasyOCR with instant stubs")
+    parser.add_argument('--db-rows', type=int, default=2000, help="Rows for the database insert benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_output.json', help="Where to write the JSON report")
+    parser.add_argument('--compare', help="Earlier JSON report to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    report = run(args.frames, args.count, args.stub, args.db_rows, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
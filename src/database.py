@@ -1,4 +1,9 @@
 import sqlite3
+import datetime
+import queue
+import threading
+import time
+import src.metrics as metrics
 import src.utils as utils
 import configparser
 
@@ -6,59 +11,447 @@ import configparser
 config = configparser.ConfigParser()
 config.read('config.ini')
 
+SCHEMA_VERSION = 1
+
+PARTITIONINGS = ('none', 'day')
+PLATES_TABLE = 'license_plates' # Unpartitioned table, also holds the rows from before partitioning was enabled
+PARTITION_PREFIX = 'license_plates_'
+PARTITION_ID_SPAN = 10 ** 9 # Ids of a day partition start at its day number * span, so an id names its table
+EPOCH_DAY = datetime.date(1970, 1, 1)
+
+CREATE_PLATES_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plate_number TEXT NOT NULL,
+        image_path TEXT,
+        detection_time TEXT NOT NULL,
+        location TEXT,
+        user_id TEXT,
+        detection_ts INTEGER
+    )
+'''
+
+INSERT_PLATE_SQL = '''
+    INSERT INTO {table} (plate_number, image_path, detection_time, location, user_id, detection_ts)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_IMAGE_PATH_SQL = "UPDATE {table} SET image_path = ? WHERE id = ?"
+
+
+DB_INSERT_SECONDS = metrics.stage_timer('db_insert')
+ROWS_INSERTED = metrics.registry.counter('db_rows_inserted_total', "Rows written to license_plates.")
+
+
+def plate_row(plate_data):
+    """Column values of a plate record, detection_ts is derived from detection_time when missing."""
+    detection_ts = plate_data.get('detection_ts')
+    if detection_ts is None:
+        detection_ts = utils.parse_timestamp(plate_data['detection_time'])
+    return (plate_data['plate_number'], plate_data['image_path'], plate_data['detection_time'],
+            plate_data.get('location'), plate_data.get('user_id'), int(detection_ts))
+
+
+def partition_name(day):
+    """The partition table holding the plates detected on a local calendar day."""
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(table):
+    """The day of a partition table, None for any other table."""
+    suffix = table[len(PARTITION_PREFIX):]
+    if not table.startswith(PARTITION_PREFIX) or len(suffix) != 8 or not suffix.isdigit():
+        return None
+    return datetime.datetime.strptime(suffix, '%Y%m%d').date()
+
+
+def table_for_id(db_id):
+    """The table a row id was assigned in."""
+    if db_id < PARTITION_ID_SPAN:
+        return PLATES_TABLE
+    return partition_name(EPOCH_DAY + datetime.timedelta(days=db_id // PARTITION_ID_SPAN))
+
+
 class DatabaseConnection:
-    def __init__(self, db_path):
+    """
+    With partitioning='day', plates are written to one table per local day
+    (license_plates_YYYYMMDD), so the live table and its indexes stay small however
+    much history is kept, and retention drops whole tables instead of deleting rows.
+    Partitions older than retention_days are dropped when a new day starts; before_drop
+    (db_conn, table) is called first and can archive the table, if it raises the table is kept.
+    """
+    def __init__(self, db_path, partitioning='none', retention_days=0, before_drop=None):
+        if partitioning not in PARTITIONINGS:
+            raise ValueError(f"Unknown partitioning: {partitioning}")
         self.db_path = db_path
+        self.partitioning = partitioning
+        self.retention_days = retention_days
+        self.before_drop = before_drop
         self.conn = None
+        self.partitions = set() # Partition tables known to exist
 
     def connect(self):
         try:
             self.conn = sqlite3.connect(self.db_path)
+            self.apply_pragmas()
             self.create_tables()
+            self.partitions = set(self.plate_tables()[1:])
+            self.apply_retention()
             utils.log_message(f"Successfully connected to database at {self.db_path}")
             return self
         except sqlite3.Error as e:
             utils.log_message(f"Error connecting to database: {e}", level="ERROR")
             raise
 
+    def apply_pragmas(self):
+        """WAL lets readers work while the writer commits, NORMAL sync only fsyncs at checkpoints."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"PRAGMA journal_mode={config.get('Database', 'JournalMode', fallback='WAL')}")
+        cursor.execute(f"PRAGMA synchronous={config.get('Database', 'Synchronous', fallback='NORMAL')}")
+        cursor.execute(f"PRAGMA busy_timeout={config.getint('Database', 'BusyTimeoutMs', fallback=5000)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+
     def create_tables(self):
         try:
             cursor = self.conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS license_plates (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    plate_number TEXT NOT NULL,
-                    image_path TEXT,
-                    detection_time TEXT NOT NULL,
-                    location TEXT,
-                    user_id TEXT
-                )
-            ''')
+            cursor.execute(CREATE_PLATES_SQL.format(table=PLATES_TABLE))
             self.conn.commit()
+            self.migrate()
         except sqlite3.Error as e:
             utils.log_message(f"Error creating tables: {e}", level="ERROR")
             raise
 
+    def migrate(self):
+        """
+        Brings an existing database up to SCHEMA_VERSION, tracked in PRAGMA user_version.
+        Version 1 adds the integer detection_ts column (epoch seconds), fills it from
+        detection_time and creates the lookup and time-range indexes.
+        """
+        cursor = self.conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.conn:
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(license_plates)")]
+            if 'detection_ts' not in columns:
+                cursor.execute("ALTER TABLE license_plates ADD COLUMN detection_ts INTEGER")
+            # detection_time is local time, the 'utc' modifier converts it to epoch seconds
+            cursor.execute('''
+                UPDATE license_plates SET detection_ts = CAST(strftime('%s', detection_time, 'utc') AS INTEGER)
+                WHERE detection_ts IS NULL
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_license_plates_plate "
+                           "ON license_plates (plate_number, detection_ts)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_license_plates_ts ON license_plates (detection_ts)")
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        utils.log_message(f"Migrated database at {self.db_path} from schema version {version} to {SCHEMA_VERSION}")
+
+    def plate_tables(self):
+        """license_plates followed by the day partitions, oldest first."""
+        names = [row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?", (PARTITION_PREFIX + '%',))]
+        return [PLATES_TABLE] + sorted(name for name in names if partition_day(name))
+
+    def table_for(self, detection_ts):
+        """
+        The table a plate detected at detection_ts is written to, None when the plate is older
+        than retention: its partition would only be dropped again, archived empty, straight away.
+        """
+        if self.partitioning == 'none':
+            return PLATES_TABLE
+        day = datetime.date.fromtimestamp(detection_ts)
+        cutoff = self.retention_cutoff()
+        if cutoff and day < cutoff:
+            return None
+        return partition_name(day)
+
+    def ensure_table(self, table):
+        """Creates a day partition when its first row is written."""
+        if table != PLATES_TABLE and table not in self.partitions:
+            self.create_partition(partition_day(table))
+            self.apply_retention() # A new day has started
+
+    def create_partition(self, day):
+        table = partition_name(day)
+        with self.conn:
+            self.conn.execute(CREATE_PLATES_SQL.format(table=table))
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_plate ON {table} (plate_number, detection_ts)")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (detection_ts)")
+            # AUTOINCREMENT continues from sqlite_sequence, starting the ids in the day's own range
+            self.conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                              "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                              (table, (day - EPOCH_DAY).days * PARTITION_ID_SPAN, table))
+        self.partitions.add(table)
+        utils.log_message(f"Created partition {table}")
+
+    def retention_cutoff(self, today=None):
+        """The oldest day that is kept, None when nothing is ever dropped."""
+        if self.partitioning == 'none' or self.retention_days <= 0:
+            return None
+        return (today or datetime.date.today()) - datetime.timedelta(days=self.retention_days)
+
+    def apply_retention(self, today=None):
+        """Drops the day partitions older than retention_days, returns the dropped tables."""
+        cutoff = self.retention_cutoff(today)
+        if cutoff is None:
+            return []
+        dropped = []
+        for table in self.plate_tables():
+            day = partition_day(table)
+            if day is None or day >= cutoff:
+                continue
+            if self.before_drop:
+                try:
+                    self.before_drop(self, table)
+                except Exception as e:
+                    utils.log_message(f"Keeping partition {table}, it could not be archived: {e}", level="ERROR")
+                    continue
+            self.drop_partition(table)
+            dropped.append(table)
+            utils.log_message(f"Dropped partition {table} after {self.retention_days} days retention")
+        return dropped
+
+    def drop_partition(self, table):
+        """Drops a whole day partition, far cheaper than deleting its rows."""
+        if partition_day(table) is None:
+            raise ValueError(f"Not a partition table: {table}")
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self.partitions.discard(table)
+
     def insert_plate_data(self, plate_data):
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO license_plates (plate_number, image_path, detection_time, location, user_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (plate_data['plate_number'], plate_data['image_path'], plate_data['detection_time'],
-                  plate_data.get('location'), plate_data.get('user_id')))
-            self.conn.commit()
+            row = plate_row(plate_data)
+            table = self.table_for(row[-1])
+            if table is None:
+                utils.log_message(f"Skipping plate {row[0]}, detected before the {self.retention_days} day "
+                                  f"retention cutoff", level="WARNING")
+                return None
+            self.ensure_table(table)
+            with DB_INSERT_SECONDS.time():
+                cursor = self.conn.cursor()
+                cursor.execute(INSERT_PLATE_SQL.format(table=table), row)
+                self.conn.commit()
+            ROWS_INSERTED.inc()
             return cursor.lastrowid
         except sqlite3.Error as e:
             utils.log_message(f"Error inserting data: {e}", level="ERROR")
             raise
 
+    def insert_many(self, plate_data_list):
+        """
+        Inserts several plates with executemany, one transaction per table, sets their 'id' and
+        returns the ids. Plates that are not written, having bad data, being older than retention
+        or in a table that failed, get None and do not hold back the rows of the other tables.
+        """
+        if not plate_data_list:
+            return []
+        rows, rows_by_table = [None] * len(plate_data_list), {}
+        for index, plate_data in enumerate(plate_data_list):
+            try:
+                rows[index] = plate_row(plate_data)
+            except (KeyError, TypeError, ValueError) as e: # Missing fields or a detection_time in another format
+                utils.log_message(f"Dropping plate with bad data {plate_data!r}: {e!r}", level="ERROR")
+                continue
+            rows_by_table.setdefault(self.table_for(rows[index][-1]), []).append(index)
+        expired = rows_by_table.pop(None, [])
+        if expired:
+            utils.log_message(f"Skipping {len(expired)} plates detected before the {self.retention_days} day "
+                              f"retention cutoff", level="WARNING")
+        ids = [None] * len(rows)
+        with DB_INSERT_SECONDS.time():
+            for table, indexes in rows_by_table.items():
+                try:
+                    self.ensure_table(table)
+                    with self.conn:
+                        cursor = self.conn.cursor()
+                        cursor.executemany(INSERT_PLATE_SQL.format(table=table), [rows[index] for index in indexes])
+                        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                except sqlite3.Error as e:
+                    utils.log_message(f"Dropping {len(indexes)} rows for {table} after write error: {e}",
+                                      level="ERROR")
+                    continue
+                # Written by one connection in one transaction, so the ids of a table are consecutive
+                for offset, index in enumerate(indexes, last_id - len(indexes) + 1):
+                    ids[index] = offset
+        written = 0
+        for plate_data, db_id in zip(plate_data_list, ids):
+            if db_id is not None:
+                plate_data['id'] = db_id
+                written += 1
+        ROWS_INSERTED.inc(written)
+        return ids
+
+    def update_image_paths(self, updates):
+        """Sets image_path for a list of (image_path, id) pairs in one transaction."""
+        if not updates:
+            return
+        updates_by_table = {}
+        for image_path, db_id in updates:
+            updates_by_table.setdefault(table_for_id(db_id), []).append((image_path, db_id))
+        try:
+            with self.conn:
+                for table, table_updates in updates_by_table.items():
+                    self.conn.executemany(UPDATE_IMAGE_PATH_SQL.format(table=table), table_updates)
+        except sqlite3.Error as e:
+            utils.log_message(f"Error updating image paths: {e}", level="ERROR")
+            raise
+
     def close(self):
       if self.conn:
           self.conn.close()
           utils.log_message("Database connection closed.")
 
 
+def connection_options(db_config=None):
+    """DatabaseConnection keyword arguments from the [Database] section."""
+    db_config = db_config or config
+    options = {'partitioning': db_config.get('Database', 'Partitioning', fallback='none'),
+               'retention_days': db_config.getint('Database', 'RetentionDays', fallback=0)}
+    archive_dir = db_config.get('Database', 'ArchiveDir', fallback='')
+    if archive_dir: # Partitions are exported to Parquet before retention drops them
+        import src.archive as archive
+        options['before_drop'] = archive.archiver(archive_dir)
+    return options
+
+
 def connect_to_db():
-    db_connection = DatabaseConnection(config['Database']['DatabasePath'])
-    return db_connection.connect()
\ No newline at end of file
+    db_connection = DatabaseConnection(config['Database']['DatabasePath'], **connection_options())
+    return db_connection.connect()
+
+
+class BatchWriter:
+    """
+    Long-lived database writer. Inserts are queued and written by one thread on one
+    connection, with executemany in a single transaction once batch_size rows are
+    pending or flush_interval seconds have passed since the first pending row.
+    insert_plate_data returns None; the 'id' of a plate is set once it is written.
+    set_image_path queues an image_path update, written after the plate's own insert.
+    A batch that cannot be written is logged and dropped, the writer keeps running;
+    should the thread still die, insert_plate_data and flush raise RuntimeError.
+    """
+    _STOP = object()
+
+    def __init__(self, db_path, batch_size=100, flush_interval=0.5, **connection_options):
+        self.db_path = db_path
+        self.connection_options = connection_options # Passed on to DatabaseConnection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.rows_written = 0
+        self.flushes = 0
+
+    def start(self):
+        """Starts the writer thread and waits until its connection is open."""
+        metrics.registry.gauge('queue_depth', queue='db_writer').set_function(self.queue.qsize)
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error:
+            raise self.error
+        return self
+
+    def insert_plate_data(self, plate_data):
+        self._check_running()
+        self.queue.put(plate_data)
+        return None # The id is only known once the batch is written
+
+    def set_image_path(self, plate_data, image_path):
+        """Thread-safe, fills in image_path of a plate queued earlier with insert_plate_data."""
+        self.queue.put((plate_data, image_path))
+
+    def flush(self, timeout=None):
+        """Writes everything queued so far and waits until it is committed, returns False on timeout."""
+        self._check_running()
+        done = threading.Event()
+        self.queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(0.2):
+            self._check_running() # Nobody would ever set done
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def _check_running(self):
+        thread = self.thread
+        if thread is None or not thread.is_alive():
+            reason = f": {self.error}" if self.error else ""
+            raise RuntimeError(f"The database writer is not running{reason}")
+
+    def close(self):
+        """Writes the pending rows and closes the connection."""
+        if self.thread is None:
+            return
+        self.queue.put(self._STOP)
+        self.thread.join()
+        self.thread = None
+
+    def _run(self):
+        try:
+            db_conn = DatabaseConnection(self.db_path, **self.connection_options).connect()
+        except (sqlite3.Error, ValueError) as e: # ValueError: bad connection options
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+
+        batch, updates, deadline = [], [], None
+        try:
+            while True:
+                pending = len(batch) + len(updates)
+                timeout = None if not pending else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty: # Flush timer fired
+                    batch, updates = self._write(db_conn, batch, updates)
+                    continue
+                if item is self._STOP:
+                    break
+                if isinstance(item, threading.Event): # Explicit flush request
+                    batch, updates = self._write(db_conn, batch, updates)
+                    item.set()
+                    continue
+                if isinstance(item, tuple): # (plate_data, image_path) from set_image_path
+                    updates.append(item)
+                else:
+                    batch.append(item)
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) + len(updates) >= self.batch_size:
+                    batch, updates = self._write(db_conn, batch, updates)
+        except Exception as e:
+            self.error = e
+            utils.log_message(f"Database writer stopped: {e}", level="CRITICAL")
+            raise
+        finally:
+            self._write(db_conn, batch, updates) # Pending rows are written before shutting down
+            db_conn.close()
+
+    def _write(self, db_conn, batch, updates=()):
+        if batch:
+            try:
+                ids = db_conn.insert_many(batch)
+                self.rows_written += sum(db_id is not None for db_id in ids)
+                self.flushes += 1
+            except Exception as e: # A bad batch must not stop the writer thread
+                utils.log_message(f"Dropping {len(batch)} rows after write error: {e!r}", level="ERROR")
+        if updates:
+            try:
+                # Inserts were queued before their updates, so the plates have their ids by now
+                pairs = [(image_path, plate_data['id']) for plate_data, image_path in updates if 'id' in plate_data]
+                db_conn.update_image_paths(pairs)
+            except Exception as e:
+                utils.log_message(f"Dropping {len(updates)} image paths after write error: {e!r}", level="ERROR")
+        return [], []
+
+
+def start_batch_writer():
+    """Starts a BatchWriter on the configured database."""
+    writer = BatchWriter(config['Database']['DatabasePath'],
+                         batch_size=config.getint('Database', 'WriteBatchSize', fallback=100),
+                         flush_interval=config.getint('Database', 'FlushIntervalMs', fallback=500) / 1000,
+                         **connection_options())
+    return writer.start()
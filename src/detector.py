@@ -0,0 +1,153 @@
+import argparse
+import configparser
+import hashlib
+import os
+import shutil
+import src.tracking as tracking
+import src.utils as utils
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+# Ultralytics export format and the suffix of the artifact it writes, per backend
+EXPORT_FORMATS = {'onnx': ('onnx', '.onnx'), 'openvino': ('openvino', '_openvino_model')}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Short sha256 of a file, so a changed model never loads a stale export."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as model_file:
+        for chunk in iter(lambda: model_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(cache_dir, model_path, model_hash, backend, image_size, int8):
+    """
+    Cache location of an export, keyed by model hash, input size, backend and precision.
+    OpenVINO exports are directories, Ultralytics only loads them when the name ends in _openvino_model.
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = EXPORT_FORMATS[backend][1]
+    precision = 'int8' if int8 else 'fp32'
+    return os.path.join(cache_dir, f"{stem}-{model_hash}-{image_size}-{precision}{suffix}")
+
+
+def export_model(yolo_class, model_path, backend, image_size=640, int8=False, cache_dir='data/models',
+                 int8_data=None):
+    """
+    Returns the path of the exported model, exporting it on the first call only.
+    Later calls, and later starts of the application, load the cached artifact.
+    """
+    if backend not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    model = None
+    if not os.path.exists(model_path): # e.g. 'yolov8n.pt', which Ultralytics downloads on first use
+        model = yolo_class(model_path)
+        model_path = str(model.ckpt_path or model_path)
+    target = artifact_path(cache_dir, model_path, file_hash(model_path), backend, image_size, int8)
+    if os.path.exists(target):
+        return target
+
+    utils.log_message(f"Exporting {model_path} to {backend} ({'INT8' if int8 else 'FP32'}, {image_size}px), "
+                      f"this only happens once.")
+    model = model or yolo_class(model_path)
+    export_format = EXPORT_FORMATS[backend][0]
+    export_args = {'format': export_format, 'imgsz': image_size, 'dynamic': True} # Dynamic batch size
+    if int8 and backend == 'openvino':
+        export_args.update(int8=True, data=int8_data or 'coco8.yaml') # Calibration images for quantisation
+    exported = model.export(**export_args)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if int8 and backend == 'onnx':
+        quantize_onnx(exported, target)
+        os.remove(exported)
+    else:
+        shutil.move(exported, target)
+    utils.log_message(f"Cached exported model at {target}")
+    return target
+
+
+def quantize_onnx(source_path, target_path):
+    """Dynamic INT8 quantisation of the ONNX weights, needs onnxruntime."""
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise RuntimeError("INT8 ONNX models need onnxruntime, install it with 'pip install onnxruntime'") from e
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+
+
+def load_detector(detector_config, yolo_class):
+    """
+    Loads the car detector for the backend set in [Inference] Backend.
+    Exported ONNX and OpenVINO models are loaded through Ultralytics too, so every backend
+    is called the same way and returns the same results. When the export or its runtime
+    is not available the PyTorch model is used instead.
+    """
+    model_path = detector_config.get('Inference', 'Model', fallback='yolov8n.pt')
+    backend = detector_config.get('Inference', 'Backend', fallback='pytorch').strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    if backend == 'pytorch':
+        return yolo_class(model_path)
+
+    try:
+        path = export_model(yolo_class, model_path, backend,
+                            image_size=detector_config.getint('Inference', 'ImageSize', fallback=640),
+                            int8=detector_config.getboolean('Inference', 'Int8', fallback=False),
+                            cache_dir=detector_config.get('Inference', 'ModelCacheDir', fallback='data/models'),
+                            int8_data=detector_config.get('Inference', 'Int8CalibrationData', fallback='') or None)
+        return yolo_class(path, task='detect')
+    except Exception as e:
+        utils.log_message(f"Could not load the {backend} detector, falling back to PyTorch: {e}", level="ERROR")
+        return yolo_class(model_path)
+
+
+def car_boxes(result, min_confidence=0.0):
+    """The car boxes of one detection result."""
+    boxes = []
+    for box in result.boxes.cpu().numpy():
+        if result.names[int(box.cls[0])] == 'car' and float(box.conf[0]) >= min_confidence:
+            boxes.append(tuple(float(value) for value in box.xyxy[0]))
+    return boxes
+
+
+def parity_check(reference, candidate, frames, iou_threshold=0.7, min_confidence=0.25):
+    """
+    Runs both detectors over the frames and matches their car boxes by IoU.
+    Returns the share of confident reference boxes the candidate also found, and the frames where they differ.
+    """
+    matched, total, mismatched_frames = 0, 0, []
+    for index, frame in enumerate(frames):
+        expected = car_boxes(reference([frame])[0], min_confidence)
+        found = car_boxes(candidate([frame])[0], min_confidence / 2) # Quantised scores drift a little
+        frame_matched = sum(1 for box in expected
+                            if any(tracking.box_iou(box, other) >= iou_threshold for other in found))
+        matched += frame_matched
+        total += len(expected)
+        if frame_matched != len(expected):
+            mismatched_frames.append(index)
+    return {'reference_boxes': total, 'matched_boxes': matched,
+            'match_ratio': matched / total if total else 1.0, 'mismatched_frames': mismatched_frames}
+
+
+if __name__ == "__main__":
+    import src.benchmark as benchmark
+    from ultralytics import YOLO
+
+    parser = argparse.ArgumentParser(description="Export the detector and check it against the PyTorch model.")
+    parser.add_argument('--frames', help="Video file or image directory, synthetic frames are used when omitted")
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--min-ratio', type=float, default=0.95, help="Lowest acceptable match ratio")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames, _ = benchmark.recorded_frames(args.frames, args.count)
+    else:
+        frames = benchmark.synthetic_frames(args.count)
+    reference = YOLO(config.get('Inference', 'Model', fallback='yolov8n.pt'))
+    report = parity_check(reference, load_detector(config, YOLO), frames)
+    print(report)
+    raise SystemExit(0 if report['match_ratio'] >= args.min_ratio else 1)
@@ -0,0 +1,199 @@
+import collections
+import hashlib
+import os
+import queue
+import threading
+import cv2
+import src.metrics as metrics
+import src.utils as utils
+
+IMAGE_FORMATS = {'jpg': cv2.IMWRITE_JPEG_QUALITY, 'webp': cv2.IMWRITE_WEBP_QUALITY}
+
+ENCODE_SECONDS = metrics.stage_timer('evidence_encode')
+EVIDENCE_WRITTEN = metrics.registry.counter('evidence_written_total', "Evidence images written to disk.")
+EVIDENCE_DROPPED = metrics.registry.counter('evidence_dropped_total',
+                                            "Evidence images skipped because the encode queue was full.")
+EVIDENCE_EVICTED = metrics.registry.counter('evidence_evicted_total', "Evidence files removed to stay under quota.")
+
+
+def downscale(frame, max_width):
+    """The frame shrunk to max_width pixels wide, frames that are narrower are returned as they are."""
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, max(1, round(height * max_width / width))), interpolation=cv2.INTER_AREA)
+
+
+def crop_box(frame, box):
+    x1, y1, x2, y2 = box
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, int(x1)), max(0, int(y1))
+    x2, y2 = min(width, int(x2)), min(height, int(y2))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+class EvidenceStore:
+    """
+    Writes the plate crop and a downscaled context frame of every stored plate, off the
+    hot path: submit only queues the frame, a pool of threads encodes and writes it.
+    Files are content addressed, named by the SHA-1 of the encoded crop and context and
+    sharded as ab/cd/<hash>.jpg (the crop) and ab/cd/<hash>-context.jpg. Once written,
+    on_stored(plate_data, path) is called so the row's image_path can be filled in.
+    When max_bytes is set, the oldest files are removed to stay under it.
+    """
+    _STOP = object()
+
+    def __init__(self, root, image_format='jpg', quality=85, context_width=640, max_bytes=None,
+                 workers=2, queue_size=64):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown evidence image format: {image_format}")
+        self.root = root
+        self.image_format = image_format
+        self.encode_params = [IMAGE_FORMATS[image_format], quality]
+        self.context_width = context_width
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.threads = []
+        self.lock = threading.Lock()
+        self.files = collections.deque() # (path, size), oldest first
+        self.total_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Returns a store configured from the [Evidence] section, or None when it is disabled."""
+        if not config.getboolean('Evidence', 'Enabled', fallback=False):
+            return None
+        quota_mb = config.getfloat('Evidence', 'QuotaMB', fallback=0)
+        return cls(config.get('Evidence', 'Directory', fallback='data/evidence'),
+                   image_format=config.get('Evidence', 'Format', fallback='jpg').lower(),
+                   quality=config.getint('Evidence', 'Quality', fallback=85),
+                   context_width=config.getint('Evidence', 'ContextWidth', fallback=640),
+                   max_bytes=int(quota_mb * 1024 * 1024) or None,
+                   workers=config.getint('Evidence', 'Workers', fallback=2),
+                   queue_size=config.getint('Evidence', 'QueueSize', fallback=64))
+
+    def start(self):
+        """Indexes the files already on disk, oldest first, and starts the encoder threads."""
+        os.makedirs(self.root, exist_ok=True)
+        existing = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                existing.append((stat.st_mtime, path, stat.st_size))
+        with self.lock:
+            for _, path, size in sorted(existing):
+                self.files.append((path, size))
+                self.total_bytes += size
+            self._enforce_quota()
+        metrics.registry.gauge('queue_depth', queue='evidence').set_function(self.queue.qsize)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"evidence-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, plate_data, frame, on_stored=None):
+        """
+        Queues the evidence of a plate found in frame at plate_data['box']. Never blocks:
+        when the encoders fall behind the plate is stored without an image.
+        Returns False if nothing was queued.
+        """
+        box = plate_data.get('box')
+        if frame is None or box is None:
+            return False
+        try:
+            self.queue.put_nowait((plate_data, frame, box, on_stored))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            EVIDENCE_DROPPED.inc()
+            return False
+
+    def flush(self):
+        """Waits until every queued image has been written."""
+        self.queue.join()
+
+    def close(self):
+        """Writes the queued images and stops the encoder threads."""
+        for _ in self.threads:
+            self.queue.put(self._STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def stats(self):
+        with self.lock:
+            return {'files': len(self.files), 'bytes': self.total_bytes, 'written': self.written,
+                    'dropped': self.dropped, 'evicted': self.evicted}
+
+    def write(self, frame, box):
+        """Encodes and writes the crop and context of one plate, returns the crop's path or None."""
+        crop = crop_box(frame, box)
+        if crop is None:
+            return None
+        with ENCODE_SECONDS.time():
+            crop_ok, crop_data = cv2.imencode('.' + self.image_format, crop, self.encode_params)
+            context_ok, context_data = cv2.imencode('.' + self.image_format,
+                                                    downscale(frame, self.context_width), self.encode_params)
+        if not (crop_ok and context_ok):
+            raise ValueError("Could not encode evidence image")
+        crop_bytes, context_bytes = crop_data.tobytes(), context_data.tobytes()
+        digest = hashlib.sha1(crop_bytes + context_bytes).hexdigest()
+        directory = os.path.join(self.root, digest[:2], digest[2:4])
+        crop_path = os.path.join(directory, f"{digest}.{self.image_format}")
+        if os.path.exists(crop_path):
+            return crop_path # Same content already stored
+        os.makedirs(directory, exist_ok=True)
+        context_path = os.path.join(directory, f"{digest}-context.{self.image_format}")
+        for path, data in ((context_path, context_bytes), (crop_path, crop_bytes)): # Crop last, it marks completion
+            self._write_file(path, data)
+        with self.lock:
+            self.files.extend([(context_path, len(context_bytes)), (crop_path, len(crop_bytes))])
+            self.total_bytes += len(context_bytes) + len(crop_bytes)
+            self.written += 1
+            self._enforce_quota()
+        EVIDENCE_WRITTEN.inc()
+        return crop_path
+
+    def _write_file(self, path, data):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as image_file:
+            image_file.write(data)
+        os.replace(temp_path, path) # Readers never see a half written image
+
+    def _enforce_quota(self):
+        """Removes the oldest files until the store is under max_bytes, call with the lock held."""
+        while self.max_bytes and self.total_bytes > self.max_bytes and self.files:
+            path, size = self.files.popleft()
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.evicted += 1
+            EVIDENCE_EVICTED.inc()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                plate_data, frame, box, on_stored = item
+                path = self.write(frame, box)
+                if path is not None:
+                    plate_data['image_path'] = path
+                    if on_stored:
+                        on_stored(plate_data, path)
+            except Exception as e:
+                utils.log_message(f"Error writing evidence image: {e}", level="ERROR")
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,376 @@
+import argparse
+import configparser
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import src.database as db
+import src.motion as motion
+import src.tracking as tracking
+import src.utils as utils
+import src.video as video
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.ts')
+OUTPUT_FIELDS = ('plate_number', 'detection_time', 'detection_ts', 'source_file', 'frame_index', 'track_id')
+
+
+def is_media_file(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)
+
+
+def collect_files(inputs):
+    """Image and video files from directories (walked recursively), glob patterns and plain paths, sorted."""
+    files = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, names in os.walk(entry):
+                files.update(os.path.join(root, name) for name in names if is_media_file(name))
+        elif glob.has_magic(entry):
+            files.update(path for path in glob.glob(entry, recursive=True) if os.path.isfile(path)
+                         and is_media_file(path))
+        elif os.path.isfile(entry):
+            files.add(entry)
+        else:
+            utils.log_message(f"Skipping {entry}: no such file or directory", level="WARNING")
+    return sorted(os.path.abspath(path) for path in files)
+
+
+class Checkpoint:
+    """
+    Progress of an ingest run, saved as JSON: per file whether it is done and, for videos,
+    the next frame to process. Files that changed on disk since are started over.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.files = json.load(checkpoint_file).get('files', {})
+
+    def _signature(self, file_path):
+        stat = os.stat(file_path)
+        return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def _entry(self, file_path):
+        entry = self.files.get(file_path)
+        if entry is None or {key: entry.get(key) for key in ('size', 'mtime')} != self._signature(file_path):
+            return None
+        return entry
+
+    def is_done(self, file_path):
+        with self.lock:
+            entry = self._entry(file_path)
+            return bool(entry and entry['done'])
+
+    def offset(self, file_path):
+        """The frame to resume a video at, 0 for files not seen before."""
+        with self.lock:
+            entry = self._entry(file_path)
+            return entry['offset'] if entry else 0
+
+    def update(self, file_path, offset, done=False):
+        with self.lock:
+            self.files[file_path] = dict(self._signature(file_path), offset=offset, done=done)
+
+    def snapshot(self):
+        """The progress as it stands now, as the JSON text save writes."""
+        with self.lock:
+            return json.dumps({'updated': utils.get_current_timestamp(), 'files': self.files})
+
+    def save(self, data=None):
+        """Writes data, a snapshot taken earlier, or the current progress."""
+        if not self.path:
+            return
+        if data is None:
+            data = self.snapshot()
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            checkpoint_file.write(data)
+        os.replace(temp_path, self.path) # An interrupted save never leaves a broken checkpoint
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.file = open(path, 'a')
+        self.lock = threading.Lock()
+
+    def write(self, plate_data):
+        line = json.dumps({field: plate_data.get(field) for field in OUTPUT_FIELDS})
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSink:
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+        self.lock = threading.Lock()
+        if new_file:
+            self.writer.writeheader()
+
+    def write(self, plate_data):
+        with self.lock:
+            self.writer.writerow(plate_data)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class DatabaseSink:
+    """Writes plates through a BatchWriter, so parallel files share one connection."""
+    def __init__(self, db_path, batch_size=500):
+        self.writer = db.BatchWriter(db_path, batch_size=batch_size, flush_interval=1.0,
+                                     **db.connection_options()).start()
+
+    def write(self, plate_data):
+        self.writer.insert_plate_data(plate_data)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+class BulkIngest:
+    """
+    Processes a list of image and video files with `jobs` files in parallel, each worker
+    thread with its own ALPRProcessor. Plates go to every sink; the checkpoint is saved
+    every checkpoint_interval seconds after the sinks are flushed, so a resumed run
+    repeats at most the frames processed since the last save.
+    """
+    def __init__(self, files, processor_factory, sinks, checkpoint, jobs=2, ingest_config=None,
+                 checkpoint_interval=30.0, progress_interval=10.0, on_progress=None):
+        self.files = files
+        self.processor_factory = processor_factory
+        self.sinks = sinks
+        self.checkpoint = checkpoint
+        self.jobs = max(1, jobs)
+        self.ingest_config = ingest_config or config
+        self.sampling = video.sampling_options(self.ingest_config) # Analysis rate and resolution of videos
+        self.sampling['analysis_fps'] = self.ingest_config.getfloat('Ingest', 'AnalysisFPS',
+                                                                    fallback=self.sampling['analysis_fps'])
+        # A vehicle that stays in view is stored after this many frames, so the checkpoint never lags further
+        self.max_track_frames = self.ingest_config.getint('Ingest', 'MaxTrackFrames', fallback=9000)
+        self.checkpoint_interval = checkpoint_interval
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress or print
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.files_done = 0
+        self.files_failed = 0
+        self.frames = 0
+        self.plates = 0
+        self.started = None
+
+    def run(self):
+        """Processes every file that is not done yet, returns the stats."""
+        pending = [path for path in self.files if not self.checkpoint.is_done(path)]
+        self.files_done = len(self.files) - len(pending)
+        work = queue.Queue()
+        for path in pending:
+            work.put(path)
+        self.started = time.monotonic()
+        threads = [threading.Thread(target=self._work, args=(work,), name=f"ingest-{index}", daemon=True)
+                   for index in range(min(self.jobs, len(pending)))]
+        for thread in threads:
+            thread.start()
+        try:
+            last_save = last_report = time.monotonic()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.2)
+                now = time.monotonic()
+                if now - last_save >= self.checkpoint_interval:
+                    self.save_checkpoint()
+                    last_save = now
+                if now - last_report >= self.progress_interval:
+                    self.on_progress(self.progress())
+                    last_report = now
+        except KeyboardInterrupt:
+            self.stop_event.set() # Workers stop after their current batch, progress is kept
+            for thread in threads:
+                thread.join()
+        self.save_checkpoint()
+        self.on_progress(self.progress())
+        return self.stats()
+
+    def save_checkpoint(self):
+        # Taken before the flush, so it never covers rows emitted while the sinks were flushing
+        data = self.checkpoint.snapshot()
+        for sink in self.sinks: # Rows must be stored before the checkpoint says they are
+            sink.flush()
+        self.checkpoint.save(data)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {'files': len(self.files), 'files_done': self.files_done, 'files_failed': self.files_failed,
+                'frames': self.frames, 'plates': self.plates, 'elapsed_s': round(elapsed, 1),
+                'frames_per_sec': round(self.frames / elapsed, 1) if elapsed else 0.0}
+
+    def progress(self):
+        stats = self.stats()
+        return (f"{stats['files_done']}/{stats['files']} files, {stats['frames']} frames "
+                f"({stats['frames_per_sec']}/s), {stats['plates']} plates, {stats['files_failed']} failed")
+
+    def _work(self, work):
+        processor = self.processor_factory()
+        while not self.stop_event.is_set():
+            try:
+                path = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if path.lower().endswith(IMAGE_EXTENSIONS):
+                    finished = self._ingest_image(processor, path)
+                else:
+                    finished = self._ingest_video(processor, path)
+                if finished:
+                    with self.lock:
+                        self.files_done += 1
+            except Exception as e:
+                utils.log_message(f"Error ingesting {path}: {e}", level="ERROR")
+                with self.lock:
+                    self.files_failed += 1
+
+    def _ingest_image(self, processor, path):
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Could not open or read image at {path}")
+        plates = processor.read_plates([image], processor.detect([image]))[0]
+        self._emit(path, [(0, plates)])
+        self.checkpoint.update(path, 1, done=True)
+        return True
+
+    def _ingest_video(self, processor, path):
+        """Processes the video in batches from its checkpointed offset. Returns False when stopped early."""
+        offset = self.checkpoint.offset(path)
+        motion_gate = motion.MotionGate.from_config(self.ingest_config)
+        tracker = None
+        if self.ingest_config.getboolean('Tracking', 'Enabled', fallback=True): # One row per vehicle
+            tracker = tracking.PlateTracker.from_config(self.ingest_config)
+        batch, indexes, timestamps = [], [], []
+        next_offset = offset
+        for frame_index, frame, detection_ts in video.sample_frames(path, self.stop_event, start_frame=offset,
+                                                                    **self.sampling):
+            next_offset = frame_index + 1
+            with self.lock:
+                self.frames += 1
+            if motion_gate and not motion_gate.check(frame):
+                continue
+            batch.append(frame)
+            indexes.append(frame_index)
+            timestamps.append(detection_ts)
+            if len(batch) >= processor.batch_size:
+                self._process_batch(processor, path, batch, indexes, timestamps, tracker)
+                if tracker and self.max_track_frames > 0:
+                    self._emit_tracks(processor, path, next_offset,
+                                      tracker.finish_started_before(next_offset - self.max_track_frames))
+                # Vehicles still tracked are only stored once their track ends, resume at the oldest
+                first_frames = [track.first_frame for track in tracker.tracks] if tracker else []
+                self.checkpoint.update(path, min(first_frames + [next_offset]))
+                batch, indexes, timestamps = [], [], []
+        if batch:
+            self._process_batch(processor, path, batch, indexes, timestamps, tracker)
+        if tracker: # Vehicles still in view at the end of the file, or when stopped
+            self._emit_tracks(processor, path, next_offset, tracker.flush())
+        if self.stop_event.is_set():
+            self.checkpoint.update(path, next_offset)
+            return False
+        self.checkpoint.update(path, next_offset, done=True)
+        return True
+
+    def _process_batch(self, processor, path, frames, indexes, timestamps, tracker):
+        coords_per_frame = processor.detect(frames)
+        if tracker:
+            plates_per_frame = processor.read_tracked_plates(frames, coords_per_frame, indexes, tracker,
+                                                             timestamps=timestamps)
+        else:
+            plates_per_frame = processor.read_plates(frames, coords_per_frame, timestamps=timestamps)
+        self._emit(path, zip(indexes, plates_per_frame))
+
+    def _emit_tracks(self, processor, path, frame_index, tracks):
+        self._emit(path, [(frame_index, [processor.build_track_plate_data(track)
+                                         for track in tracks if track.voted_plate()])])
+
+    def _emit(self, path, plates_by_frame):
+        count = 0
+        for frame_index, plates in plates_by_frame:
+            for plate_data in plates:
+                plate_data.update(source_file=path, frame_index=frame_index, location=path)
+                for sink in self.sinks:
+                    sink.write(plate_data)
+                count += 1
+        with self.lock:
+            self.plates += count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ALPR over folders of images and archived videos.")
+    parser.add_argument('inputs', nargs='+', help="Files, directories or glob patterns (quote them)")
+    parser.add_argument('--db', default=config.get('Database', 'DatabasePath', fallback=None),
+                        help="SQLite database to store the plates in")
+    parser.add_argument('--no-db', action='store_true', help="Do not write to the database")
+    parser.add_argument('--jsonl', help="Also append the plates to this JSON lines file")
+    parser.add_argument('--csv', help="Also append the plates to this CSV file")
+    parser.add_argument('--jobs', type=int, default=config.getint('Ingest', 'Jobs', fallback=2),
+                        help="Files processed in parallel, each with its own models")
+    parser.add_argument('--checkpoint', default=config.get('Ingest', 'Checkpoint', fallback='ingest_checkpoint.json'),
+                        help="Progress file, an interrupted run resumes from it")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and process everything")
+    parser.add_argument('--analysis-fps', type=float, help="Frames analysed per second of video, 0 for every frame")
+    parser.add_argument('--start-time', type=utils.parse_timestamp, metavar="'YYYY-MM-DD HH:MM:SS'",
+                        help="Local time the videos started recording, instead of their modification time "
+                             "minus their duration (copies get a new modification time)")
+    args = parser.parse_args()
+
+    import src.alpr as alpr
+
+    files = collect_files(args.inputs)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    sinks = []
+    if not args.no_db:
+        sinks.append(DatabaseSink(args.db, config.getint('Ingest', 'WriteBatchSize', fallback=500)))
+    if args.jsonl:
+        sinks.append(JsonlSink(args.jsonl))
+    if args.csv:
+        sinks.append(CsvSink(args.csv))
+    if not sinks:
+        parser.error("Nothing to write to: drop --no-db or give --jsonl/--csv")
+
+    print(f"Ingesting {len(files)} files with {args.jobs} jobs")
+    ingest = BulkIngest(files, lambda: alpr.ALPRProcessor(config), sinks, Checkpoint(args.checkpoint),
+                        jobs=args.jobs,
+                        checkpoint_interval=config.getfloat('Ingest', 'CheckpointIntervalSec', fallback=30),
+                        progress_interval=config.getfloat('Ingest', 'ProgressIntervalSec', fallback=10))
+    if args.analysis_fps is not None:
+        ingest.sampling['analysis_fps'] = args.analysis_fps
+    if args.start_time is not None:
+        ingest.sampling['start_time'] = args.start_time
+    try:
+        ingest.run()
+    finally:
+        for sink in sinks:
+            sink.close()
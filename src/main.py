@@ -1,12 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
-from PIL import Image, ImageTk
 import cv2
+import queue
 import threading
-import time
 import src.alpr as alpr
+import src.pipeline as pipeline
+import src.renderer as renderer
 import src.database as db # Import database module, but not connection class directly here
+import src.evidence as evidence
+import src.metrics as metrics
 import src.utils as utils
+import src.watchlist as watchlist
 import configparser
 
 # Load configuration
@@ -21,11 +25,24 @@ class ALPRApp:
         print("DEBUG: GUI setup (window, title) done")
 
 
-        self.alpr_processor = alpr.ALPRProcessor(config) # Database connection is no longer passed here
+        self.alpr_processor = alpr.ALPRProcessor(config) # Models load in the background, see check_models_ready
         print("DEBUG: alpr_processor initialized successfully")
 
-        self.image_display_panel = None # Panel to display loaded images/videos
-        print("DEBUG: image_display_panel initialized to None")
+        self.db_writer = db.start_batch_writer() # One long-lived writer shared by all processing threads
+        print("DEBUG: db_writer started")
+
+        self.evidence = evidence.EvidenceStore.from_config(config) # Plate images, None when disabled
+        if self.evidence:
+            self.evidence.start()
+
+        self.watchlist = watchlist.Watchlist.from_config(config) # None when no watchlist is configured
+        if self.watchlist:
+            self.watchlist.subscribe(self.log_watchlist_hit)
+        print("DEBUG: watchlist loaded")
+
+        self.metrics_exporters = metrics.start_exporters(config) # Prometheus endpoint and/or dump file, per [Metrics]
+
+        self.log_queue = queue.Queue() # Log lines from any thread, written to the Text widget by flush_log
 
         # --- GUI Elements ---
         self.btn_load_image = ttk.Button(window, text="Load Image", command=self.load_image)
@@ -37,14 +54,30 @@ class ALPRApp:
         print("DEBUG: Load Video button created")
 
         self.log_text = tk.Text(window, height=10, width=80)
-        self.log_text.pack(pady=5)
+        self.log_text.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
         self.log_text.config(state=tk.DISABLED)
         print("DEBUG: Log Text area created")
 
-        self.delay = 30 # Increased delay for less CPU usage in video processing
+        # One canvas shows every image and video frame, redrawn from the Tk thread only
+        self.display_canvas = tk.Canvas(window, width=config.getint('GUI', 'DisplayWidth', fallback=960),
+                                        height=config.getint('GUI', 'DisplayHeight', fallback=540),
+                                        background='black', highlightthickness=0)
+        self.display_canvas.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
+        self.renderer = renderer.FrameRenderer(window, self.display_canvas,
+                                               fps=config.getint('GUI', 'RenderFPS', fallback=30))
+        self.renderer.start()
+        print("DEBUG: display canvas and renderer created")
+
         self.is_video_processing = False
         self.current_video_path = None # Store the path of the currently loaded video
-        print("DEBUG: Delay, is_video_processing, current_video_path initialized")
+        self.pipeline = None # Streaming pipeline of the video being processed
+        print("DEBUG: is_video_processing, current_video_path, pipeline initialized")
+
+        # The window opens straight away, the models load and warm up in the background
+        self.alpr_processor.start_warmup()
+        self.update_log("Loading detection models...")
+        self.window.after(200, self.check_models_ready)
+        self.window.after(100, self.flush_log)
 
 
         print("DEBUG: ALPRApp.__init__ finished")
@@ -59,6 +92,7 @@ class ALPRApp:
                 image = cv2.imread(file_path)
                 if image is None:
                     raise ValueError(f"Could not open or read image at {file_path}")
+                self.renderer.overlays.set_boxes([]) # The previous image's boxes do not belong to this one
                 self.display_image(image) # Display the loaded image
                 threading.Thread(target=self.process_image_thread, args=(image,)).start() # Process in thread
             except Exception as e:
@@ -78,96 +112,103 @@ class ALPRApp:
                 utils.show_error(self.window, f"Video Load Error: {e}") # Display the error
 
     def display_image(self, image):
-        """Displays the given OpenCV image in the GUI."""
-        try:
-            if self.image_display_panel is not None: # Clear previous image if any
-                self.image_display_panel.destroy()
-            self.image_display_panel = tk.Label(self.window) # Create a Label for image display
-            self.image_display_panel.pack()
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) # Convert to RGB
-            image_pil = Image.fromarray(image_rgb) # Convert to PIL Image
-            image_tk = ImageTk.PhotoImage(image_pil) # Convert to Tk PhotoImage
-            self.image_display_panel.config(image=image_tk) # Configure the Label to display image
-            self.image_display_panel.image = image_tk # Keep a reference to prevent garbage collection
-        except Exception as e:
-            utils.log_message(f"Error displaying image: {e}", level="ERROR")
-            self.update_log(f"Error displaying image: {e}")
+        """Hands the given OpenCV image to the renderer. Safe to call from any thread, only the newest frame is shown."""
+        self.renderer.submit(image)
 
+    def show_detections(self, item):
+        """Called by the pipeline with the boxes of every detected frame, they are drawn over the video."""
+        self.renderer.overlays.set_boxes(item.coords)
 
     def process_video(self):
         video_path = self.current_video_path
         if not video_path:
             return # Exit if no video path is set
 
-        vid = cv2.VideoCapture(video_path) # Open video capture
-        if not vid.isOpened():
-            utils.log_message(f"Error: Could not open video file: {video_path}", level="ERROR")
-            self.update_log(f"Error: Could not open video file: {video_path}")
-            self.is_video_processing = False # Reset flag
-            return
-
+        # Decode, detection, OCR and database writes run as separate pipeline stages,
+        # so a slow OCR call no longer stalls decoding.
+        self.pipeline = pipeline.StreamingPipeline(self.alpr_processor, video_path, db_conn=self.db_writer,
+                                                   on_frame=self.display_image, on_plate=self.log_plate,
+                                                   on_detect=self.show_detections, watchlist=self.watchlist,
+                                                   evidence=self.evidence)
         try:
-            while self.is_video_processing:  # Control loop with the flag
-                ret, frame = vid.read() # Read frame
-                if not ret: # End of video or error
-                    break
-
-                self.display_image(frame) # Display current frame
-                self.process_frame_thread(frame.copy()) # Process frame in thread
-
-                time.sleep(self.delay / 1000) # Control frame rate and reduce CPU usage
-        finally: # Ensure resources are released even if errors occur.
-            vid.release() # Release video capture
+            self.pipeline.run()
+        except Exception as e:
+            utils.log_message(f"Error processing video {video_path}: {e}", level="ERROR")
+            self.update_log(f"Error processing video: {e}")
+        finally: # Ensure state is reset even if errors occur.
+            self.pipeline = None
             self.is_video_processing = False # Reset flag
             self.current_video_path = None # Clear current video path
             utils.log_message("Video processing finished.")
             self.update_log("Video processing finished.")
 
+    def log_plate(self, plate_data):
+        self.renderer.overlays.add_plates([plate_data['plate_number']])
+        log_message = (f"Detected: {plate_data['plate_number']}, "
+                       f"Timestamp: {plate_data['detection_time']}")
+        self.update_log(log_message)
+
+    def log_watchlist_hit(self, hit):
+        self.update_log(f"WATCHLIST HIT: {hit.plate_data['plate_number']} matches "
+                        f"{hit.entry['plate_number']} {hit.entry.get('reason', '')}".rstrip())
+
 
     def process_image_thread(self, image): # Threaded function for image processing
-        db_conn = None # Initialize db_conn to None
         try:
-            db_conn = db.connect_to_db() # Create NEW database connection for THIS thread
-            plate_data = self.alpr_processor.process_frame(frame=image, db_conn=db_conn) # Process the image, pass db_conn
-            if plate_data: # If plate data is detected
+            self.alpr_processor.wait_until_ready() # Images loaded during the warm-up wait for it
+            coords = self.alpr_processor.detect([image])
+            plates = self.alpr_processor.read_plates([image], coords)[0] # Every plate in the image
+            self.renderer.overlays.set_boxes(coords[0])
+            self.renderer.overlays.add_plates([plate_data['plate_number'] for plate_data in plates])
+            self.display_image(image) # Redraw the image with its boxes and plates
+            for plate_data in plates: # Log each detected plate
+                db_id = self.db_writer.insert_plate_data(plate_data)
+                if db_id is not None:
+                    plate_data['id'] = db_id
+                if self.evidence:
+                    self.evidence.submit(plate_data, image, on_stored=self.db_writer.set_image_path)
                 log_message = (f"Detected: {plate_data['plate_number']}, "
                                f"Timestamp: {plate_data['detection_time']}")
                 self.update_log(log_message) # Update the log
+                if self.watchlist:
+                    self.watchlist.check(plate_data)
         except Exception as e:
             utils.log_message(f"Error processing image in thread: {e}", level="ERROR")
             self.update_log(f"Error processing image: {e}")
-        finally:
-            if db_conn:
-                db_conn.close() # Close the database connection in THIS thread
-
 
-    def process_frame_thread(self, frame): # Threaded function for video frame processing
-        db_conn = None # Initialize db_conn to None
-        try:
-            db_conn = db.connect_to_db() # Create NEW database connection for THIS thread
-            plate_data = self.alpr_processor.process_frame(frame=frame, db_conn=db_conn) # Process frame, pass db_conn
-            if plate_data:
-                log_message = (f"Detected: {plate_data['plate_number']}, "
-                               f"Timestamp: {plate_data['detection_time']}")
-                self.update_log(log_message)
-        except Exception as e:
-            utils.log_message(f"Error processing frame in thread: {e}", level="ERROR")
-            self.update_log(f"Error processing frame: {e}")
-        finally:
-            if db_conn:
-                db_conn.close() # Ensure database connection is closed in THIS thread
 
+    def check_models_ready(self):
+        """Polls the warm-up from the Tk thread, images loaded before it finishes simply wait for it."""
+        if self.alpr_processor.ready.is_set():
+            self.update_log("Models ready.")
+        else:
+            self.window.after(200, self.check_models_ready)
 
     def update_log(self, message):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.config(state=tk.DISABLED)
-        self.log_text.see(tk.END)
+        """Queues a log line, safe to call from any thread."""
+        self.log_queue.put(message)
+
+    def flush_log(self):
+        """Writes the queued log lines to the Text widget in one go, from the Tk thread."""
+        messages = renderer.drain(self.log_queue)
+        if messages:
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "\n".join(messages) + "\n")
+            self.log_text.config(state=tk.DISABLED)
+            self.log_text.see(tk.END)
+        self.window.after(100, self.flush_log)
 
     def on_closing(self):
         self.is_video_processing = False # Set to stop video processing loop
-        if self.db_conn: # No longer instance variable, remove this line.
-            pass # self.db_conn.close() # Close database connection - no longer needed here.
+        self.renderer.stop()
+        video_pipeline = self.pipeline
+        if video_pipeline: # Stop decoding, give the queued frames a moment to be stored
+            video_pipeline.stop()
+            video_pipeline.join(timeout=5)
+        if self.evidence:
+            self.evidence.close() # Their image_path updates go to the writer, so it closes after
+        self.db_writer.close() # Write the pending rows before exiting
+        metrics.stop_exporters(self.metrics_exporters)
         self.window.destroy() # Destroy main window
         utils.log_message("Application closed.") # Log application closing
 
@@ -0,0 +1,287 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import src.utils as utils
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'visionguard_'
+
+
+def format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+class Counter:
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """A current value, either set directly or read from a function when a snapshot is taken."""
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def snapshot(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return None
+        return self.value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Recording a value is one bisect and three additions under
+    a lock, so it is cheap enough for the per-frame hot path.
+    """
+    def __init__(self, labels, buckets=DEFAULT_BUCKETS, registry=None):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.registry = registry
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        if self.registry is not None and not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager recording the duration of its block."""
+        if self.registry is not None and not self.registry.enabled:
+            return NULL_TIMER
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimated quantile, interpolated inside the bucket that holds it."""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self.lock:
+            count, total = self.count, self.sum
+        return {'count': count, 'sum': round(total, 6),
+                'mean': round(total / count, 6) if count else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    """Holds the metrics of the process, keyed by name and labels."""
+    def __init__(self):
+        self.enabled = True
+        self.metrics = {} # name -> {labels -> metric}
+        self.kinds = {}
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.metrics.setdefault(name, {})
+            self.kinds.setdefault(name, kind)
+            if help_text:
+                self.help.setdefault(name, help_text)
+            if key not in family:
+                family[key] = factory(key)
+            return family[key]
+
+    def counter(self, name, help_text='', **labels):
+        return self._get('counter', name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text='', **labels):
+        return self._get('gauge', name, help_text, labels, Gauge)
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS, **labels):
+        return self._get('histogram', name, help_text, labels,
+                         lambda key: Histogram(key, buckets, registry=self))
+
+    def snapshot(self):
+        """All metrics as plain data, e.g. {'stage_seconds': {'stage=yolo': {...}}}."""
+        with self.lock:
+            families = {name: dict(family) for name, family in self.metrics.items()}
+        return {name: {','.join(f'{key}={value}' for key, value in labels) or 'value': metric.snapshot()
+                       for labels, metric in family.items()}
+                for name, family in families.items()}
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self.lock:
+            families = {name: dict(family) for name, family in self.metrics.items()}
+        lines = []
+        for name, family in sorted(families.items()):
+            full_name = METRIC_PREFIX + name
+            kind = self.kinds[name]
+            if name in self.help:
+                lines.append(f"# HELP {full_name} {self.help[name]}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, metric in family.items():
+                if kind == 'histogram':
+                    with metric.lock:
+                        counts, total, count = list(metric.counts), metric.sum, metric.count
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(metric.buckets) + ['+Inf'], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{full_name}_bucket{format_labels(labels, ('le', bound))} {cumulative}")
+                    lines.append(f"{full_name}_sum{format_labels(labels)} {total}")
+                    lines.append(f"{full_name}_count{format_labels(labels)} {count}")
+                else:
+                    value = metric.snapshot()
+                    if value is not None:
+                        lines.append(f"{full_name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def stage_timer(stage):
+    """The latency histogram of a pipeline stage, look it up once and reuse it on the hot path."""
+    return registry.histogram('stage_seconds', "Time spent per call in each pipeline stage.", stage=stage)
+
+
+def serve_http(port, host='127.0.0.1', metrics_registry=None):
+    """Serves /metrics in Prometheus text format from a background thread, returns the server."""
+    metrics_registry = metrics_registry or registry
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics_registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Scrapes are not worth a log line each
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    utils.log_message(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+class PeriodicDumper:
+    """Writes a JSON snapshot of the metrics to a file every interval seconds."""
+    def __init__(self, path, interval, metrics_registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = metrics_registry or registry
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='metrics-dump', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.dump()
+
+    def dump(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as dump_file:
+            json.dump({'time': utils.get_current_timestamp(), 'metrics': self.registry.snapshot()}, dump_file)
+        os.replace(temp_path, self.path) # Readers never see a half written file
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.dump()
+            except OSError as e:
+                utils.log_message(f"Error writing metrics to {self.path}: {e}", level="ERROR")
+
+
+def start_exporters(config):
+    """Applies the [Metrics] section: toggles collection and starts the configured exporters."""
+    registry.enabled = config.getboolean('Metrics', 'Enabled', fallback=True)
+    exporters = []
+    port = config.getint('Metrics', 'HttpPort', fallback=0)
+    if registry.enabled and port:
+        exporters.append(serve_http(port, config.get('Metrics', 'HttpHost', fallback='127.0.0.1')))
+    dump_file = config.get('Metrics', 'DumpFile', fallback='').strip()
+    if registry.enabled and dump_file:
+        exporters.append(PeriodicDumper(dump_file, config.getfloat('Metrics', 'DumpIntervalSec', fallback=10)).start())
+    return exporters
+
+
+def stop_exporters(exporters):
+    """Stops what start_exporters started, the dump file gets a final snapshot."""
+    for exporter in exporters:
+        if isinstance(exporter, PeriodicDumper):
+            exporter.stop()
+        else:
+            exporter.shutdown()
@@ -0,0 +1,115 @@
+import collections
+import threading
+import time
+import cv2
+import numpy as np
+import src.metrics as metrics
+
+CACHE_HITS = metrics.registry.counter('ocr_cache_hits_total', "Plate crops answered from the OCR cache.")
+CACHE_MISSES = metrics.registry.counter('ocr_cache_misses_total', "Plate crops that had to go through OCR.")
+
+
+def difference_hash(crop, hash_size=16, min_step=4):
+    """
+    Perceptual hash of a crop: the crop is greyscaled and shrunk to (hash_size + 1) x hash_size,
+    and each bit says whether a pixel is clearly (by min_step grey levels) brighter than its
+    right neighbour. Small shifts, noise and brightness changes leave most bits unchanged.
+    """
+    grey = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(grey, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1] + min_step).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+class OCRCache:
+    """
+    LRU cache with a time to live for plate reads, in front of OCR.
+    Entries are keyed by the crop's box, rounded to position_tolerance pixels, and by the
+    perceptual hash of the crop. A crop whose hash is within max_hamming bits of a cached
+    crop at the same position is treated as the same plate.
+    """
+    def __init__(self, max_entries=256, ttl=5.0, hash_size=16, position_tolerance=16, max_hamming=3):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.position_tolerance = max(1, position_tolerance)
+        self.max_hamming = max_hamming
+        self.entries = collections.OrderedDict() # (geometry, hash) -> (read, stored at), oldest first
+        self.hashes_at = {} # geometry -> hashes cached for that position
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Returns a cache configured from the [OCR] section, or None when CacheSize is 0."""
+        max_entries = config.getint('OCR', 'CacheSize', fallback=256)
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries,
+                   ttl=config.getfloat('OCR', 'CacheTTLSec', fallback=5.0),
+                   hash_size=config.getint('OCR', 'CacheHashSize', fallback=16),
+                   position_tolerance=config.getint('OCR', 'CachePositionTolerance', fallback=16),
+                   max_hamming=config.getint('OCR', 'CacheMaxHamming', fallback=3))
+
+    def key(self, crop, box):
+        """The cache key of a crop cut out at box (x1, y1, x2, y2)."""
+        geometry = tuple(int(round(float(value) / self.position_tolerance)) for value in box)
+        return geometry, difference_hash(crop, self.hash_size)
+
+    def get(self, key):
+        """The cached read for the key or a near duplicate of it, None on a miss."""
+        geometry, crop_hash = key
+        now = time.monotonic()
+        with self.lock:
+            for candidate in self._candidates(geometry, crop_hash):
+                read, stored_at = self.entries[(geometry, candidate)]
+                if now - stored_at > self.ttl:
+                    self._remove((geometry, candidate))
+                    self.expired += 1
+                    continue
+                self.entries.move_to_end((geometry, candidate))
+                self.hits += 1
+                CACHE_HITS.inc()
+                return read
+            self.misses += 1
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, key, read):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.entries[key] = (read, time.monotonic())
+            self.hashes_at.setdefault(key[0], set()).add(key[1])
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries))) # Least recently used
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions, 'expired': self.expired}
+
+    def _candidates(self, geometry, crop_hash):
+        """Cached hashes at this position, the exact hash first, then the closest ones."""
+        hashes = self.hashes_at.get(geometry)
+        if not hashes:
+            return []
+        if crop_hash in hashes:
+            return [crop_hash]
+        distances = sorted((bin(crop_hash ^ other).count('1'), other) for other in hashes)
+        return [other for distance, other in distances if distance <= self.max_hamming]
+
+    def _remove(self, key):
+        del self.entries[key]
+        hashes = self.hashes_at[key[0]]
+        hashes.discard(key[1])
+        if not hashes:
+            del self.hashes_at[key[0]]
@@ -0,0 +1,405 @@
+import argparse
+import configparser
+import queue
+import threading
+import time
+import src.database as db
+import src.evidence as evidence
+import src.metrics as metrics
+import src.motion as motion
+import src.tracking as tracking
+import src.utils as utils
+import src.video as video
+import src.watchlist as watchlist
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+DROP_POLICIES = ('block', 'drop_oldest', 'keep_every_nth')
+STOP = object() # End-of-stream marker passed from stage to stage
+
+DECODE_SECONDS = metrics.stage_timer('decode')
+FRAMES_DECODED = metrics.registry.counter('frames_decoded_total', "Frames read from the video sources.")
+FRAMES_STATIC = metrics.registry.counter('frames_static_total', "Frames skipped by the motion gate.")
+PLATES_STORED = metrics.registry.counter('plates_stored_total', "Plate reads handed to the database.")
+
+
+class BoundedQueue:
+    """
+    A bounded queue between two pipeline stages.
+    When the queue is full, 'block' makes the producer wait (backpressure),
+    'drop_oldest' discards the oldest queued item and 'keep_every_nth'
+    only waits for every Nth item and drops the ones in between.
+    Named queues export their depth and drop count as metrics.
+    """
+    def __init__(self, maxsize, drop_policy='block', keep_every_n=2, name=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.drop_policy = drop_policy
+        self.keep_every_n = max(1, keep_every_n)
+        self.dropped = 0
+        self.overflow_count = 0
+        self.lock = threading.Lock()
+        self.dropped_counter = None
+        if name:
+            metrics.registry.gauge('queue_depth', "Items waiting in each queue.", queue=name).set_function(self.qsize)
+            self.dropped_counter = metrics.registry.counter('frames_dropped_total', "Frames dropped by full queues.",
+                                                            queue=name)
+
+    def put(self, item, force=False):
+        """Queues the item according to the drop policy. Returns False if the item was dropped."""
+        if force or self.drop_policy == 'block':
+            self.queue.put(item)
+            return True
+
+        if self.drop_policy == 'drop_oldest':
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait() # Make room by discarding the oldest item
+                        self._count_drop()
+                    except queue.Empty:
+                        pass
+
+        # keep_every_nth
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.overflow_count += 1
+                keep = self.overflow_count % self.keep_every_n == 0
+            if keep:
+                self.queue.put(item) # Wait for room for every Nth item
+                return True
+            self._count_drop()
+            return False
+
+    def get(self, timeout=None):
+        """Returns the next item, raises queue.Empty after the timeout."""
+        return self.queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def _count_drop(self):
+        with self.lock:
+            self.dropped += 1
+        if self.dropped_counter:
+            self.dropped_counter.inc()
+
+
+class FrameItem:
+    """A decoded frame travelling through the pipeline stages."""
+    def __init__(self, index, frame, timestamp=None):
+        self.index = index
+        self.frame = frame
+        self.timestamp = timestamp # Detection time in epoch seconds, from the frame's position in a file
+        self.coords = []
+        self.plates = []
+
+
+class Stage:
+    """A named group of worker threads reading batches from one queue and feeding the next."""
+    def __init__(self, name, target, workers, input_queue, output_queue=None,
+                 batch_size=1, max_wait=0.0, on_exit=None):
+        self.name = name
+        self.target = target
+        self.workers = max(1, workers)
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.on_exit = on_exit
+        self.processed = 0
+        self.active = 0
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        self.active = self.workers
+        for worker_index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{worker_index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        try:
+            stopped = False
+            while not stopped:
+                items, stopped = self._next_batch()
+                if not items:
+                    continue
+                try:
+                    self.target(items)
+                except Exception as e:
+                    utils.log_message(f"Error in {self.name} stage: {e}", level="ERROR")
+                with self.lock:
+                    self.processed += len(items)
+        finally:
+            if self.on_exit:
+                self.on_exit()
+            self._worker_finished()
+
+    def _next_batch(self):
+        """Waits for one item, then gathers up to batch_size items until max_wait has passed."""
+        item = self.input_queue.get()
+        if item is STOP:
+            self.input_queue.put(STOP, force=True) # Let the sibling workers see it too
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.batch_size:
+            try:
+                item = self.input_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is STOP:
+                self.input_queue.put(STOP, force=True)
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _worker_finished(self):
+        """The last worker of the stage to exit passes the end-of-stream marker downstream."""
+        with self.lock:
+            self.active -= 1
+            last = self.active == 0
+        if last and self.output_queue is not None:
+            self.output_queue.put(STOP, force=True)
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+class StreamingPipeline:
+    """
+    Headless capture -> detect -> OCR -> persist pipeline.
+    Each stage runs in its own worker threads and the stages are joined by bounded
+    queues, so a slow OCR call no longer stalls decoding. Works for video files,
+    stream URLs and camera indexes.
+    """
+    def __init__(self, processor, source, pipeline_config=None, db_factory=None,
+                 on_frame=None, on_plate=None, db_conn=None, watchlist=None, on_detect=None,
+                 evidence=None):
+        pipeline_config = pipeline_config or config
+        self.processor = processor
+        self.source = source
+        self.db_conn = db_conn # Shared connection or writer owned by the caller, never closed here
+        self.db_factory = db_factory or db.start_batch_writer
+        self.on_frame = on_frame # Called from the decode thread with every decoded frame
+        self.on_plate = on_plate # Called from the persist thread with every stored plate
+        self.on_detect = on_detect # Called from the detect threads with every FrameItem and its boxes
+        self.watchlist = watchlist # Every stored plate is checked against it
+        self.evidence = evidence # EvidenceStore writing the image of every stored plate, owned by the caller
+        self.stop_event = threading.Event()
+        self.local = threading.local()
+        self.roi = processor.roi_for_source(source) # Region of interest of this camera, if configured
+
+        queue_size = pipeline_config.getint('Pipeline', 'QueueSize', fallback=8)
+        drop_policy = pipeline_config.get('Pipeline', 'DropPolicy', fallback='auto')
+        if drop_policy == 'auto': # Files can wait for the pipeline, live sources cannot
+            drop_policy = 'drop_oldest' if video.is_live_source(source) else 'block'
+        keep_every_n = pipeline_config.getint('Pipeline', 'KeepEveryN', fallback=2)
+        detect_workers = pipeline_config.getint('Pipeline', 'DetectWorkers', fallback=1)
+        ocr_workers = pipeline_config.getint('Pipeline', 'OCRWorkers', fallback=1)
+        self.frames_decoded = 0
+        self.sampling = video.sampling_options(pipeline_config) # Analysis rate and resolution for files
+        self.warm_up = pipeline_config.getboolean('Inference', 'WarmUp', fallback=True)
+
+        # Static frames are skipped before they reach detection
+        self.motion_gate = motion.MotionGate.from_config(pipeline_config)
+
+        # Tracking reads each vehicle once and stores one row per track. It needs frames in order,
+        # so detection and OCR run on one worker each
+        self.tracker = None
+        if pipeline_config.getboolean('Tracking', 'Enabled', fallback=True):
+            self.tracker = tracking.PlateTracker.from_config(pipeline_config)
+            detect_workers = ocr_workers = 1
+
+        self.frame_queue = BoundedQueue(queue_size, drop_policy, keep_every_n, name='frame')
+        self.ocr_queue = BoundedQueue(queue_size, drop_policy, keep_every_n, name='ocr')
+        self.persist_queue = BoundedQueue(queue_size * 4, name='persist') # Results are never dropped
+
+        self.detect_stage = Stage('detect', self._detect, detect_workers, self.frame_queue, self.ocr_queue,
+                                  batch_size=processor.batch_size, max_wait=processor.max_batch_wait)
+        self.ocr_stage = Stage('ocr', self._ocr, ocr_workers, self.ocr_queue, self.persist_queue,
+                               batch_size=processor.batch_size, on_exit=self._flush_tracks)
+        self.persist_stage = Stage('persist', self._persist, 1, self.persist_queue,
+                                   batch_size=64, on_exit=self._close_db)
+        self.stages = [self.detect_stage, self.ocr_stage, self.persist_stage]
+        self.decode_thread = None
+
+    def start(self):
+        if self.warm_up: # Models load and warm up while the source is opened, detection waits for both
+            self.processor.start_warmup()
+        for stage in self.stages:
+            stage.start()
+        self.decode_thread = threading.Thread(target=self._decode, name='decode', daemon=True)
+        self.decode_thread.start()
+        utils.log_message(f"Pipeline started for source {self.source}")
+
+    def stop(self):
+        """Stops decoding, frames already queued are still processed."""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        if self.decode_thread:
+            self.decode_thread.join(timeout)
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def run(self):
+        """Runs the pipeline until the source ends or stop() is called, then returns the stats."""
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join()
+        utils.log_message(f"Pipeline finished: {self.stats()}")
+        return self.stats()
+
+    def stats(self):
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_detected': self.detect_stage.processed,
+            'frames_ocr': self.ocr_stage.processed,
+            'frames_persisted': self.persist_stage.processed,
+            'frames_dropped': self.frame_queue.dropped + self.ocr_queue.dropped,
+            'frames_static': self.motion_gate.frames_skipped if self.motion_gate else 0,
+            'tracking': dict(self.tracker.stats) if self.tracker else None,
+            'queue_depths': {
+                'frame': self.frame_queue.qsize(),
+                'ocr': self.ocr_queue.qsize(),
+                'persist': self.persist_queue.qsize()
+            }
+        }
+
+    def _decode(self):
+        try:
+            decode_start = time.perf_counter()
+            for frame_index, frame, detection_ts in video.sample_frames(self.source, self.stop_event,
+                                                                        **self.sampling):
+                DECODE_SECONDS.observe(time.perf_counter() - decode_start)
+                self._queue_frame(frame_index, frame, detection_ts)
+                decode_start = time.perf_counter()
+        except Exception as e:
+            utils.log_message(f"Error decoding {self.source}: {e}", level="ERROR")
+        finally:
+            self.frame_queue.put(STOP, force=True)
+
+    def _queue_frame(self, frame_index, frame, detection_ts=None):
+        self.frames_decoded += 1
+        FRAMES_DECODED.inc()
+        if self.on_frame:
+            self.on_frame(frame)
+        if self.motion_gate and not self.motion_gate.check(frame):
+            FRAMES_STATIC.inc()
+            return # Nothing changed, skip detection and OCR
+        self.frame_queue.put(FrameItem(frame_index, frame, detection_ts))
+
+    def _detect(self, items):
+        self.processor.wait_until_ready() # The warm-up must not share the models with real frames
+        coords_per_frame = self.processor.detect([item.frame for item in items], roi=self.roi)
+        for item, coords in zip(items, coords_per_frame):
+            item.coords = coords
+            if self.on_detect:
+                self.on_detect(item)
+            if coords or self.tracker: # Without tracking, frames without vehicles end here
+                self.ocr_queue.put(item)
+
+    def _ocr(self, items):
+        frames, coords_per_frame = [item.frame for item in items], [item.coords for item in items]
+        timestamps = [item.timestamp for item in items]
+        if self.tracker:
+            plates_per_frame = self.processor.read_tracked_plates(frames, coords_per_frame,
+                                                                  [item.index for item in items], self.tracker,
+                                                                  timestamps=timestamps)
+        else:
+            plates_per_frame = self.processor.read_plates(frames, coords_per_frame, timestamps=timestamps)
+        for item, plates in zip(items, plates_per_frame):
+            item.plates = plates
+            if plates:
+                self.persist_queue.put(item)
+
+    def _flush_tracks(self):
+        """At the end of the stream the tracks still in view are finished and stored."""
+        if not self.tracker:
+            return
+        plates = [self.processor.build_track_plate_data(track)
+                  for track in self.tracker.flush() if track.voted_plate()]
+        if plates:
+            item = FrameItem(self.frames_decoded, None)
+            item.plates = plates
+            self.persist_queue.put(item)
+
+    def _persist(self, items):
+        db_conn = self.db_conn or getattr(self.local, 'db_conn', None)
+        if db_conn is None: # SQLite connections must stay in the thread that opened them
+            db_conn = self.local.db_conn = self.db_factory()
+        for item in items:
+            for plate_data in item.plates:
+                frame = plate_data.pop('frame', None) # Tracked plates carry the frame of their best read
+                db_id = db_conn.insert_plate_data(plate_data)
+                if db_id is not None:
+                    plate_data['id'] = db_id
+                PLATES_STORED.inc()
+                if self.evidence:
+                    self.evidence.submit(plate_data, item.frame if frame is None else frame,
+                                         on_stored=db_conn.set_image_path)
+                if self.watchlist:
+                    self.watchlist.check(plate_data)
+                if self.on_plate:
+                    self.on_plate(plate_data)
+
+    def _close_db(self):
+        db_conn = getattr(self.local, 'db_conn', None)
+        if db_conn is not None:
+            if self.evidence: # The image_path updates must reach the writer before it closes
+                self.evidence.flush()
+            db_conn.close()
+            self.local.db_conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the VisionGuard ALPR pipeline without the GUI.")
+    parser.add_argument('source', help="Video file, stream URL or camera index")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Run inference in this many worker processes instead of threads (0 = one per core)")
+    args = parser.parse_args()
+    exporters = metrics.start_exporters(config)
+
+    def print_plate(plate):
+        print(f"Detected: {plate['plate_number']}, Timestamp: {plate['detection_time']}")
+
+    if args.processes is not None:
+        import src.workers as workers
+        db_conn = db.start_batch_writer()
+        try:
+            with workers.InferencePool(config, processes=args.processes or None) as pool:
+                tracker = None
+                if config.getboolean('Tracking', 'Enabled', fallback=True):
+                    tracker = tracking.PlateTracker.from_config(config)
+                workers.process_source(pool, args.source, db_conn, on_plate=print_plate,
+                                       motion_gate=motion.MotionGate.from_config(config),
+                                       sampling=video.sampling_options(config), tracker=tracker)
+        finally:
+            db_conn.close()
+    else:
+        import src.alpr as alpr
+        evidence_store = evidence.EvidenceStore.from_config(config)
+        if evidence_store:
+            evidence_store.start()
+        pipeline = StreamingPipeline(alpr.ALPRProcessor(config), args.source, on_plate=print_plate,
+                                     watchlist=watchlist.Watchlist.from_config(config), evidence=evidence_store)
+        pipeline.run()
+        if evidence_store:
+            evidence_store.close()
+    metrics.stop_exporters(exporters)
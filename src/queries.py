@@ -0,0 +1,136 @@
+import argparse
+import datetime
+import heapq
+import itertools
+import re
+import src.database as db
+import src.utils as utils
+
+PLATE_COLUMNS = ('id', 'plate_number', 'image_path', 'detection_time', 'location', 'user_id', 'detection_ts')
+SELECT_PLATES = f"SELECT {', '.join(PLATE_COLUMNS)} FROM {{table}}"
+WILDCARD_PATTERN = re.compile(r'^[A-Z0-9*?]+$')
+
+
+def row_to_plate(row):
+    return dict(zip(PLATE_COLUMNS, row))
+
+
+def to_glob(pattern):
+    """
+    Turns a plate pattern with * (any run) and ? (one character) into a GLOB pattern.
+    GLOB is case sensitive, so SQLite can use the plate_number index for the literal prefix.
+    """
+    pattern = pattern.replace(" ", "").upper()
+    if not WILDCARD_PATTERN.match(pattern):
+        raise ValueError(f"Plate patterns may only contain letters, digits, * and ?: {pattern}")
+    return pattern
+
+
+class PlateQueries:
+    """
+    Read-only queries over license_plates and its day partitions, each one served by an index.
+    Partitions hold disjoint days, so time-ordered queries read them one at a time in
+    time order and stop as soon as the limit is reached; old partitions cost nothing.
+    """
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+
+    def find_plate(self, plate_number, limit=100):
+        """Exact plate lookup, newest sightings first."""
+        return self._fetch_in_order(reversed(self.db_conn.plate_tables()), "plate_number = ?",
+                                    (plate_number.replace(" ", "").upper(),), "detection_ts DESC, id DESC", limit)
+
+    def search_plates(self, pattern, limit=100):
+        """
+        Prefix and wildcard search, e.g. 'AB12*' or 'A?C123'. Plates match in every partition,
+        so each table gives its first limit rows and the sorted lists are merged.
+        """
+        glob = to_glob(pattern)
+        per_table = [self._fetch(f"{SELECT_PLATES.format(table=table)} WHERE plate_number GLOB ? "
+                                 f"ORDER BY plate_number, detection_ts DESC LIMIT ?", (glob, limit))
+                     for table in self.db_conn.plate_tables()]
+        merged = heapq.merge(*per_table, key=lambda plate: (plate['plate_number'], -plate['detection_ts']))
+        return list(itertools.islice(merged, limit))
+
+    def plates_between(self, start_ts, end_ts, limit=1000, after=None):
+        """
+        Sightings with start_ts <= detection_ts < end_ts (epoch seconds), oldest first.
+        Pass the last returned (detection_ts, id) pair as after to get the next page.
+        """
+        tables = self.tables_between(start_ts, end_ts)
+        if after is None:
+            return self._fetch_in_order(tables, "detection_ts >= ? AND detection_ts < ?", (start_ts, end_ts),
+                                        "detection_ts, id", limit)
+        last_ts, last_id = after
+        return self._fetch_in_order(tables, "detection_ts < ? AND (detection_ts > ? OR (detection_ts = ? AND id > ?))",
+                                    (end_ts, last_ts, last_ts, last_id), "detection_ts, id", limit)
+
+    def latest_plates(self, limit=50, before=None):
+        """
+        The newest sightings. Pass the last returned (detection_ts, id) pair as before
+        to get the next page, keyset pagination keeps deep pages as cheap as the first.
+        """
+        tables = reversed(self.db_conn.plate_tables())
+        if before is None:
+            return self._fetch_in_order(tables, None, (), "detection_ts DESC, id DESC", limit)
+        last_ts, last_id = before
+        return self._fetch_in_order(tables, "detection_ts < ? OR (detection_ts = ? AND id < ?)",
+                                    (last_ts, last_ts, last_id), "detection_ts DESC, id DESC", limit)
+
+    def tables_between(self, start_ts, end_ts):
+        """license_plates and the partitions of the days between start_ts and end_ts, oldest first."""
+        first_day = datetime.date.fromtimestamp(start_ts)
+        last_day = datetime.date.fromtimestamp(max(start_ts, end_ts - 1))
+        return [table for table in self.db_conn.plate_tables()
+                if db.partition_day(table) is None or first_day <= db.partition_day(table) <= last_day]
+
+    def explain(self, sql, params=()):
+        """The query plan of a statement, used to check that a query uses an index."""
+        return [row[-1] for row in self.db_conn.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def _fetch_in_order(self, tables, where, params, order_by, limit):
+        """Queries the tables one after another, in the order given, until limit rows are found."""
+        plates = []
+        for table in tables:
+            sql = SELECT_PLATES.format(table=table) + (f" WHERE {where}" if where else "")
+            plates.extend(self._fetch(f"{sql} ORDER BY {order_by} LIMIT ?", params + (limit - len(plates),)))
+            if len(plates) >= limit:
+                break
+        return plates
+
+    def _fetch(self, sql, params):
+        return [row_to_plate(row) for row in self.db_conn.conn.execute(sql, params)]
+
+
+def page_key(plate):
+    """The (detection_ts, id) pair of the last row of a page, for fetching the next one."""
+    return plate['detection_ts'], plate['id']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the VisionGuard plate database.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--plate', help="Exact plate number")
+    group.add_argument('--search', help="Plate pattern with * and ? wildcards")
+    group.add_argument('--between', nargs=2, metavar=('START', 'END'),
+                       help=f"Time range, as '{utils.TIMESTAMP_FORMAT}' local time")
+    group.add_argument('--latest', type=int, metavar='N', help="The N newest sightings")
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    db_conn = db.connect_to_db()
+    try:
+        queries = PlateQueries(db_conn)
+        if args.plate:
+            plates = queries.find_plate(args.plate, args.limit)
+        elif args.search:
+            plates = queries.search_plates(args.search, args.limit)
+        elif args.between:
+            plates = queries.plates_between(utils.parse_timestamp(args.between[0]),
+                                            utils.parse_timestamp(args.between[1]), args.limit)
+        else:
+            plates = queries.latest_plates(args.latest)
+        for plate in plates:
+            print(f"{plate['id']}\t{plate['plate_number']}\t{plate['detection_time']}\t{plate['location']}")
+    finally:
+        db_conn.close()
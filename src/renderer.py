@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+import cv2
+from PIL import Image
+
+BOX_COLOR = (0, 255, 0) # BGR
+TEXT_COLOR = (0, 255, 255)
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox between the decode thread and the GUI. Producers replace the
+    frame waiting in the slot, so the GUI always shows the newest frame and stale
+    frames are dropped instead of queueing up behind a slow display.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.dropped = 0
+
+    def put(self, frame):
+        with self.lock:
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = frame
+
+    def take(self):
+        """The newest frame, or None when nothing new arrived since the last call."""
+        with self.lock:
+            frame, self.frame = self.frame, None
+            return frame
+
+
+class Overlays:
+    """The latest detection boxes and plate reads, drawn on top of every displayed frame."""
+    def __init__(self, max_age=1.0, max_plates=3):
+        self.lock = threading.Lock()
+        self.max_age = max_age
+        self.max_plates = max_plates
+        self.boxes = []
+        self.boxes_time = 0.0
+        self.plates = [] # (plate_number, time read), newest last
+
+    def set_boxes(self, boxes):
+        with self.lock:
+            self.boxes, self.boxes_time = list(boxes), time.monotonic()
+
+    def add_plates(self, plate_numbers):
+        with self.lock:
+            now = time.monotonic()
+            self.plates = (self.plates + [(plate_number, now) for plate_number in plate_numbers])[-self.max_plates:]
+
+    def current(self):
+        """Boxes and plate texts that are recent enough to still describe the picture."""
+        with self.lock:
+            now = time.monotonic()
+            boxes = self.boxes if now - self.boxes_time <= self.max_age else []
+            plates = [plate for plate, read_at in self.plates if now - read_at <= self.max_age * 3]
+            return boxes, plates
+
+
+def fit_size(width, height, max_width, max_height):
+    """The largest size with the frame's aspect ratio that fits the widget, frames are never upscaled."""
+    if max_width <= 1 or max_height <= 1:
+        return width, height # The widget has not been laid out yet
+    scale = min(1.0, max_width / float(width), max_height / float(height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def prepare_frame(frame, max_width, max_height, boxes=(), plates=()):
+    """
+    Downscales the frame to the widget first, so the overlay drawing, colour conversion and
+    PIL copy only touch the pixels that are shown. Boxes are in full-frame coordinates.
+    Returns an RGB PIL image.
+    """
+    height, width = frame.shape[:2]
+    display_width, display_height = fit_size(width, height, max_width, max_height)
+    if (display_width, display_height) != (width, height):
+        small = cv2.resize(frame, (display_width, display_height), interpolation=cv2.INTER_AREA)
+    else:
+        small = frame.copy() # Never draw on the frame the pipeline is still using
+    scale = display_width / float(width)
+    for x1, y1, x2, y2 in boxes:
+        cv2.rectangle(small, (int(x1 * scale), int(y1 * scale)), (int(x2 * scale), int(y2 * scale)), BOX_COLOR, 2)
+    for line, plate_number in enumerate(plates):
+        cv2.putText(small, plate_number, (8, 24 + line * 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7, TEXT_COLOR, 2)
+    return Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+
+
+def drain(message_queue, max_items=200):
+    """Takes up to max_items messages off the queue without blocking."""
+    messages = []
+    while len(messages) < max_items:
+        try:
+            messages.append(message_queue.get_nowait())
+        except queue.Empty:
+            break
+    return messages
+
+
+class FrameRenderer:
+    """
+    Draws the newest frame onto one Tk canvas from a window.after loop, so only the Tk
+    thread touches Tk. The canvas image item and its PhotoImage are reused; a new
+    PhotoImage is only made when the displayed size changes.
+    """
+    def __init__(self, window, canvas, fps=30):
+        self.window = window
+        self.canvas = canvas
+        self.interval = max(1, int(1000 / fps))
+        self.latest = LatestFrame()
+        self.overlays = Overlays()
+        self.photo = None
+        self.image_item = None
+        self.frames_shown = 0
+        self.running = False
+
+    def submit(self, frame):
+        """Thread-safe, called with every decoded frame."""
+        self.latest.put(frame)
+
+    def start(self):
+        self.running = True
+        self.window.after(self.interval, self._tick)
+
+    def stop(self):
+        self.running = False
+
+    def _tick(self):
+        if not self.running:
+            return
+        frame = self.latest.take()
+        if frame is not None:
+            self._show(frame)
+        self.window.after(self.interval, self._tick)
+
+    def _show(self, frame):
+        from PIL import ImageTk # Needs tkinter, so only the GUI imports it
+        boxes, plates = self.overlays.current()
+        image = prepare_frame(frame, self.canvas.winfo_width(), self.canvas.winfo_height(), boxes, plates)
+        if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+            self.photo = ImageTk.PhotoImage(image)
+            if self.image_item is None:
+                self.image_item = self.canvas.create_image(0, 0, anchor='nw', image=self.photo)
+            else:
+                self.canvas.itemconfig(self.image_item, image=self.photo)
+        else:
+            self.photo.paste(image) # Reuse the Tk image buffer
+        self.frames_shown += 1
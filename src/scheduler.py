@@ -0,0 +1,390 @@
+import argparse
+import configparser
+import threading
+import time
+import src.database as db
+import src.evidence as evidence
+import src.metrics as metrics
+import src.motion as motion
+import src.tracking as tracking
+import src.utils as utils
+import src.video as video
+import src.watchlist as watchlist
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+SCHEDULING_POLICIES = ('fair', 'deadline')
+
+
+class CameraSource:
+    """
+    One registered camera or video file. The reader thread keeps only the newest
+    frame of a live source, older frames are dropped rather than queued. Files
+    wait until their frame has been taken, so no frame of a file is lost.
+    """
+    def __init__(self, name, source, target_fps=5.0, priority=1.0):
+        if priority <= 0:
+            raise ValueError(f"Camera priority must be positive: {priority}")
+        self.name = name
+        self.source = source
+        self.target_fps = target_fps
+        self.period = 1.0 / target_fps if target_fps > 0 else 0.0 # 0 means as fast as possible
+        self.priority = priority
+        self.live = video.is_live_source(source)
+        self.roi = None
+        self.motion_gate = None
+        self.frame = None # Newest frame waiting to be scheduled
+        self.frame_index = None
+        self.frame_ts = None # Detection time of the waiting frame
+        self.next_due = 0.0 # When the next frame may be scheduled, to hold target_fps
+        self.pass_value = 0.0 # Virtual time for fair-share scheduling
+        self.finished = False
+        self.tracker = None # PlateTracker of this camera when tracking is enabled
+        self.busy = False # A tracked frame is being processed, the next one has to wait for it
+        self.tracks_flushed = False
+        self.thread = None
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.frames_static = 0
+        self.frames_processed = 0
+        self.plates = 0
+        self.started = None
+
+    def deadline(self):
+        """The frame should be done within period/priority of becoming due, so priority tightens it."""
+        return self.next_due + self.period / self.priority
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {'source': str(self.source), 'target_fps': self.target_fps, 'priority': self.priority,
+                'frames_decoded': self.frames_decoded, 'frames_dropped': self.frames_dropped,
+                'frames_static': self.frames_static, 'frames_processed': self.frames_processed,
+                'plates': self.plates,
+                'processed_fps': round(self.frames_processed / elapsed, 2) if elapsed else 0.0}
+
+
+class CameraScheduler:
+    """
+    Headless multi-camera mode. Every source has its own reader thread, and a shared
+    pool of ALPRProcessor workers takes frames from whichever cameras are due:
+    'fair' gives each camera a share of the workers proportional to its priority
+    (stride scheduling), 'deadline' serves the earliest frame deadline first.
+    A camera is never served faster than its target FPS, so a busy camera cannot
+    starve the others. A worker batches frames of several cameras into one model call.
+    """
+    def __init__(self, processor_factory, workers=2, policy='fair', batch_size=None, scheduler_config=None,
+                 db_conn=None, db_factory=None, on_plate=None, watchlist=None, evidence=None):
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.scheduler_config = scheduler_config or config
+        self.processor_factory = processor_factory
+        self.workers = max(1, workers)
+        self.policy = policy
+        self.batch_size = batch_size
+        self.db_conn = db_conn # Shared connection or writer owned by the caller, never closed here
+        self.db_factory = db_factory or db.start_batch_writer
+        self.owns_db = False
+        self.on_plate = on_plate
+        self.watchlist = watchlist
+        self.evidence = evidence # Shared EvidenceStore owned by the caller
+        self.cameras = {}
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.worker_threads = []
+        self.roi_processor = None # Resolves the [ROI] entry of each camera
+        # Tracking stores one row per vehicle, each camera follows its own vehicles in frame order
+        self.tracking = self.scheduler_config.getboolean('Tracking', 'Enabled', fallback=True)
+        self.warm_up = self.scheduler_config.getboolean('Inference', 'WarmUp', fallback=True)
+        self.sampling = video.sampling_options(self.scheduler_config)
+        self.frames_scheduled = metrics.registry.counter('scheduler_frames_total', "Frames handed to the workers.")
+
+    @classmethod
+    def from_config(cls, processor_factory, scheduler_config=None, **kwargs):
+        scheduler_config = scheduler_config or config
+        scheduler = cls(processor_factory,
+                        workers=scheduler_config.getint('Scheduler', 'Workers', fallback=2),
+                        policy=scheduler_config.get('Scheduler', 'Policy', fallback='fair'),
+                        scheduler_config=scheduler_config, **kwargs)
+        for name, source, target_fps, priority in cameras_from_config(scheduler_config):
+            scheduler.add_source(name, source, target_fps, priority)
+        return scheduler
+
+    def add_source(self, name, source, target_fps=5.0, priority=1.0):
+        """Registers a camera, it starts reading right away when the scheduler is already running."""
+        camera = CameraSource(name, source, target_fps, priority)
+        camera.motion_gate = motion.MotionGate.from_config(self.scheduler_config)
+        if self.tracking:
+            camera.tracker = tracking.PlateTracker.from_config(self.scheduler_config)
+        with self.condition:
+            if name in self.cameras:
+                raise ValueError(f"A camera named {name} is already registered")
+            # Start level with the others, a new camera must not get a burst of catching up
+            camera.pass_value = min((other.pass_value for other in self.cameras.values()), default=0.0)
+            self.cameras[name] = camera
+        if self.worker_threads:
+            camera.roi = self.roi_processor.roi_for_source(source)
+            self._start_reader(camera)
+        return camera
+
+    def start(self):
+        if self.db_conn is None:
+            self.db_conn = self.db_factory()
+            self.owns_db = True
+        for index in range(self.workers):
+            processor = self.processor_factory()
+            if index == 0: # ROIs come from config, one processor can resolve them for every camera
+                self.roi_processor = processor
+                for camera in self.cameras.values():
+                    camera.roi = processor.roi_for_source(camera.source)
+            thread = threading.Thread(target=self._work, args=(processor,), name=f"camera-worker-{index}",
+                                      daemon=True)
+            thread.start()
+            self.worker_threads.append(thread)
+        for camera in list(self.cameras.values()):
+            self._start_reader(camera)
+        utils.log_message(f"Scheduler started: {len(self.cameras)} cameras, {self.workers} workers, "
+                          f"{self.policy} scheduling.")
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def join(self, timeout=None):
+        for camera in list(self.cameras.values()):
+            if camera.thread:
+                camera.thread.join(timeout)
+        for thread in self.worker_threads:
+            thread.join(timeout)
+        for camera in list(self.cameras.values()): # Tracks still in view when the scheduler was stopped
+            with self.condition:
+                camera.frame = None
+                flush = self._ready_to_flush(camera)
+            if flush:
+                self._flush_tracks(camera, self.roi_processor)
+        if self.owns_db:
+            if self.evidence: # The image_path updates must reach the writer before it closes
+                self.evidence.flush()
+            self.db_conn.close()
+            self.db_conn, self.owns_db = None, False
+
+    def run(self):
+        """Runs until every source has ended or stop() is called, then returns the stats."""
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self.worker_threads):
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            self.stop()
+        self.join()
+        utils.log_message(f"Scheduler finished: {self.stats()}")
+        return self.stats()
+
+    def stats(self):
+        with self.condition:
+            return {name: camera.stats() for name, camera in self.cameras.items()}
+
+    def next_batch(self, max_count=1):
+        """
+        Blocks until at least one camera has a due frame and returns up to max_count
+        (camera, frame_index, frame, detection_ts) jobs, at most one per camera. A tracked camera is not
+        served again until its previous frame is done. Returns None once every source has ended, when no
+        camera is registered, or stop() was called.
+        """
+        with self.condition:
+            while not self.stop_event.is_set() and self.cameras:
+                now = time.monotonic()
+                pending = [camera for camera in self.cameras.values() if camera.frame is not None]
+                waiting = [camera for camera in pending if not camera.busy]
+                due = [camera for camera in waiting if camera.next_due <= now]
+                if due:
+                    jobs = [self._take(camera, now) for camera in sorted(due, key=self._order)[:max_count]]
+                    self.condition.notify_all() # File readers wait for their frame to be taken
+                    return jobs
+                if not pending and all(camera.finished for camera in self.cameras.values()):
+                    return None
+                # Sleep until the next frame falls due, or a reader delivers a new one
+                timeout = min((camera.next_due - now for camera in waiting), default=None)
+                self.condition.wait(timeout)
+            return None
+
+    def _order(self, camera):
+        if self.policy == 'deadline':
+            return camera.deadline(), -camera.priority
+        return camera.pass_value, camera.next_due
+
+    def _take(self, camera, now):
+        job = (camera, camera.frame_index, camera.frame, camera.frame_ts)
+        camera.frame = None
+        camera.busy = camera.tracker is not None # The tracker needs the camera's frames in order
+        # Never schedule faster than target_fps, and do not build up a backlog to catch up on
+        camera.next_due = max(camera.next_due + camera.period, now)
+        camera.pass_value += 1.0 / camera.priority
+        self.frames_scheduled.inc()
+        return job
+
+    def _start_reader(self, camera):
+        camera.started = time.monotonic()
+        camera.thread = threading.Thread(target=self._read, args=(camera,), name=f"camera-{camera.name}",
+                                         daemon=True)
+        camera.thread.start()
+
+    def _read(self, camera):
+        try:
+            # Files are only decoded at the camera's rate, live sources drop frames below instead
+            sampling = dict(self.sampling, analysis_fps=0 if camera.live else camera.target_fps)
+            for frame_index, frame, detection_ts in video.sample_frames(camera.source, self.stop_event, **sampling):
+                camera.frames_decoded += 1
+                if camera.motion_gate and not camera.motion_gate.check(frame):
+                    camera.frames_static += 1
+                    continue # Nothing changed, skip detection and OCR
+                with self.condition:
+                    if camera.live:
+                        if camera.frame is not None:
+                            camera.frames_dropped += 1 # Replaced by a newer frame before it was scheduled
+                    else:
+                        while camera.frame is not None and not self.stop_event.is_set():
+                            self.condition.wait()
+                    camera.frame, camera.frame_index, camera.frame_ts = frame, frame_index, detection_ts
+                    self.condition.notify_all()
+        except Exception as e:
+            utils.log_message(f"Error reading camera {camera.name} ({camera.source}): {e}", level="ERROR")
+        finally:
+            with self.condition:
+                camera.finished = True
+                flush = self._ready_to_flush(camera)
+                self.condition.notify_all()
+            if flush:
+                self._flush_tracks(camera, self.roi_processor)
+
+    def _work(self, processor):
+        if self.warm_up: # Only take frames once the models are warm
+            processor.warm_up()
+        batch_size = self.batch_size or processor.batch_size
+        while True:
+            jobs = self.next_batch(batch_size)
+            if jobs is None:
+                break
+            try:
+                self._process(processor, jobs)
+            except Exception as e:
+                utils.log_message(f"Error processing camera frames: {e}", level="ERROR")
+            for camera, _, _, _ in jobs:
+                if camera.tracker is not None:
+                    self._release(camera, processor)
+
+    def _process(self, processor, jobs):
+        # Cameras with the same region of interest share one detection call
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job[0].roi, []).append(job)
+        for roi, group in groups.items():
+            frames = [frame for _, _, frame, _ in group]
+            coords_per_frame = processor.detect(frames, roi=roi)
+            if self.tracking: # A batch holds at most one frame of each camera, and each camera has its own tracker
+                plates_per_frame = [processor.read_tracked_plates([frame], [coords], [frame_index], camera.tracker,
+                                                                  timestamps=[detection_ts])[0]
+                                    for (camera, frame_index, frame, detection_ts), coords
+                                    in zip(group, coords_per_frame)]
+            else:
+                plates_per_frame = processor.read_plates(frames, coords_per_frame,
+                                                         timestamps=[detection_ts for _, _, _, detection_ts in group])
+            for (camera, _, frame, _), plates in zip(group, plates_per_frame):
+                camera.frames_processed += 1
+                for plate_data in plates:
+                    camera.plates += 1
+                    self._store(camera, plate_data, frame)
+
+    def _release(self, camera, processor):
+        """Lets the next frame of a tracked camera be scheduled, and flushes its tracker once the source has ended."""
+        with self.condition:
+            camera.busy = False
+            flush = self._ready_to_flush(camera)
+            self.condition.notify_all()
+        if flush:
+            self._flush_tracks(camera, processor)
+
+    def _ready_to_flush(self, camera):
+        """
+        True, once, when the camera's source has ended and its last frame is done. Called with the condition
+        held, so exactly one of the reader and the workers flushes the tracker.
+        """
+        if camera.tracker is None or camera.tracks_flushed or not camera.finished:
+            return False
+        if camera.busy or camera.frame is not None:
+            return False
+        camera.tracks_flushed = True
+        return True
+
+    def _flush_tracks(self, camera, processor):
+        """At the end of a source the tracks still in view are finished and stored."""
+        try:
+            for track in camera.tracker.flush():
+                if track.voted_plate():
+                    camera.plates += 1
+                    self._store(camera, processor.build_track_plate_data(track))
+        except Exception as e:
+            utils.log_message(f"Error storing the tracks of camera {camera.name}: {e}", level="ERROR")
+
+    def _store(self, camera, plate_data, frame=None):
+        frame = plate_data.pop('frame', frame) # Tracked plates carry the frame of their best read
+        plate_data['location'] = camera.name
+        db_id = self.db_conn.insert_plate_data(plate_data)
+        if db_id is not None:
+            plate_data['id'] = db_id
+        if self.evidence:
+            self.evidence.submit(plate_data, frame, on_stored=self.db_conn.set_image_path)
+        if self.watchlist:
+            self.watchlist.check(plate_data)
+        if self.on_plate:
+            self.on_plate(plate_data)
+
+
+def cameras_from_config(cameras_config):
+    """The [Cameras] entries, written as 'name = source, target fps, priority'."""
+    cameras = []
+    if not cameras_config.has_section('Cameras'):
+        return cameras
+    for name, value in cameras_config.items('Cameras'):
+        parts = [part.strip() for part in value.rsplit(',', 2)] # Stream URLs may contain commas
+        if len(parts) != 3:
+            raise ValueError(f"Camera {name} must be 'source, target fps, priority': {value}")
+        cameras.append((name, parts[0], float(parts[1]), float(parts[2])))
+    return cameras
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the VisionGuard ALPR pipeline on several cameras at once.")
+    parser.add_argument('--camera', nargs=4, action='append', default=[],
+                        metavar=('NAME', 'SOURCE', 'FPS', 'PRIORITY'),
+                        help="Adds a camera, in addition to the [Cameras] section of config.ini")
+    parser.add_argument('--workers', type=int, help="Number of ALPRProcessor instances")
+    parser.add_argument('--policy', choices=SCHEDULING_POLICIES)
+    args = parser.parse_args()
+    if not args.camera and not cameras_from_config(config):
+        parser.error("No cameras: add them to the [Cameras] section of config.ini or pass --camera")
+
+    import src.alpr as alpr
+
+    def print_plate(plate):
+        print(f"[{plate['location']}] Detected: {plate['plate_number']}, Timestamp: {plate['detection_time']}")
+
+    exporters = metrics.start_exporters(config)
+    evidence_store = evidence.EvidenceStore.from_config(config)
+    if evidence_store:
+        evidence_store.start()
+    scheduler = CameraScheduler.from_config(lambda: alpr.ALPRProcessor(config), on_plate=print_plate,
+                                            watchlist=watchlist.Watchlist.from_config(config),
+                                            evidence=evidence_store)
+    if args.workers:
+        scheduler.workers = args.workers
+    if args.policy:
+        scheduler.policy = args.policy
+    for name, source, target_fps, priority in args.camera:
+        scheduler.add_source(name, source, float(target_fps), float(priority))
+    scheduler.run()
+    if evidence_store:
+        evidence_store.close()
+    metrics.stop_exporters(exporters)
@@ -0,0 +1,132 @@
+import itertools
+
+
+def box_iou(box_a, box_b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    inter_w = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    inter_h = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return intersection / float(area_a + area_b - intersection)
+
+
+class Track:
+    """One vehicle followed across consecutive frames, with the plate reads collected for it."""
+    def __init__(self, track_id, box, frame_index):
+        self.track_id = track_id
+        self.box = box
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.votes = {} # plate text -> summed OCR confidence
+        self.attempts = 0 # OCR runs on this track, including ones that read nothing
+        self.best_confidence = 0.0
+        self.pending_ocr = False # A crop of this track is waiting for OCR
+        self.evidence = None # (frame, box) of the best read
+        self.read_ts = None # Detection time of the frame of the best read
+
+    def add_read(self, plate_number, confidence):
+        self.pending_ocr = False
+        self.attempts += 1
+        if not plate_number:
+            return
+        self.votes[plate_number] = self.votes.get(plate_number, 0.0) + confidence
+        self.best_confidence = max(self.best_confidence, confidence)
+
+    def voted_plate(self):
+        """The plate text with the highest summed confidence, or None if nothing was read."""
+        if not self.votes:
+            return None
+        return max(self.votes.items(), key=lambda vote: vote[1])[0]
+
+
+class PlateTracker:
+    """
+    IoU tracker over the vehicle boxes from extract_license_plate_coordinates.
+    OCR runs once per track and again only while the best read is below
+    min_confidence, and every finished track yields a single plate.
+    Frames must be fed in order. Frame indexes may skip, as with AnalysisFPS sampling:
+    max_missed counts analysed frames, the smallest step seen between two updates.
+    """
+    def __init__(self, iou_threshold=0.3, max_missed=5, min_confidence=0.6, max_reads=3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed # Analysed frames a track may go unseen before it is finished
+        self.frame_step = None # Source frames between analysed frames
+        self.last_index = None
+        self.min_confidence = min_confidence
+        self.max_reads = max_reads
+        self.tracks = []
+        self.next_id = itertools.count(1)
+        self.stats = {'tracks_started': 0, 'tracks_finished': 0, 'ocr_requested': 0, 'ocr_skipped': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(iou_threshold=config.getfloat('Tracking', 'IoUThreshold', fallback=0.3),
+                   max_missed=config.getint('Tracking', 'MaxMissedFrames', fallback=5),
+                   min_confidence=config.getfloat('Tracking', 'MinConfidence', fallback=0.6),
+                   max_reads=config.getint('Tracking', 'MaxReads', fallback=3))
+
+    def update(self, boxes, frame_index):
+        """
+        Matches the boxes of a frame to the live tracks.
+        Returns the track of every box, in box order, and the tracks that finished.
+        """
+        boxes = [tuple(float(value) for value in box) for box in boxes]
+        pairs = sorted(((box_iou(track.box, box), track_index, box_index)
+                        for track_index, track in enumerate(self.tracks)
+                        for box_index, box in enumerate(boxes)), reverse=True)
+        matched_tracks, box_tracks = set(), [None] * len(boxes)
+        for iou, track_index, box_index in pairs: # Greedy matching, best overlaps first
+            if iou < self.iou_threshold:
+                break
+            if track_index in matched_tracks or box_tracks[box_index] is not None:
+                continue
+            track = self.tracks[track_index]
+            track.box = boxes[box_index]
+            track.last_frame = frame_index
+            matched_tracks.add(track_index)
+            box_tracks[box_index] = track
+
+        for box_index, box in enumerate(boxes):
+            if box_tracks[box_index] is None:
+                track = Track(next(self.next_id), box, frame_index)
+                self.tracks.append(track)
+                box_tracks[box_index] = track
+                self.stats['tracks_started'] += 1
+
+        if self.last_index is not None and frame_index > self.last_index:
+            step = frame_index - self.last_index # Dropped or static frames only ever make it larger
+            self.frame_step = step if self.frame_step is None else min(self.frame_step, step)
+        self.last_index = frame_index
+        max_gap = self.max_missed * (self.frame_step or 1)
+        finished = [track for track in self.tracks if frame_index - track.last_frame > max_gap]
+        self.tracks = [track for track in self.tracks if frame_index - track.last_frame <= max_gap]
+        self.stats['tracks_finished'] += len(finished)
+        return box_tracks, finished
+
+    def needs_ocr(self, track):
+        """True if the track has no read yet, or only low confidence reads."""
+        low_confidence = track.best_confidence < self.min_confidence and track.attempts < self.max_reads
+        if not track.pending_ocr and (track.attempts == 0 or low_confidence):
+            return True
+        self.stats['ocr_skipped'] += 1
+        return False
+
+    def request_ocr(self, track):
+        track.pending_ocr = True
+        self.stats['ocr_requested'] += 1
+
+    def finish_started_before(self, frame_index):
+        """Finishes the live tracks that started before frame_index, e.g. a car parked in view."""
+        finished = [track for track in self.tracks if track.first_frame < frame_index]
+        self.tracks = [track for track in self.tracks if track.first_frame >= frame_index]
+        self.stats['tracks_finished'] += len(finished)
+        return finished
+
+    def flush(self):
+        """Finishes every live track, used at the end of a stream."""
+        finished, self.tracks = self.tracks, []
+        self.stats['tracks_finished'] += len(finished)
+        return finished
@@ -2,8 +2,8 @@ import logging
 import time
 import datetime
 import configparser
-import tkinter as tk
-from tkinter import ttk
+import importlib.util
+import sys
 
 # Load configuration
 config = configparser.ConfigParser()
@@ -31,10 +31,38 @@ def log_message(message, level="INFO"):
         logging.critical(message)
     print(f"{level}: {message}")
 
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 def get_current_timestamp():
-    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+
+def format_timestamp(epoch):
+    """Local time text, as stored in detection_time, for epoch seconds."""
+    return datetime.datetime.fromtimestamp(epoch).strftime(TIMESTAMP_FORMAT)
+
+def parse_timestamp(text):
+    """Epoch seconds for a local time text in TIMESTAMP_FORMAT."""
+    return int(datetime.datetime.strptime(text, TIMESTAMP_FORMAT).timestamp())
+
+def lazy_import(name):
+    """
+    Returns a module that is only really imported on first attribute access, so
+    headless processes do not pay for heavy packages (torch, easyocr) they never use.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
 def show_error(parent, message):
     """Displays an error message in a consistent way."""
+    import tkinter as tk # Only the GUI needs tkinter
     error_label = tk.Label(parent, text=message, fg="red")
     error_label.pack()
\ No newline at end of file
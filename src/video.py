@@ -0,0 +1,127 @@
+import os
+import time
+import cv2
+import src.metrics as metrics
+import src.utils as utils
+
+LIVE_STREAM_PREFIXES = ('rtsp://', 'rtmp://', 'http://', 'https://')
+
+FRAMES_SKIPPED = metrics.registry.counter('frames_skipped_total',
+                                          "Video file frames skipped by frame-stride or keyframe-seek decoding.")
+
+
+def parse_source(source):
+    """Camera indexes may be given as ints or digit strings, anything else is a file path or stream URL."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source.strip())
+    return source
+
+
+def is_live_source(source):
+    """True for cameras and network streams, which cannot wait for a slow consumer."""
+    source = parse_source(source)
+    return isinstance(source, int) or str(source).lower().startswith(LIVE_STREAM_PREFIXES)
+
+
+def open_capture(source):
+    """Opens a video file, stream URL or camera index with OpenCV."""
+    vid = cv2.VideoCapture(parse_source(source))
+    if not vid.isOpened():
+        vid.release()
+        raise ValueError(f"Unable to open video source: {source}")
+    return vid
+
+
+def recording_start(source, vid):
+    """
+    Epoch seconds of the first frame of a video file: its modification time, taken as
+    the end of the recording, minus its duration. Sources that are not plain files, such
+    as image sequences, udp:// or GStreamer pipelines, start when they are opened.
+    """
+    if not (isinstance(source, str) and os.path.isfile(source)):
+        return time.time()
+    fps = vid.get(cv2.CAP_PROP_FPS)
+    duration = vid.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps > 0 else 0.0
+    return os.path.getmtime(source) - duration
+
+
+def resize_to_width(frame, max_width):
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, max(1, round(height * max_width / width))), interpolation=cv2.INTER_AREA)
+
+
+def read_frames(source, stop_event=None, start_frame=0, **sampling):
+    """
+    Yields (frame_index, frame) from the source until it ends or stop_event is set.
+    Video files can start at start_frame, e.g. to resume an interrupted run.
+    Takes the sampling arguments of sample_frames.
+    """
+    for frame_index, frame, _ in sample_frames(source, stop_event, start_frame, **sampling):
+        yield frame_index, frame
+
+
+def sample_frames(source, stop_event=None, start_frame=0, analysis_fps=0, max_width=0, seek_min_stride=0,
+                  start_time=None):
+    """
+    Yields (frame_index, frame, detection_ts) from the source until it ends or stop_event is set.
+    With analysis_fps, video files are read at that rate instead of every frame: the frames
+    in between are only grabbed, never retrieved, and gaps of seek_min_stride frames or more
+    are skipped with a keyframe seek instead (0 never seeks). Frames wider than max_width
+    are scaled down right after decoding. detection_ts (epoch seconds) comes from the frame's
+    position in a file, counted from start_time (recording_start by default), and is the
+    wall clock for cameras and streams.
+    """
+    vid = open_capture(source)
+    live = is_live_source(source)
+    fps = vid.get(cv2.CAP_PROP_FPS)
+    frame_count = vid.get(cv2.CAP_PROP_FRAME_COUNT)
+    step = fps / analysis_fps if analysis_fps and not live and fps > analysis_fps else 1.0
+    if not live and start_time is None:
+        start_time = recording_start(source, vid)
+    frame_index = 0
+    if start_frame:
+        vid.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_index = start_frame
+    next_sample = float(frame_index)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            skip = round(next_sample) - frame_index
+            if skip > 0 and seek_min_stride and skip >= seek_min_stride:
+                if 0 < frame_count <= frame_index + skip: # Seeking past the end
+                    break
+                vid.set(cv2.CAP_PROP_POS_FRAMES, frame_index + skip) # Decodes from the keyframe before it
+                frame_index += skip
+                FRAMES_SKIPPED.inc(skip)
+            elif skip > 0:
+                grabbed = 0
+                while grabbed < skip and vid.grab(): # Decode only, no colour conversion or copy
+                    grabbed += 1
+                frame_index += grabbed
+                FRAMES_SKIPPED.inc(grabbed)
+                if grabbed < skip: # End of video
+                    break
+            ret, frame = vid.read() # Read frame
+            if not ret: # End of video or error
+                break
+            if live:
+                detection_ts = time.time()
+            else:
+                position_ms = vid.get(cv2.CAP_PROP_POS_MSEC)
+                if position_ms <= 0 and frame_index and fps > 0: # Backend without timestamps
+                    position_ms = frame_index * 1000.0 / fps
+                detection_ts = start_time + position_ms / 1000.0
+            yield frame_index, resize_to_width(frame, max_width), detection_ts
+            frame_index += 1
+            next_sample = max(next_sample + step, frame_index)
+    finally: # Ensure the capture is released even if the consumer stops early.
+        vid.release()
+        utils.log_message(f"Video source {source} closed after {frame_index} frames.")
+
+
+def sampling_options(video_config):
+    """sample_frames keyword arguments from the [Video] section."""
+    return {'analysis_fps': video_config.getfloat('Video', 'AnalysisFPS', fallback=0),
+            'max_width': video_config.getint('Video', 'DecodeMaxWidth', fallback=0),
+            'seek_min_stride': video_config.getint('Video', 'SeekMinStride', fallback=0)}
@@ -0,0 +1,165 @@
+import csv
+import sqlite3
+import src.utils as utils
+
+# Characters OCR mixes up are folded onto one representative before matching
+CONFUSABLE_CHARACTERS = str.maketrans({'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1',
+                                       'B': '8', 'S': '5', 'Z': '2', 'G': '6'})
+
+
+def normalize_plate(plate_number):
+    """Upper-cases, strips everything but letters and digits and folds confusable characters."""
+    text = ''.join(char for char in str(plate_number).upper() if char.isalnum())
+    return text.translate(CONFUSABLE_CHARACTERS)
+
+
+def deletion_variants(text, max_distance):
+    """Every string made by deleting up to max_distance characters from text, text included."""
+    variants, frontier = {text}, {text}
+    for _ in range(max_distance):
+        frontier = {item[:index] + item[index + 1:] for item in frontier for index in range(len(item))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(text_a, text_b, max_distance):
+    """Levenshtein distance, stopping early once it exceeds max_distance."""
+    if abs(len(text_a) - len(text_b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(text_b) + 1))
+    for index_a, char_a in enumerate(text_a, 1):
+        current = [index_a]
+        for index_b, char_b in enumerate(text_b, 1):
+            current.append(min(previous[index_b] + 1, current[index_b - 1] + 1,
+                               previous[index_b - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class WatchlistHit:
+    """A plate read that matched a watchlist entry."""
+    def __init__(self, entry, plate_data, distance):
+        self.entry = entry
+        self.plate_data = plate_data
+        self.distance = distance
+
+    def __repr__(self):
+        return f"WatchlistHit({self.entry['plate_number']!r}, distance={self.distance})"
+
+
+class Watchlist:
+    """
+    Hotlist of plates matched against every plate read.
+    Entries are indexed by their normalized key and by every deletion variant of
+    it (the deletion-neighbourhood of the key), so a check is a handful of
+    dictionary lookups no matter how long the list is.
+    """
+    def __init__(self, max_distance=1):
+        self.max_distance = max_distance
+        self.entries = {} # normalized key -> entries with that key
+        self.deletions = {} # deletion variant -> normalized keys it comes from
+        self.listeners = []
+        self.checks = 0
+        self.hits = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Loads the configured watchlist, or returns None when none is configured."""
+        path = config.get('Watchlist', 'Path', fallback='').strip()
+        if not path:
+            return None
+        watchlist = cls(max_distance=config.getint('Watchlist', 'MaxEditDistance', fallback=1))
+        if path.endswith('.csv'):
+            watchlist.load_csv(path, config.get('Watchlist', 'PlateColumn', fallback='plate_number'))
+        else:
+            watchlist.load_sqlite(path, config.get('Watchlist', 'Table', fallback='watchlist'),
+                                  config.get('Watchlist', 'PlateColumn', fallback='plate_number'))
+        return watchlist
+
+    def add(self, plate_number, details=None):
+        """
+        Adds one entry, the details dict (reason, case number...) is kept with it.
+        Returns False when the plate has no letters or digits to match on.
+        """
+        key = normalize_plate(plate_number)
+        if not key:
+            return False
+        entry = dict(details or {}, plate_number=plate_number)
+        if key not in self.entries:
+            self.entries[key] = []
+            for variant in deletion_variants(key, self.max_distance):
+                self.deletions.setdefault(variant, set()).add(key)
+        self.entries[key].append(entry)
+        return True
+
+    def load_csv(self, path, plate_column='plate_number'):
+        with open(path, newline='') as csv_file:
+            reader = csv.DictReader(csv_file)
+            if plate_column not in (reader.fieldnames or []):
+                utils.log_message(f"Watchlist {path} has no {plate_column} column, nothing loaded.", level="ERROR")
+                return self
+            for row in reader:
+                extra = row.pop(None, None) # Fields beyond the header
+                if extra:
+                    utils.log_message(f"Watchlist {path} line {reader.line_num}: ignoring extra fields {extra}",
+                                      level="WARNING")
+                plate_number = row.pop(plate_column, None)
+                if not plate_number or not self.add(plate_number, row):
+                    utils.log_message(f"Watchlist {path} line {reader.line_num}: skipped, no plate number",
+                                      level="WARNING")
+        utils.log_message(f"Loaded watchlist {path}: {len(self)} plates.")
+        return self
+
+    def load_sqlite(self, path, table='watchlist', plate_column='plate_number'):
+        conn = sqlite3.connect(path)
+        try:
+            conn.row_factory = sqlite3.Row
+            for row in conn.execute(f'SELECT * FROM "{table}"'):
+                details = dict(row)
+                plate_number = details.pop(plate_column, None)
+                if plate_number:
+                    self.add(plate_number, details)
+        finally:
+            conn.close()
+        utils.log_message(f"Loaded watchlist {path}:{table}: {len(self)} plates.")
+        return self
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def subscribe(self, listener):
+        """Registers a callable that receives every WatchlistHit."""
+        self.listeners.append(listener)
+
+    def match(self, plate_number):
+        """Returns (entry, distance) pairs for entries within max_distance edits, closest first."""
+        key = normalize_plate(plate_number)
+        if not key:
+            return []
+        candidates = set()
+        for variant in deletion_variants(key, self.max_distance):
+            candidates.update(self.deletions.get(variant, ()))
+        matches = []
+        for candidate in candidates:
+            distance = 0 if candidate == key else edit_distance(key, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                matches.extend((entry, distance) for entry in self.entries[candidate])
+        return sorted(matches, key=lambda match: match[1])
+
+    def check(self, plate_data):
+        """Matches a plate record and raises a hit event for every matching entry."""
+        self.checks += 1
+        hits = [WatchlistHit(entry, plate_data, distance)
+                for entry, distance in self.match(plate_data['plate_number'])]
+        for hit in hits:
+            self.hits += 1
+            utils.log_message(f"Watchlist hit: read {plate_data['plate_number']} matches "
+                              f"{hit.entry['plate_number']} (distance {hit.distance})", level="WARNING")
+            for listener in self.listeners:
+                try:
+                    listener(hit)
+                except Exception as e:
+                    utils.log_message(f"Error in watchlist listener: {e}", level="ERROR")
+        return hits
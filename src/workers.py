@@ -0,0 +1,298 @@
+import collections
+import configparser
+import importlib
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+import src.utils as utils
+
+# Load configuration
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+DEFAULT_PROCESSOR_FACTORY = 'src.alpr:ALPRProcessor'
+
+
+def default_process_count():
+    """One worker per physical core, read from /proc/cpuinfo where available."""
+    try:
+        cores = set()
+        physical_id = None
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return max(1, os.cpu_count() or 1)
+
+
+def load_factory(factory_path):
+    """Resolves a 'module:callable' path, so the factory can be named across process boundaries."""
+    module_name, attribute = factory_path.split(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def attach_shared_memory(name):
+    """Attaches to a block created by the parent without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory') # The parent owns the block
+        return shm
+
+
+def _worker_main(config_sections, factory_path, torch_threads, task_queue, result_queue):
+    """Worker process loop, the models are loaded once and reused for every frame."""
+    # Limit the intra-op threads so N workers do not oversubscribe the cores
+    os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    import cv2
+    cv2.setNumThreads(1)
+
+    worker_config = configparser.ConfigParser()
+    worker_config.read_dict(config_sections)
+    processor = load_factory(factory_path)(worker_config)
+    if worker_config.getboolean('Inference', 'WarmUp', fallback=True):
+        processor.warm_up() # The first real frame should not pay for lazy initialisation
+    result_queue.put(('ready', os.getpid()))
+
+    attached = {}
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None: # Shutdown signal
+                break
+            seq, slot_name, shape, dtype, payload, detection_ts = task
+            try:
+                if payload is not None: # Frame did not fit in a shared memory slot
+                    frame = payload
+                else:
+                    if slot_name not in attached:
+                        attached[slot_name] = attach_shared_memory(slot_name)
+                    frame = np.ndarray(shape, dtype=dtype, buffer=attached[slot_name].buf)
+                plates = processor.process_batch([frame], timestamps=[detection_ts])[0]
+                result_queue.put(('result', seq, plates, None))
+            except Exception as e:
+                result_queue.put(('result', seq, [], str(e)))
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+
+class InferencePool:
+    """
+    Runs ALPRProcessor in a pool of worker processes, one set of models per process.
+    Frames are handed over through shared memory slots instead of being pickled,
+    and results are returned in the order the frames were submitted.
+    """
+    def __init__(self, pool_config=None, processes=None, torch_threads=None,
+                 factory_path=DEFAULT_PROCESSOR_FACTORY):
+        pool_config = pool_config or config
+        self.config_sections = {section: dict(pool_config[section]) for section in pool_config.sections()}
+        self.processes = processes or pool_config.getint('Workers', 'Processes', fallback=0) or default_process_count()
+        self.torch_threads = torch_threads or pool_config.getint('Workers', 'TorchThreads', fallback=1)
+        self.max_in_flight = self.processes * max(1, pool_config.getint('Workers', 'SlotsPerProcess', fallback=2))
+        self.factory_path = factory_path
+        self.context = multiprocessing.get_context('spawn') # Forking a process holding torch state is unsafe
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.workers = []
+        self.slots = [] # Shared memory blocks, created with the size of the first frame
+        self.free_slots = []
+        self.slot_of_seq = {}
+        self.pending = {} # Results that arrived ahead of the frames before them
+        self.next_seq = 0 # Sequence number of the next submitted frame
+        self.next_result = 0 # Sequence number of the next result to hand out
+
+    def start(self):
+        """Starts the workers and waits until every worker has loaded its models."""
+        for _ in range(self.processes):
+            worker = self.context.Process(target=_worker_main, daemon=True,
+                                          args=(self.config_sections, self.factory_path, self.torch_threads,
+                                                self.task_queue, self.result_queue))
+            worker.start()
+            self.workers.append(worker)
+        ready = 0
+        while ready < self.processes:
+            try:
+                message = self.result_queue.get(timeout=1)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self.workers):
+                    self.close()
+                    raise RuntimeError("An inference worker exited while loading its models.")
+                continue
+            if message[0] != 'ready':
+                raise RuntimeError(f"Unexpected message from worker during startup: {message}")
+            ready += 1
+        utils.log_message(f"Inference pool started with {self.processes} processes, "
+                          f"{self.torch_threads} torch threads each.")
+        return self
+
+    def submit(self, frame, detection_ts=None):
+        """
+        Queues a frame for processing, returns its sequence number. Blocks while all slots are in use.
+        detection_ts (epoch seconds) is the detection time of its plates, the default is now.
+        """
+        while len(self.slot_of_seq) >= self.max_in_flight:
+            self._collect_one()
+        seq = self.next_seq
+        self.next_seq += 1
+
+        slot = self._get_slot(frame.nbytes)
+        if slot is None:
+            self.slot_of_seq[seq] = None
+            self.task_queue.put((seq, None, frame.shape, frame.dtype.str, frame, detection_ts))
+        else:
+            shm = self.slots[slot]
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            self.slot_of_seq[seq] = slot
+            self.task_queue.put((seq, shm.name, frame.shape, frame.dtype.str, None, detection_ts))
+        return seq
+
+    def results(self):
+        """Yields the plate lists of all submitted frames, in submission order."""
+        while self.next_result < self.next_seq:
+            while self.next_result not in self.pending:
+                self._collect_one()
+            yield self.pending.pop(self.next_result)
+            self.next_result += 1
+
+    def imap(self, frames):
+        """
+        Processes an iterable of frames, or of (frame, detection_ts) pairs, yielding one plate
+        list per frame in input order.
+        """
+        for frame in frames:
+            if isinstance(frame, tuple):
+                self.submit(*frame)
+            else:
+                self.submit(frame)
+            while self.next_result in self.pending: # Hand out results as soon as they are in order
+                yield self.pending.pop(self.next_result)
+                self.next_result += 1
+        yield from self.results()
+
+    def close(self):
+        """Stops the workers and releases the shared memory."""
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+        for shm in self.slots:
+            shm.close()
+            shm.unlink()
+        self.slots = []
+        self.free_slots = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_slot(self, nbytes):
+        if not self.slots:
+            for _ in range(self.max_in_flight):
+                self.slots.append(shared_memory.SharedMemory(create=True, size=max(1, nbytes)))
+            self.free_slots = list(range(self.max_in_flight))
+        if nbytes > self.slots[0].size:
+            return None # Larger than the slots, send this frame pickled
+        return self.free_slots.pop()
+
+    def _collect_one(self):
+        """Waits for one result from the workers and frees its slot."""
+        try:
+            _, seq, plates, error = self.result_queue.get(timeout=60)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in self.workers):
+                raise RuntimeError("All inference workers have exited.")
+            return
+        if error:
+            utils.log_message(f"Error processing frame {seq} in worker: {error}", level="ERROR")
+        slot = self.slot_of_seq.pop(seq)
+        if slot is not None:
+            self.free_slots.append(slot)
+        self.pending[seq] = plates
+
+
+def track_plates(tracker, track_reads, plates, frame_index):
+    """
+    Follows the plates read in a frame with the PlateTracker, returns the plates of the tracks
+    that finished. Each read is one vote, the workers do not report OCR confidence.
+    track_reads keeps the first plate record of every text read per track.
+    """
+    box_tracks, finished = tracker.update([plate_data['box'] for plate_data in plates], frame_index)
+    for plate_data, track in zip(plates, box_tracks):
+        track.add_read(plate_data['plate_number'], 1.0)
+        track_reads.setdefault(track.track_id, {}).setdefault(plate_data['plate_number'], plate_data)
+    return finished_track_plates(finished, track_reads)
+
+
+def finished_track_plates(tracks, track_reads):
+    """The plate record of the voted read of every finished track."""
+    plates = []
+    for track in tracks:
+        reads = track_reads.pop(track.track_id, {})
+        plate_number = track.voted_plate()
+        if plate_number:
+            plates.append(dict(reads[plate_number], track_id=track.track_id))
+    return plates
+
+
+def process_source(pool, source, db_conn=None, on_plate=None, stop_event=None, motion_gate=None, sampling=None,
+                   tracker=None):
+    """
+    Runs the frames of a video source through the pool and stores the plates in frame order.
+    Frames rejected by the motion gate are not sent to the workers. sampling holds the
+    sample_frames arguments, the plates get the detection time of their frame. With a
+    PlateTracker, every vehicle is stored once, when its track ends; the workers still read
+    every frame.
+    """
+    import src.video as video
+    frame_indexes = collections.deque() # Of the frames in flight, their results come back in the same order
+
+    def samples():
+        for frame_index, frame, detection_ts in video.sample_frames(source, stop_event, **(sampling or {})):
+            if motion_gate is None or motion_gate.check(frame):
+                frame_indexes.append(frame_index)
+                yield frame, detection_ts
+
+    frame_count = 0
+    track_reads = {}
+    for plates in pool.imap(samples()):
+        frame_count += 1
+        frame_index = frame_indexes.popleft()
+        if tracker is not None:
+            plates = track_plates(tracker, track_reads, plates, frame_index)
+        _store_plates(plates, db_conn, on_plate)
+    if tracker is not None: # Vehicles still in view at the end of the source
+        _store_plates(finished_track_plates(tracker.flush(), track_reads), db_conn, on_plate)
+    return frame_count
+
+
+def _store_plates(plates, db_conn, on_plate):
+    for plate_data in plates:
+        if db_conn is not None:
+            db_id = db_conn.insert_plate_data(plate_data)
+            if db_id is not None:
+                plate_data['id'] = db_id
+        if on_plate:
+            on_plate(plate_data)
@@ -4,6 +4,9 @@ import src.alpr
 import cv2
 import numpy as np
 import configparser
+import subprocess
+import sys
+import threading
 
 # Create a dummy config file for testing.
 test_config = configparser.ConfigParser()
@@ -15,10 +18,8 @@ class TestALPRProcessor(unittest.TestCase):
 
     @patch('src.alpr.YOLO') #Mock yolo
     @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
-    @patch('src.alpr.db.connect_to_db') # Mock database connection
-    def test_process_frame_success(self, mock_connect_db, mock_easyocr_reader, mock_yolo):
+    def test_process_frame_success(self, mock_easyocr_reader, mock_yolo):
         mock_db_conn = MagicMock() # Mock database connection object.
-        mock_connect_db.return_value = mock_db_conn # Make connect_to_db return the mock.
 
         alpr_processor = src.alpr.ALPRProcessor(test_config)
         dummy_image = np.zeros((100, 200, 3), dtype=np.uint8)
@@ -31,24 +32,37 @@ class TestALPRProcessor(unittest.TestCase):
         mock_yolo_results[0].names = {2: 'car'} # car class
         mock_yolo.return_value.return_value = mock_yolo_results # Mock inference call
 
-        # Mock EasyOCR results
-        mock_easyocr_reader.return_value.readtext.return_value = [
-            ([ [50, 60], [150, 60], [150, 100], [50, 100] ], "TEST1234", 0.8)  # Mock OCR result
+        # Mock EasyOCR results, the 100x40 crop is plate shaped so only the recogniser runs
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([ [0, 0], [160, 0], [160, 64], [0, 64] ], "TEST1234", 0.8)  # Mock OCR result
         ]
 
-        result = alpr_processor.process_frame(dummy_image, mock_db_conn) # Pass mock db connection
+        mock_evidence = MagicMock()
+        result = alpr_processor.process_frame(dummy_image, mock_db_conn, evidence=mock_evidence) # Pass mock db connection
 
         self.assertIsNotNone(result)
         self.assertEqual(result['plate_number'], 'TEST1234')
+        self.assertEqual(result['box'], (50, 60, 150, 100)) # Where the evidence crop is cut from
         mock_db_conn.insert_plate_data.assert_called_once()
+        mock_evidence.submit.assert_called_once_with(result, dummy_image, on_stored=mock_db_conn.set_image_path)
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_read_plates_uses_frame_timestamps(self, mock_easyocr_reader, mock_yolo):
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([[0, 0], [160, 0], [160, 64], [0, 64]], "TEST1234", 0.8)
+        ]
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        plates = alpr_processor.read_plates([frame], [[(50, 60, 150, 100)]], timestamps=[1722081600.7])[0]
+        self.assertEqual(plates[0]['detection_ts'], 1722081600) # The frame's time, not the time of the read
+        self.assertEqual(plates[0]['detection_time'], src.alpr.utils.format_timestamp(1722081600))
 
     @patch('src.alpr.YOLO')  # Mock yolo
     @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
-    @patch('src.alpr.db.connect_to_db') # Mock database connection
-    def test_process_frame_no_detection(self, mock_connect_db, mock_easyocr, mock_yolo):
+    def test_process_frame_no_detection(self, mock_easyocr, mock_yolo):
         """Test the case where no license plate is detected."""
         mock_db_conn = MagicMock() # Mock database connection object.
-        mock_connect_db.return_value = mock_db_conn # Make connect_to_db return the mock.
         alpr_processor = src.alpr.ALPRProcessor(test_config)
         dummy_image = np.zeros((100, 200, 3), dtype=np.uint8)
 
@@ -58,17 +72,15 @@ class TestALPRProcessor(unittest.TestCase):
         mock_yolo.return_value.return_value = mock_yolo_results # Mock inference call
         result = alpr_processor.process_frame(dummy_image, mock_db_conn) # Pass mock db connection
         self.assertIsNone(result)
-        mock_easyocr.assert_not_called()  # EasyOCR shouldn't be called
+        mock_easyocr.return_value.readtext_batched.assert_not_called()  # EasyOCR shouldn't be called
         mock_db_conn.insert_plate_data.assert_not_called()
 
 
     @patch('src.alpr.YOLO')  # Mock yolo
     @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
-    @patch('src.alpr.db.connect_to_db') # Mock database connection
-    def test_process_frame_ocr_failure(self, mock_connect_db, mock_easyocr_reader, mock_yolo):
+    def test_process_frame_ocr_failure(self, mock_easyocr_reader, mock_yolo):
         """Test the case where OCR fails to extract text."""
         mock_db_conn = MagicMock() # Mock database connection object.
-        mock_connect_db.return_value = mock_db_conn # Make connect_to_db return the mock.
         alpr_processor = src.alpr.ALPRProcessor(test_config)
         dummy_image = np.zeros((100, 200, 3), dtype=np.uint8)
 
@@ -81,11 +93,243 @@ class TestALPRProcessor(unittest.TestCase):
         mock_yolo.return_value.return_value = mock_yolo_results  # Mock inference call
 
         # Mock EasyOCR results (empty result)
-        mock_easyocr_reader.return_value.readtext.return_value = [] # Empty result
+        mock_easyocr_reader.return_value.recognize.return_value = [] # Empty result
 
         result = alpr_processor.process_frame(dummy_image, mock_db_conn) # Pass mock db connection
         self.assertIsNone(result)
         mock_db_conn.insert_plate_data.assert_not_called()
 
+    @patch('src.alpr.YOLO')  # Mock yolo
+    @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
+    def test_process_batch_one_model_call(self, mock_easyocr_reader, mock_yolo):
+        """Test that a batch of frames goes through YOLO in a single call."""
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        frames = [np.zeros((100, 200, 3), dtype=np.uint8) for _ in range(3)]
+
+        # One YOLO result per frame, only the second frame contains a car
+        mock_yolo_results = [MagicMock(), MagicMock(), MagicMock()]
+        for mock_result in mock_yolo_results:
+            mock_result.boxes.cpu.return_value.numpy.return_value = []
+            mock_result.names = {2: 'car'}
+        mock_yolo_results[1].boxes.cpu.return_value.numpy.return_value = [
+            MagicMock(cls=[2], xyxy=[[50, 60, 150, 100]])
+        ]
+        mock_yolo.return_value.return_value = mock_yolo_results
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([[0, 0], [160, 0], [160, 64], [0, 64]], "ABC123", 0.9)
+        ]
+
+        results = alpr_processor.process_batch(frames) # No db connection, nothing is persisted
+
+        mock_yolo.return_value.assert_called_once()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], [])
+        self.assertEqual(results[1][0]['plate_number'], 'ABC123')
+        self.assertNotIn('id', results[1][0])
+        self.assertEqual(results[2], [])
+
+    @patch('src.alpr.YOLO')  # Mock yolo
+    @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
+    def test_process_batch_reports_all_plates(self, mock_easyocr_reader, mock_yolo):
+        """Test that every plate crop in a frame is recognised in one OCR call and reported."""
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        dummy_image = np.zeros((200, 300, 3), dtype=np.uint8)
+        mock_db_conn = MagicMock()
+        mock_db_conn.insert_plate_data.side_effect = [1, 2]
+
+        mock_yolo_results = [MagicMock()]
+        mock_yolo_results[0].boxes.cpu.return_value.numpy.return_value = [
+            MagicMock(cls=[2], xyxy=[[0, 0, 100, 40]]),
+            MagicMock(cls=[2], xyxy=[[0, 100, 120, 140]])
+        ]
+        mock_yolo_results[0].names = {2: 'car'}
+        mock_yolo.return_value.return_value = mock_yolo_results
+
+        # Crops are stacked as rows, the second row starts at RowHeight + OCR_ROW_GAP
+        second_row = 64 + src.alpr.OCR_ROW_GAP
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([[0, 0], [160, 0], [160, 64], [0, 64]], "FIRST1", 0.9),
+            ([[0, second_row], [192, second_row], [192, second_row + 64], [0, second_row + 64]], "SECOND2", 0.7)
+        ]
+
+        plates = alpr_processor.process_batch([dummy_image], mock_db_conn)[0]
+
+        mock_easyocr_reader.return_value.recognize.assert_called_once()
+        mock_easyocr_reader.return_value.readtext_batched.assert_not_called()
+        self.assertEqual([plate['plate_number'] for plate in plates], ['F1RST1', 'SEC0ND2'])
+        self.assertEqual([plate['id'] for plate in plates], [1, 2])
+        self.assertEqual(mock_db_conn.insert_plate_data.call_count, 2)
+
+    @patch('src.alpr.YOLO')  # Mock yolo
+    @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
+    def test_loose_crop_uses_text_detector(self, mock_easyocr_reader, mock_yolo):
+        """Test that crops which are not plate shaped still go through the text detector."""
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        car_crop = np.zeros((240, 320, 3), dtype=np.uint8)
+        mock_easyocr_reader.return_value.readtext_batched.return_value = [
+            [([[20, 200], [120, 200], [120, 280], [20, 280]], "XYZ789", 0.6)]
+        ]
+
+        ocr_results = alpr_processor.ocr_crops([car_crop])
+
+        mock_easyocr_reader.return_value.recognize.assert_not_called()
+        self.assertEqual(alpr_processor.extract_plate_number(ocr_results[0]), 'XYZ789')
+        # Boxes come back in the 640x480 detector input and are scaled to the crop
+        self.assertEqual(ocr_results[0][0][0], [[10, 100], [60, 100], [60, 140], [10, 140]])
+
+    @patch('src.alpr.YOLO')  # Mock yolo
+    @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
+    def test_loose_crops_share_one_batched_call(self, mock_easyocr_reader, mock_yolo):
+        """Test that several car shaped crops go through the text detector in one call."""
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        car_crops = [np.zeros((80, 100, 3), dtype=np.uint8), np.zeros((120, 90, 3), dtype=np.uint8),
+                     np.zeros((60, 60, 3), dtype=np.uint8)]
+        mock_easyocr_reader.return_value.readtext_batched.return_value = [
+            [([[0, 0], [10, 0], [10, 10], [0, 10]], f"CAR{index}", 0.8)] for index in range(3)
+        ]
+
+        ocr_results = alpr_processor.ocr_crops(car_crops)
+
+        mock_easyocr_reader.return_value.readtext_batched.assert_called_once()
+        args, kwargs = mock_easyocr_reader.return_value.readtext_batched.call_args
+        self.assertEqual(len(args[0]), 3)
+        self.assertEqual((kwargs['n_width'], kwargs['n_height']), (640, 480))
+        mock_easyocr_reader.return_value.readtext.assert_not_called()
+        self.assertEqual([result[0][1] for result in ocr_results], ['CAR0', 'CAR1', 'CAR2'])
+
+
+class TestResolutionAdaptiveDetection(unittest.TestCase):
+
+    def make_processor(self, mock_yolo, **inference):
+        config = configparser.ConfigParser()
+        config['Inference'] = inference
+        config['ROI'] = {'gate.mp4': '0.5,0.5,1,1', 'Default': '0,0.25,1,1'}
+        mock_yolo_results = [MagicMock()]
+        mock_yolo_results[0].boxes.cpu.return_value.numpy.return_value = [
+            MagicMock(cls=[2], xyxy=[[100, 50, 200, 100]])
+        ]
+        mock_yolo_results[0].names = {2: 'car'}
+        mock_yolo.return_value.return_value = mock_yolo_results
+        return src.alpr.ALPRProcessor(config)
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_boxes_mapped_back_to_full_resolution(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = self.make_processor(mock_yolo, DetectWidth='960')
+        frame = np.zeros((2160, 3840, 3), dtype=np.uint8) # 4K frame, detected at a quarter of the width
+
+        coords = alpr_processor.detect([frame], roi=(0.5, 0.5, 1, 1))[0]
+
+        detection_input = mock_yolo.return_value.call_args[0][0][0]
+        self.assertEqual(detection_input.shape, (540, 960, 3)) # Quarter of the frame, downscaled 2x
+        self.assertEqual(coords, [(1920 + 200, 1080 + 100, 1920 + 400, 1080 + 200)])
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_roi_for_source(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = self.make_processor(mock_yolo)
+        self.assertEqual(alpr_processor.roi_for_source('/videos/gate.mp4'), (0.5, 0.5, 1.0, 1.0))
+        self.assertEqual(alpr_processor.roi_for_source(0), (0.0, 0.25, 1.0, 1.0))
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_two_stage_finds_plate_in_car(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = self.make_processor(mock_yolo, TwoStage='True')
+        frame = np.full((300, 400, 3), 90, dtype=np.uint8)
+        frame[78:93, 120:180] = 255 # White plate inside the (100, 50, 200, 100) car box
+        for x in range(123, 177, 7):
+            frame[81:90, x:x + 3] = 0 # Dark characters
+
+        coords = alpr_processor.detect([frame])[0]
+
+        x1, y1, x2, y2 = coords[0]
+        self.assertTrue(115 <= x1 <= 125 and 170 <= x2 <= 185, coords)
+        self.assertTrue(75 <= y1 <= 85 and 88 <= y2 <= 96, coords)
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_two_stage_keeps_car_box_without_plate(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = self.make_processor(mock_yolo, TwoStage='True')
+        frame = np.zeros((300, 400, 3), dtype=np.uint8)
+        self.assertEqual(alpr_processor.detect([frame])[0], [(100, 50, 200, 100)])
+
+
+class TestOCRCache(unittest.TestCase):
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_repeated_crop_skips_ocr(self, mock_easyocr_reader, mock_yolo):
+        mock_yolo_results = [MagicMock()]
+        mock_yolo_results[0].boxes.cpu.return_value.numpy.return_value = [
+            MagicMock(cls=[2], xyxy=[[50, 60, 150, 100]])
+        ]
+        mock_yolo_results[0].names = {2: 'car'}
+        mock_yolo.return_value.return_value = mock_yolo_results
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([[0, 0], [160, 0], [160, 64], [0, 64]], "TEST1234", 0.8)
+        ]
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        cv2.putText(frame, "TEST", (55, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+        first = alpr_processor.process_batch([frame])[0]
+        second = alpr_processor.process_batch([frame.copy()])[0] # A parked car, same crop again
+        self.assertEqual([plate['plate_number'] for plate in first + second], ['TEST1234', 'TEST1234'])
+        mock_easyocr_reader.return_value.recognize.assert_called_once()
+        self.assertEqual(alpr_processor.ocr_cache.stats()['hits'], 1)
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_cache_can_be_disabled(self, mock_easyocr_reader, mock_yolo):
+        config = configparser.ConfigParser()
+        config['OCR'] = {'CacheSize': '0'}
+        self.assertIsNone(src.alpr.ALPRProcessor(config).ocr_cache)
+
+
+class TestLazyStartup(unittest.TestCase):
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_models_load_on_first_use(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        mock_yolo.assert_not_called()
+        mock_easyocr_reader.assert_not_called()
+        self.assertIs(alpr_processor.model, mock_yolo.return_value)
+        self.assertIs(alpr_processor.reader, mock_easyocr_reader.return_value)
+        alpr_processor.model
+        mock_yolo.assert_called_once()
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_background_warmup_sets_ready(self, mock_easyocr_reader, mock_yolo):
+        mock_easyocr_reader.return_value.recognize.return_value = []
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        self.assertFalse(alpr_processor.ready.is_set())
+        alpr_processor.start_warmup().join(5)
+        self.assertTrue(alpr_processor.ready.is_set())
+        mock_yolo.return_value.assert_called_once() # One dummy frame through the detector
+        mock_easyocr_reader.return_value.recognize.assert_called_once()
+        self.assertIsNone(alpr_processor.start_warmup()) # Already warm
+
+    @patch('src.alpr.YOLO')
+    @patch('src.alpr.easyocr.Reader')
+    def test_frames_wait_for_warmup(self, mock_easyocr_reader, mock_yolo):
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        self.assertTrue(alpr_processor.wait_until_ready(0)) # Nothing to wait for without a warm-up
+        release = threading.Event()
+        mock_yolo.return_value.side_effect = lambda *args, **kwargs: release.wait(5)
+        alpr_processor.start_warmup()
+        self.assertFalse(alpr_processor.wait_until_ready(0.05)) # Dummy inference still running
+        release.set()
+        self.assertTrue(alpr_processor.wait_until_ready(5))
+
+    def test_headless_imports_skip_gui_and_models(self):
+        code = ("import sys, src.pipeline, src.workers, src.alpr; "
+                "loaded = [name for name in ('tkinter', 'torch', 'ultralytics') if name in sys.modules]; "
+                "print('loaded=' + ','.join(loaded))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], 'loaded=')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
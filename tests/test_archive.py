@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import importlib.util
+import os
+import tempfile
+import src.archive as archive
+import src.database as db
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_conn = db.DatabaseConnection(os.path.join(self.temp_dir.name, 'plates.db'),
+                                             partitioning='day').connect()
+        for day in (26, 27):
+            detection_ts = int(datetime.datetime(2024, 7, day, 12).timestamp())
+            self.db_conn.insert_many([{'plate_number': f"P{day}{index}", 'image_path': 'N/A',
+                                       'detection_time': '', 'detection_ts': detection_ts + index}
+                                      for index in range(5)])
+        self.out_dir = os.path.join(self.temp_dir.name, 'archive')
+
+    def tearDown(self):
+        self.db_conn.close()
+        self.temp_dir.cleanup()
+
+    def test_missing_pyarrow_is_reported(self):
+        with patch.dict('sys.modules', {'pyarrow': None, 'pyarrow.parquet': None}):
+            with self.assertRaises(RuntimeError):
+                archive.export_table(self.db_conn, 'license_plates_20240726', self.out_dir)
+
+    def test_existing_archive_is_never_overwritten(self):
+        os.makedirs(self.out_dir)
+        for name in ('license_plates_20240726.parquet', 'license_plates_20240726-2.parquet'):
+            open(os.path.join(self.out_dir, name), 'w').close()
+        self.assertEqual(archive.archive_path(self.out_dir, 'license_plates_20240726'),
+                         os.path.join(self.out_dir, 'license_plates_20240726-3.parquet'))
+
+    def test_empty_partition_is_not_archived(self):
+        self.db_conn.create_partition(datetime.date(2024, 7, 20))
+        with patch.object(archive, 'export_table') as export_table:
+            archive.archiver(self.out_dir)(self.db_conn, 'license_plates_20240720')
+            archive.archiver(self.out_dir)(self.db_conn, 'license_plates_20240726')
+        self.assertEqual([call.args[1] for call in export_table.call_args_list], ['license_plates_20240726'])
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow is not installed")
+    def test_exports_old_partitions_in_batches(self):
+        import pyarrow.parquet as pq
+        paths = archive.export_partitions(self.db_conn, self.out_dir, datetime.date(2024, 7, 27))
+        self.assertEqual([os.path.basename(path) for path in paths], ['license_plates_20240726.parquet'])
+        table = pq.read_table(paths[0])
+        self.assertEqual(table.column('plate_number').to_pylist(), [f"P26{index}" for index in range(5)])
+        path = archive.export_table(self.db_conn, 'license_plates_20240727', self.out_dir, batch_rows=2)
+        self.assertEqual(pq.read_table(path).num_rows, 5)
+        # Already archived partitions are skipped
+        self.assertEqual(archive.export_partitions(self.db_conn, self.out_dir, datetime.date(2024, 7, 27)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
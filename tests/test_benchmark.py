@@ -0,0 +1,48 @@
+import unittest
+import configparser
+import json
+import src.benchmark as benchmark
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+test_config['Inference'] = {'BatchSize': '2'}
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_stub_run_reports_all_figures(self):
+        report = benchmark.run(frame_count=6, stub=True, db_rows=50, bench_config=test_config)
+        json.dumps(report) # The report must be serialisable
+
+        self.assertEqual(report['pipeline']['frames'], 6)
+        self.assertEqual(report['pipeline']['plates'], 6) # The stubs read one plate per frame
+        self.assertGreater(report['pipeline']['frames_per_sec'], 0)
+        self.assertEqual(set(report['pipeline']['stages_per_batch']), {'detect', 'ocr', 'db_insert'})
+        self.assertEqual(report['pipeline']['stages_per_batch']['detect']['count'], 3)
+        self.assertIn('p99_ms', report['pipeline']['frame_latency'])
+        self.assertGreater(report['db']['batched_inserts_per_sec'], 0)
+        self.assertGreater(report['peak_rss_mb'], 0)
+
+    def test_synthetic_frames_are_reproducible(self):
+        first = benchmark.synthetic_frames(2, width=320, height=240, seed=1)
+        second = benchmark.synthetic_frames(2, width=320, height=240, seed=1)
+        self.assertTrue((first[1] == second[1]).all())
+
+    def test_percentiles(self):
+        stats = benchmark.percentiles([0.001] * 99 + [0.1])
+        self.assertEqual(stats['p50_ms'], 1.0)
+        self.assertGreater(stats['p99_ms'], 1.0)
+        self.assertEqual(benchmark.percentiles([]), {'count': 0})
+
+    def test_compare_flags_regressions(self):
+        baseline = {'pipeline': {'frames_per_sec': 100, 'frame_latency': {'p95_ms': 10}},
+                    'db': {'batched_inserts_per_sec': 1000}}
+        current = {'pipeline': {'frames_per_sec': 80, 'frame_latency': {'p95_ms': 10.5}},
+                   'db': {'batched_inserts_per_sec': 990}}
+        regressions = benchmark.compare(current, baseline, tolerance=0.10)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('pipeline.frames_per_sec'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
 import os
 import src.database as db
+import src.utils as utils
 import configparser
+import datetime
 import sqlite3
+import time
 
 #Create a dummy config file for testing.
 test_config = configparser.ConfigParser()
@@ -72,6 +75,237 @@ class TestDatabaseConnection(unittest.TestCase):
         #Close the connection.
         conn.close()
 
+    def test_wal_mode(self):
+        cursor = self.db_conn.conn.cursor()
+        self.assertEqual(cursor.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+    def test_insert_many(self):
+        plates = [{'plate_number': f'PLATE{index}', 'image_path': 'N/A',
+                   'detection_time': '2024-07-27 12:00:00'} for index in range(3)]
+        ids = self.db_conn.insert_many(plates)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual([plate['id'] for plate in plates], ids)
+
+        cursor = self.db_conn.conn.cursor()
+        cursor.execute("SELECT plate_number FROM license_plates WHERE id = ?", (ids[2],))
+        self.assertEqual(cursor.fetchone()[0], 'PLATE2')
+
+    def test_detection_ts_from_detection_time(self):
+        test_data = {'plate_number': 'TEST1234', 'image_path': 'N/A', 'detection_time': '2024-07-27 12:00:00'}
+        inserted_id = self.db_conn.insert_plate_data(test_data)
+        cursor = self.db_conn.conn.cursor()
+        cursor.execute("SELECT detection_ts FROM license_plates WHERE id = ?", (inserted_id,))
+        self.assertEqual(cursor.fetchone()[0], utils.parse_timestamp('2024-07-27 12:00:00'))
+
+    def test_migrate_existing_database(self):
+        """A database created before detection_ts existed is migrated on connect."""
+        self.db_conn.close()
+        os.remove(self.db_path)
+        old_conn = sqlite3.connect(self.db_path)
+        old_conn.execute('''
+            CREATE TABLE license_plates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plate_number TEXT NOT NULL,
+                image_path TEXT,
+                detection_time TEXT NOT NULL,
+                location TEXT,
+                user_id TEXT
+            )
+        ''')
+        old_conn.execute("INSERT INTO license_plates (plate_number, image_path, detection_time) "
+                         "VALUES ('OLD123', 'N/A', '2024-07-27 12:00:00')")
+        old_conn.commit()
+        old_conn.close()
+
+        self.db_conn = db.DatabaseConnection(self.db_path).connect()
+        cursor = self.db_conn.conn.cursor()
+        cursor.execute("SELECT detection_ts FROM license_plates WHERE plate_number = 'OLD123'")
+        self.assertEqual(cursor.fetchone()[0], utils.parse_timestamp('2024-07-27 12:00:00'))
+        indexes = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('idx_license_plates_plate', indexes)
+        self.assertIn('idx_license_plates_ts', indexes)
+        self.assertEqual(cursor.execute("PRAGMA user_version").fetchone()[0], db.SCHEMA_VERSION)
+
+
+class TestBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.db_path = test_config['Database']['DatabasePath']
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def count_rows(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM license_plates").fetchone()[0]
+        finally:
+            conn.close()
+
+    def make_plate(self, index):
+        return {'plate_number': f'PLATE{index}', 'image_path': 'N/A', 'detection_time': '2024-07-27 12:00:00'}
+
+    def test_full_batch_is_written(self):
+        writer = db.BatchWriter(self.db_path, batch_size=5, flush_interval=60).start()
+        plates = [self.make_plate(index) for index in range(5)]
+        for plate in plates:
+            self.assertIsNone(writer.insert_plate_data(plate))
+        writer.flush()
+        self.assertEqual(self.count_rows(), 5)
+        self.assertEqual(writer.flushes, 1) # Written as one batch
+        self.assertEqual([plate['id'] for plate in plates], [1, 2, 3, 4, 5])
+        writer.close()
+
+    def test_set_image_path_updates_written_row(self):
+        writer = db.BatchWriter(self.db_path, batch_size=100, flush_interval=60).start()
+        plate = self.make_plate(1)
+        writer.insert_plate_data(plate)
+        writer.set_image_path(plate, 'data/evidence/ab/cd/abcd.jpg') # Before the insert is written
+        writer.close()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            image_path = conn.execute("SELECT image_path FROM license_plates WHERE id = ?", (plate['id'],)).fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(image_path, 'data/evidence/ab/cd/abcd.jpg')
+
+    def test_timer_flushes_partial_batch(self):
+        writer = db.BatchWriter(self.db_path, batch_size=100, flush_interval=0.05).start()
+        writer.insert_plate_data(self.make_plate(1))
+        for _ in range(100): # Wait for the flush timer
+            if writer.rows_written:
+                break
+            time.sleep(0.01)
+        self.assertEqual(writer.rows_written, 1)
+        writer.close()
+
+    def test_bad_rows_are_dropped_and_the_writer_keeps_running(self):
+        writer = db.BatchWriter(self.db_path, batch_size=100, flush_interval=60).start()
+        bad = dict(self.make_plate(1), detection_time='27/07/2024 12:00') # Not in TIMESTAMP_FORMAT
+        good = self.make_plate(2)
+        writer.insert_plate_data(bad)
+        writer.insert_plate_data(good)
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(self.count_rows(), 1)
+        self.assertNotIn('id', bad)
+        writer.insert_plate_data(self.make_plate(3)) # Still running
+        writer.close()
+        self.assertEqual(self.count_rows(), 2)
+
+    def test_stopped_writer_fails_fast(self):
+        writer = db.BatchWriter(self.db_path).start()
+        writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.flush()
+        with self.assertRaises(RuntimeError):
+            writer.insert_plate_data(self.make_plate(1))
+
+    def test_close_writes_pending_rows(self):
+        writer = db.BatchWriter(self.db_path, batch_size=100, flush_interval=60).start()
+        for index in range(3):
+            writer.insert_plate_data(self.make_plate(index))
+        writer.close()
+        self.assertEqual(self.count_rows(), 3)
+
+
+
+def local_ts(year, month, day, hour=12):
+    return int(datetime.datetime(year, month, day, hour).timestamp())
+
+
+class TestPartitioning(unittest.TestCase):
+    def setUp(self):
+        self.db_path = 'test_partitions.db'
+        self.db_conn = db.DatabaseConnection(self.db_path, partitioning='day').connect()
+
+    def tearDown(self):
+        self.db_conn.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def make_plate(self, plate_number, detection_ts):
+        return {'plate_number': plate_number, 'image_path': 'N/A',
+                'detection_time': utils.format_timestamp(detection_ts), 'detection_ts': detection_ts}
+
+    def test_rows_go_to_their_day_partition(self):
+        plates = [self.make_plate('DAY1A', local_ts(2024, 7, 27)), self.make_plate('DAY2', local_ts(2024, 7, 28)),
+                  self.make_plate('DAY1B', local_ts(2024, 7, 27, 23))]
+        ids = self.db_conn.insert_many(plates)
+        single_id = self.db_conn.insert_plate_data(self.make_plate('DAY2B', local_ts(2024, 7, 28, 8)))
+
+        self.assertEqual(self.db_conn.plate_tables(),
+                         ['license_plates', 'license_plates_20240727', 'license_plates_20240728'])
+        self.assertEqual([db.table_for_id(db_id) for db_id in ids + [single_id]],
+                         ['license_plates_20240727', 'license_plates_20240728', 'license_plates_20240727',
+                          'license_plates_20240728'])
+        self.assertEqual(ids[2], ids[0] + 1)
+        cursor = self.db_conn.conn.cursor()
+        cursor.execute("SELECT plate_number FROM license_plates_20240727 ORDER BY id")
+        self.assertEqual([row[0] for row in cursor.fetchall()], ['DAY1A', 'DAY1B'])
+        cursor.execute("SELECT COUNT(*) FROM license_plates")
+        self.assertEqual(cursor.fetchone()[0], 0)
+
+        self.db_conn.update_image_paths([('a.jpg', ids[0]), ('b.jpg', ids[1])])
+        cursor.execute("SELECT image_path FROM license_plates_20240728 WHERE id = ?", (ids[1],))
+        self.assertEqual(cursor.fetchone()[0], 'b.jpg')
+
+    def test_retention_drops_old_partitions(self):
+        for day in (25, 26, 27):
+            self.db_conn.insert_plate_data(self.make_plate('OLD', local_ts(2024, 7, day)))
+        archived = []
+        self.db_conn.retention_days = 1
+        self.db_conn.before_drop = lambda db_conn, table: archived.append(table)
+
+        dropped = self.db_conn.apply_retention(today=datetime.date(2024, 7, 27))
+
+        self.assertEqual(dropped, ['license_plates_20240725'])
+        self.assertEqual(archived, dropped)
+        self.assertEqual(self.db_conn.plate_tables(),
+                         ['license_plates', 'license_plates_20240726', 'license_plates_20240727'])
+
+    def test_partition_is_kept_when_archiving_fails(self):
+        self.db_conn.insert_plate_data(self.make_plate('OLD', local_ts(2024, 7, 25)))
+        self.db_conn.retention_days = 1
+
+        def fail(db_conn, table):
+            raise RuntimeError("disk full")
+
+        self.db_conn.before_drop = fail
+        self.assertEqual(self.db_conn.apply_retention(today=datetime.date(2024, 7, 27)), [])
+        self.assertIn('license_plates_20240725', self.db_conn.plate_tables())
+
+    def test_plates_older_than_retention_are_skipped(self):
+        self.db_conn.retention_days = 7
+        now = int(time.time())
+        archived = []
+        self.db_conn.before_drop = lambda db_conn, table: archived.append(table)
+        plates = [self.make_plate('NOW', now), self.make_plate('OLD', now - 30 * 86400)]
+
+        ids = self.db_conn.insert_many(plates)
+
+        self.assertIsNotNone(ids[0])
+        self.assertIsNone(ids[1])
+        self.assertNotIn('id', plates[1])
+        self.assertEqual(self.db_conn.plate_tables()[1:], [db.partition_name(datetime.date.fromtimestamp(now))])
+        self.assertEqual(archived, []) # The old day was never created, so nothing was archived
+        self.assertIsNone(self.db_conn.insert_plate_data(self.make_plate('OLD', now - 30 * 86400)))
+
+    def test_failing_table_keeps_rows_of_other_tables(self):
+        self.db_conn.insert_plate_data(self.make_plate('DAY2', local_ts(2024, 7, 28)))
+        self.db_conn.conn.execute("DROP TABLE license_plates_20240728") # Gone behind the connection's back
+        plates = [self.make_plate('DAY1', local_ts(2024, 7, 27)), self.make_plate('DAY2', local_ts(2024, 7, 28))]
+
+        ids = self.db_conn.insert_many(plates)
+
+        self.assertEqual(db.table_for_id(ids[0]), 'license_plates_20240727')
+        self.assertIsNone(ids[1])
+
+    def test_unknown_partitioning(self):
+        with self.assertRaises(ValueError):
+            db.DatabaseConnection(self.db_path, partitioning='hour')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import unittest
+import configparser
+import os
+import tempfile
+from unittest.mock import MagicMock
+import numpy as np
+import src.benchmark as benchmark
+import src.detector as detector
+
+
+class FakeYOLO:
+    """Records how it was created and writes a dummy file when exported."""
+    exports = 0
+
+    def __init__(self, path, task=None):
+        self.path = path
+        self.task = task
+        self.ckpt_path = path
+
+    def export(self, format, imgsz, **kwargs):
+        FakeYOLO.exports += 1
+        exported = os.path.splitext(self.path)[0] + '.' + format
+        with open(exported, 'w') as exported_file:
+            exported_file.write(f"{format} {imgsz}")
+        return exported
+
+
+def make_config(temp_dir, **inference):
+    config = configparser.ConfigParser()
+    config['Inference'] = dict({'Model': os.path.join(temp_dir, 'model.pt'),
+                                'ModelCacheDir': os.path.join(temp_dir, 'cache')}, **inference)
+    return config
+
+
+class TestDetectorBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, 'model.pt'), 'wb') as model_file:
+            model_file.write(b'weights')
+        FakeYOLO.exports = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_pytorch_backend_loads_the_weights(self):
+        model = detector.load_detector(make_config(self.temp_dir.name), FakeYOLO)
+        self.assertTrue(model.path.endswith('model.pt'))
+        self.assertEqual(FakeYOLO.exports, 0)
+
+    def test_export_is_cached(self):
+        config = make_config(self.temp_dir.name, Backend='onnx', ImageSize='480')
+        first = detector.load_detector(config, FakeYOLO)
+        second = detector.load_detector(config, FakeYOLO)
+        self.assertEqual(FakeYOLO.exports, 1)
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(first.task, 'detect')
+        self.assertIn('-480-fp32.onnx', first.path)
+        self.assertTrue(os.path.exists(first.path))
+
+    def test_cache_key_changes_with_model_and_settings(self):
+        model_path = os.path.join(self.temp_dir.name, 'model.pt')
+        model_hash = detector.file_hash(model_path)
+        paths = {detector.artifact_path('cache', model_path, model_hash, 'onnx', 640, False),
+                 detector.artifact_path('cache', model_path, model_hash, 'onnx', 320, False),
+                 detector.artifact_path('cache', model_path, model_hash, 'onnx', 640, True),
+                 detector.artifact_path('cache', model_path, model_hash, 'openvino', 640, False)}
+        self.assertEqual(len(paths), 4)
+        with open(model_path, 'wb') as model_file:
+            model_file.write(b'retrained weights')
+        self.assertNotEqual(detector.file_hash(model_path), model_hash)
+
+    def test_openvino_artifact_name(self):
+        path = detector.artifact_path('cache', 'yolov8n.pt', 'abc', 'openvino', 640, True)
+        self.assertTrue(path.endswith('yolov8n-abc-640-int8_openvino_model'))
+
+    def test_failed_export_falls_back_to_pytorch(self):
+        class BrokenYOLO(FakeYOLO):
+            def export(self, **kwargs):
+                raise RuntimeError("export failed")
+        model = detector.load_detector(make_config(self.temp_dir.name, Backend='openvino'), BrokenYOLO)
+        self.assertTrue(model.path.endswith('model.pt'))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            detector.load_detector(make_config(self.temp_dir.name, Backend='tensorrt'), FakeYOLO)
+
+
+class TestParityCheck(unittest.TestCase):
+
+    def test_identical_detectors_match(self):
+        frames = [np.zeros((360, 640, 3), dtype=np.uint8)] * 3
+        report = detector.parity_check(benchmark.StubYOLO(), benchmark.StubYOLO(), frames)
+        self.assertEqual(report['reference_boxes'], 3)
+        self.assertEqual(report['match_ratio'], 1.0)
+        self.assertEqual(report['mismatched_frames'], [])
+
+    def test_missing_detection_is_reported(self):
+        frames = [np.zeros((360, 640, 3), dtype=np.uint8)] * 2
+        empty = MagicMock(return_value=[benchmark.StubResult([])])
+        report = detector.parity_check(benchmark.StubYOLO(), empty, frames)
+        self.assertEqual(report['match_ratio'], 0.0)
+        self.assertEqual(report['mismatched_frames'], [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
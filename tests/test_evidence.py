@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import MagicMock
+import configparser
+import os
+import tempfile
+import cv2
+import numpy as np
+import src.evidence as evidence
+
+
+def make_frame(seed, width=320, height=240):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+class TestEvidenceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, 'evidence')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def stored_files(self):
+        return sorted(os.path.relpath(os.path.join(directory, name), self.root)
+                      for directory, _, names in os.walk(self.root) for name in names)
+
+    def test_writes_crop_and_context_in_the_background(self):
+        store = evidence.EvidenceStore(self.root, context_width=160).start()
+        on_stored = MagicMock()
+        plate_data = {'plate_number': 'ABC123', 'image_path': 'N/A', 'box': (10, 20, 110, 60)}
+        self.assertTrue(store.submit(plate_data, make_frame(1), on_stored=on_stored))
+        store.close()
+
+        path = plate_data['image_path']
+        on_stored.assert_called_once_with(plate_data, path)
+        digest = os.path.basename(path).split('.')[0]
+        self.assertEqual(os.path.relpath(path, self.root), os.path.join(digest[:2], digest[2:4], digest + '.jpg'))
+        self.assertEqual(cv2.imread(path).shape[:2], (40, 100))
+        context = cv2.imread(os.path.join(os.path.dirname(path), digest + '-context.jpg'))
+        self.assertEqual(context.shape[:2], (120, 160)) # Downscaled to ContextWidth
+        self.assertEqual(store.stats()['written'], 1)
+
+    def test_same_content_is_stored_once(self):
+        store = evidence.EvidenceStore(self.root)
+        frame = make_frame(2)
+        first = store.write(frame, (0, 0, 50, 20))
+        second = store.write(frame.copy(), (0, 0, 50, 20))
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_quota_evicts_oldest_files(self):
+        store = evidence.EvidenceStore(self.root, image_format='webp', quality=50).start()
+        first = store.write(make_frame(3), (0, 0, 100, 40))
+        store.max_bytes = store.stats()['bytes'] * 2 + 1 # Room for two plates
+        store.write(make_frame(4), (0, 0, 100, 40))
+        last = store.write(make_frame(5), (0, 0, 100, 40))
+        store.close()
+        self.assertTrue(first.endswith('.webp'))
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(last))
+        self.assertLessEqual(store.stats()['bytes'], store.max_bytes)
+        self.assertGreaterEqual(store.stats()['evicted'], 2) # At least the crop and context of the first plate
+
+    def test_existing_files_count_towards_quota(self):
+        store = evidence.EvidenceStore(self.root)
+        store.write(make_frame(6), (0, 0, 100, 40))
+        size = store.stats()['bytes']
+        restarted = evidence.EvidenceStore(self.root, max_bytes=size).start()
+        self.assertEqual(restarted.stats()['bytes'], size)
+        restarted.close()
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        store = evidence.EvidenceStore(self.root, queue_size=1) # Not started, nothing drains the queue
+        plate_data = {'box': (0, 0, 10, 10)}
+        self.assertTrue(store.submit(plate_data, make_frame(7)))
+        self.assertFalse(store.submit(plate_data, make_frame(8)))
+        self.assertEqual(store.stats()['dropped'], 1)
+
+    def test_plate_without_box_is_skipped(self):
+        store = evidence.EvidenceStore(self.root)
+        self.assertFalse(store.submit({'plate_number': 'ABC123'}, make_frame(9)))
+
+    def test_from_config(self):
+        test_config = configparser.ConfigParser()
+        self.assertIsNone(evidence.EvidenceStore.from_config(test_config))
+        test_config['Evidence'] = {'Enabled': 'True', 'Directory': self.root, 'Format': 'WEBP', 'QuotaMB': '1'}
+        store = evidence.EvidenceStore.from_config(test_config)
+        self.assertEqual((store.image_format, store.max_bytes), ('webp', 1024 * 1024))
+        with self.assertRaises(ValueError):
+            evidence.EvidenceStore(self.root, image_format='gif')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import unittest
+import configparser
+import csv
+import json
+import os
+import tempfile
+import cv2
+import numpy as np
+import src.ingest as ingest
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+test_config['Motion'] = {'Enabled': 'False'}
+test_config['Tracking'] = {'Enabled': 'False'}
+
+
+class FakeProcessor:
+    """Reads one plate per frame, named after the frame's brightness."""
+    batch_size = 2
+
+    def __init__(self):
+        self.frames_seen = 0
+
+    def detect(self, frames, roi=None):
+        self.frames_seen += len(frames)
+        return [[(0, 0, 10, 10)] for _ in frames]
+
+    def read_plates(self, frames, coords_per_frame, timestamps=None):
+        return [[{'plate_number': f"P{int(frame.mean() // 20)}", 'detection_time': 'now'}] for frame in frames]
+
+
+class FakeTrackingProcessor(FakeProcessor):
+    """One car in view for the whole video, stored once when its track ends."""
+    def __init__(self, stop_after=None, stop_event=None):
+        super().__init__()
+        self.stop_after = stop_after
+        self.stop_event = stop_event
+
+    def detect(self, frames, roi=None):
+        coords = super().detect(frames, roi)
+        if self.stop_after and self.frames_seen >= self.stop_after:
+            self.stop_event.set()
+        return coords
+
+    def read_tracked_plates(self, frames, coords_per_frame, frame_indexes, tracker, timestamps=None):
+        plates_per_frame = []
+        for coords, frame_index in zip(coords_per_frame, frame_indexes):
+            box_tracks, finished = tracker.update(coords, frame_index)
+            for track in box_tracks:
+                track.add_read('CAR1', 0.9)
+            plates_per_frame.append([self.build_track_plate_data(track) for track in finished])
+        return plates_per_frame
+
+    def build_track_plate_data(self, track):
+        return {'plate_number': track.voted_plate(), 'detection_time': 'now', 'track_id': track.track_id}
+
+
+class RecordingCheckpoint(ingest.Checkpoint):
+    def __init__(self):
+        super().__init__(None)
+        self.offsets = []
+
+    def update(self, file_path, offset, done=False):
+        self.offsets.append((offset, done))
+        super().update(file_path, offset, done)
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+        self.flushes = 0
+
+    def write(self, plate_data):
+        self.rows.append(dict(plate_data))
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        pass
+
+
+def write_video(path, frame_count):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for index in range(frame_count):
+        writer.write(np.full((48, 64, 3), index * 20, dtype=np.uint8))
+    writer.release()
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        os.makedirs(os.path.join(self.root, 'day1'))
+        cv2.imwrite(os.path.join(self.root, 'day1', 'a.jpg'), np.zeros((48, 64, 3), dtype=np.uint8))
+        write_video(os.path.join(self.root, 'day1', 'clip.avi'), 6)
+        with open(os.path.join(self.root, 'day1', 'notes.txt'), 'w') as notes:
+            notes.write("not media")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_ingest(self, files, checkpoint, sink, jobs=2):
+        processors = []
+
+        def factory():
+            processors.append(FakeProcessor())
+            return processors[-1]
+
+        bulk = ingest.BulkIngest(files, factory, [sink], checkpoint, jobs=jobs, ingest_config=test_config,
+                                 on_progress=lambda line: None)
+        return bulk.run(), processors
+
+    def test_collect_files_walks_directories_and_globs(self):
+        from_dir = ingest.collect_files([self.root])
+        self.assertEqual([os.path.basename(path) for path in from_dir], ['a.jpg', 'clip.avi'])
+        self.assertEqual(ingest.collect_files([os.path.join(self.root, '**', '*.avi')]), from_dir[1:])
+
+    def test_ingests_images_and_videos(self):
+        sink = ListSink()
+        files = ingest.collect_files([self.root])
+        stats, _ = self.run_ingest(files, ingest.Checkpoint(None), sink)
+
+        self.assertEqual(stats['files_done'], 2)
+        self.assertEqual(stats['frames'], 6) # Images are not counted as video frames
+        self.assertEqual(stats['plates'], 7)
+        video_rows = [row for row in sink.rows if row['source_file'].endswith('clip.avi')]
+        self.assertEqual(sorted(row['frame_index'] for row in video_rows), list(range(6)))
+        self.assertTrue(all(row['location'] == row['source_file'] for row in sink.rows))
+
+    def test_resumes_from_checkpoint(self):
+        checkpoint_path = os.path.join(self.root, 'checkpoint.json')
+        image, clip = ingest.collect_files([self.root])
+        checkpoint = ingest.Checkpoint(checkpoint_path)
+        checkpoint.update(image, 1, done=True)
+        checkpoint.update(clip, 4)
+        checkpoint.save()
+
+        sink = ListSink()
+        stats, processors = self.run_ingest([image, clip], ingest.Checkpoint(checkpoint_path), sink)
+
+        self.assertEqual(sum(processor.frames_seen for processor in processors), 2)
+        self.assertEqual([row['frame_index'] for row in sink.rows], [4, 5])
+        self.assertEqual(stats['files_done'], 2)
+        with open(checkpoint_path) as checkpoint_file:
+            saved = json.load(checkpoint_file)['files'][clip]
+        self.assertEqual((saved['offset'], saved['done']), (6, True))
+        self.assertGreater(sink.flushes, 0) # Flushed before the checkpoint was saved
+
+    def run_tracked(self, processor, max_track_frames='9000'):
+        tracking_config = configparser.ConfigParser()
+        tracking_config.read_dict({'Motion': {'Enabled': 'False'}, 'Tracking': {'Enabled': 'True'},
+                                   'Ingest': {'MaxTrackFrames': max_track_frames}})
+        clip = ingest.collect_files([self.root])[1]
+        sink, checkpoint = ListSink(), RecordingCheckpoint()
+        bulk = ingest.BulkIngest([clip], lambda: processor, [sink], checkpoint, jobs=1,
+                                 ingest_config=tracking_config, on_progress=lambda line: None)
+        processor.stop_event = bulk.stop_event
+        bulk.run()
+        return sink.rows, checkpoint.offsets
+
+    def test_checkpoint_waits_for_live_tracks(self):
+        rows, offsets = self.run_tracked(FakeTrackingProcessor())
+        self.assertEqual([row['plate_number'] for row in rows], ['CAR1'])
+        # The car is tracked from frame 0, a resume must see it again before it is stored
+        self.assertEqual(offsets, [(0, False)] * 3 + [(6, True)])
+
+    def test_long_lived_track_does_not_hold_the_checkpoint_back(self):
+        rows, offsets = self.run_tracked(FakeTrackingProcessor(), max_track_frames='3')
+        # The parked car is stored once its track is three frames old, then tracked again from frame 4
+        self.assertEqual([row['plate_number'] for row in rows], ['CAR1', 'CAR1'])
+        self.assertEqual(offsets, [(0, False), (4, False), (4, False), (6, True)])
+
+    def test_stopping_stores_live_tracks(self):
+        rows, offsets = self.run_tracked(FakeTrackingProcessor(stop_after=2))
+        self.assertEqual([row['plate_number'] for row in rows], ['CAR1'])
+        self.assertEqual(offsets[-1], (2, False))
+
+    def test_checkpoint_never_covers_rows_emitted_during_the_flush(self):
+        checkpoint_path = os.path.join(self.root, 'checkpoint.json')
+        clip = ingest.collect_files([self.root])[1]
+        checkpoint = ingest.Checkpoint(checkpoint_path)
+        checkpoint.update(clip, 2)
+
+        class RacingSink(ListSink):
+            def flush(self):
+                checkpoint.update(clip, 4) # A worker moves on while the sinks are flushed
+
+        bulk = ingest.BulkIngest([clip], FakeProcessor, [RacingSink()], checkpoint, ingest_config=test_config)
+        bulk.save_checkpoint()
+        with open(checkpoint_path) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)['files'][clip]['offset'], 2)
+
+    def test_changed_file_is_processed_again(self):
+        image = ingest.collect_files([self.root])[0]
+        checkpoint = ingest.Checkpoint(None)
+        checkpoint.update(image, 1, done=True)
+        cv2.imwrite(image, np.zeros((96, 64, 3), dtype=np.uint8)) # New size
+        self.assertFalse(checkpoint.is_done(image))
+
+    def test_unreadable_file_is_counted_as_failed(self):
+        broken = os.path.join(self.root, 'broken.png')
+        with open(broken, 'w') as broken_file:
+            broken_file.write("not an image")
+        stats, _ = self.run_ingest([broken], ingest.Checkpoint(None), ListSink(), jobs=1)
+        self.assertEqual((stats['files_done'], stats['files_failed']), (0, 1))
+
+    def test_csv_sink_writes_header_once(self):
+        path = os.path.join(self.root, 'plates.csv')
+        for _ in range(2):
+            sink = ingest.CsvSink(path)
+            sink.write({'plate_number': 'ABC123', 'frame_index': 3, 'other': 'ignored'})
+            sink.close()
+        with open(path, newline='') as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        self.assertEqual([row['plate_number'] for row in rows], ['ABC123', 'ABC123'])
+
+
+if __name__ == '__main__':
+    unittest.main()
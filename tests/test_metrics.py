@@ -0,0 +1,117 @@
+import unittest
+import configparser
+import json
+import os
+import tempfile
+import urllib.request
+import src.metrics as metrics
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_observe_and_quantiles(self):
+        registry = metrics.MetricsRegistry()
+        histogram = registry.histogram('stage_seconds', stage='ocr')
+        for _ in range(90):
+            histogram.observe(0.003)
+        for _ in range(10):
+            histogram.observe(0.2)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 100)
+        self.assertAlmostEqual(snapshot['sum'], 90 * 0.003 + 10 * 0.2)
+        self.assertTrue(0.0025 <= snapshot['p50'] <= 0.005)
+        self.assertTrue(0.1 <= snapshot['p95'] <= 0.25)
+
+    def test_timer_records_duration(self):
+        registry = metrics.MetricsRegistry()
+        histogram = registry.histogram('stage_seconds', stage='yolo')
+        with histogram.time():
+            pass
+        self.assertEqual(histogram.count, 1)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = metrics.MetricsRegistry()
+        registry.enabled = False
+        histogram = registry.histogram('stage_seconds', stage='yolo')
+        with histogram.time():
+            pass
+        histogram.observe(0.1)
+        self.assertEqual(histogram.count, 0)
+
+    def test_empty_histogram_has_no_quantiles(self):
+        snapshot = metrics.MetricsRegistry().histogram('stage_seconds', stage='crop').snapshot()
+        self.assertEqual(snapshot['count'], 0)
+        self.assertIsNone(snapshot['p99'])
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def test_same_name_and_labels_return_the_same_metric(self):
+        self.assertIs(self.registry.counter('frames_dropped_total', queue='frame'),
+                      self.registry.counter('frames_dropped_total', queue='frame'))
+        self.assertIsNot(self.registry.counter('frames_dropped_total', queue='frame'),
+                         self.registry.counter('frames_dropped_total', queue='ocr'))
+
+    def test_snapshot(self):
+        self.registry.counter('frames_decoded_total').inc(3)
+        self.registry.gauge('queue_depth', queue='frame').set_function(lambda: 5)
+        self.registry.histogram('stage_seconds', stage='decode').observe(0.01)
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['frames_decoded_total'], {'value': 3})
+        self.assertEqual(snapshot['queue_depth'], {'queue=frame': 5})
+        self.assertEqual(snapshot['stage_seconds']['stage=decode']['count'], 1)
+
+    def test_prometheus_text(self):
+        self.registry.counter('frames_dropped_total', "Frames dropped.", queue='frame').inc(2)
+        histogram = self.registry.histogram('stage_seconds', buckets=(0.01, 0.1), stage='ocr')
+        histogram.observe(0.005)
+        histogram.observe(0.05)
+        histogram.observe(1.0)
+        text = self.registry.to_prometheus()
+        self.assertIn('# HELP visionguard_frames_dropped_total Frames dropped.', text)
+        self.assertIn('visionguard_frames_dropped_total{queue="frame"} 2', text)
+        self.assertIn('# TYPE visionguard_stage_seconds histogram', text)
+        self.assertIn('visionguard_stage_seconds_bucket{stage="ocr",le="0.01"} 1', text)
+        self.assertIn('visionguard_stage_seconds_bucket{stage="ocr",le="0.1"} 2', text)
+        self.assertIn('visionguard_stage_seconds_bucket{stage="ocr",le="+Inf"} 3', text)
+        self.assertIn('visionguard_stage_seconds_count{stage="ocr"} 3', text)
+
+    def test_failing_gauge_function_is_skipped(self):
+        self.registry.gauge('queue_depth', queue='frame').set_function(lambda: 1 / 0)
+        self.assertNotIn('queue_depth{', self.registry.to_prometheus())
+
+
+class TestExporters(unittest.TestCase):
+
+    def test_http_endpoint(self):
+        registry = metrics.MetricsRegistry()
+        registry.counter('frames_decoded_total').inc()
+        server = metrics.serve_http(0, metrics_registry=registry)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                body = response.read().decode('utf-8')
+            self.assertIn('visionguard_frames_decoded_total 1', body)
+        finally:
+            server.shutdown()
+
+    def test_periodic_dump(self):
+        registry = metrics.MetricsRegistry()
+        registry.counter('frames_decoded_total').inc(4)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'metrics.json')
+            dumper = metrics.PeriodicDumper(path, 60, metrics_registry=registry).start()
+            dumper.stop() # Writes a final snapshot
+            with open(path) as dump_file:
+                self.assertEqual(json.load(dump_file)['metrics']['frames_decoded_total'], {'value': 4})
+
+    def test_start_exporters_with_nothing_configured(self):
+        config = configparser.ConfigParser()
+        config.read_string("[Metrics]\nEnabled = True\nHttpPort = 0\nDumpFile =\n")
+        self.assertEqual(metrics.start_exporters(config), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
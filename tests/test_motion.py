@@ -0,0 +1,50 @@
+import unittest
+import configparser
+import numpy as np
+import src.motion as motion
+
+
+def blank_frame():
+    return np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def frame_with_car(x):
+    frame = blank_frame()
+    frame[200:300, x:x + 120] = 255 # A bright box standing in for a vehicle
+    return frame
+
+
+class TestMotionGate(unittest.TestCase):
+
+    def test_static_frames_are_skipped(self):
+        gate = motion.MotionGate()
+        self.assertTrue(gate.check(blank_frame())) # First frame always passes
+        self.assertFalse(gate.check(blank_frame()))
+        self.assertFalse(gate.check(blank_frame()))
+        self.assertTrue(gate.check(frame_with_car(100)))
+        self.assertTrue(gate.check(frame_with_car(140)))
+        self.assertEqual(gate.stats(), {'frames_checked': 5, 'frames_skipped': 2})
+
+    def test_max_skip_frames(self):
+        gate = motion.MotionGate(max_skip_frames=2)
+        results = [gate.check(blank_frame()) for _ in range(7)]
+        self.assertEqual(results, [True, False, False, True, False, False, True])
+
+    def test_background_method(self):
+        gate = motion.MotionGate(method='background')
+        for _ in range(20):
+            gate.check(blank_frame())
+        self.assertFalse(gate.check(blank_frame()))
+        self.assertTrue(gate.check(frame_with_car(200)))
+
+    def test_from_config(self):
+        test_config = configparser.ConfigParser()
+        self.assertIsNone(motion.MotionGate.from_config(test_config)) # Disabled unless configured
+        test_config['Motion'] = {'Enabled': 'True', 'Method': 'background', 'MaxSkipFrames': '10'}
+        gate = motion.MotionGate.from_config(test_config)
+        self.assertEqual(gate.method, 'background')
+        self.assertEqual(gate.max_skip_frames, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+import src.ocr_cache as ocr_cache
+
+
+def plate_crop(text="AB123CD", noise_seed=None):
+    crop = np.full((40, 160, 3), 255, dtype=np.uint8)
+    cv2.putText(crop, text, (5, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+    if noise_seed is not None: # Sensor noise between frames of a parked car
+        noise = np.random.default_rng(noise_seed).integers(-6, 7, size=crop.shape)
+        crop = np.clip(crop.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return crop
+
+
+class TestDifferenceHash(unittest.TestCase):
+
+    def test_near_duplicates_hash_alike(self):
+        first = ocr_cache.difference_hash(plate_crop(noise_seed=1))
+        second = ocr_cache.difference_hash(plate_crop(noise_seed=2))
+        one_character_off = ocr_cache.difference_hash(plate_crop("AB128CD"))
+        other = ocr_cache.difference_hash(plate_crop("XY987ZW"))
+        self.assertLessEqual(bin(first ^ second).count('1'), 3)
+        self.assertGreater(bin(first ^ one_character_off).count('1'), 3)
+        self.assertGreater(bin(first ^ other).count('1'), 3)
+
+
+class TestOCRCache(unittest.TestCase):
+
+    def test_hit_for_near_duplicate_crop(self):
+        cache = ocr_cache.OCRCache()
+        cache.put(cache.key(plate_crop(noise_seed=1), (100, 200, 260, 240)), ("AB123CD", 0.9))
+        # Same plate, a few pixels further and with different noise
+        self.assertEqual(cache.get(cache.key(plate_crop(noise_seed=2), (103, 198, 262, 241))), ("AB123CD", 0.9))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_miss_for_other_plate_or_position(self):
+        cache = ocr_cache.OCRCache()
+        cache.put(cache.key(plate_crop(), (100, 200, 260, 240)), ("AB123CD", 0.9))
+        self.assertIsNone(cache.get(cache.key(plate_crop("XY987ZW"), (100, 200, 260, 240))))
+        self.assertIsNone(cache.get(cache.key(plate_crop(), (400, 200, 560, 240))))
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    @patch('src.ocr_cache.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        cache = ocr_cache.OCRCache(ttl=5.0)
+        key = cache.key(plate_crop(), (0, 0, 160, 40))
+        mock_monotonic.return_value = 100.0
+        cache.put(key, ("AB123CD", 0.9))
+        mock_monotonic.return_value = 104.0
+        self.assertIsNotNone(cache.get(key))
+        mock_monotonic.return_value = 106.0
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats()['expired'], 1)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ocr_cache.OCRCache(max_entries=2)
+        keys = [cache.key(plate_crop(), (index * 200, 0, index * 200 + 160, 40)) for index in range(3)]
+        cache.put(keys[0], ("A", 0.9))
+        cache.put(keys[1], ("B", 0.9))
+        cache.get(keys[0]) # keys[1] is now the least recently used
+        cache.put(keys[2], ("C", 0.9))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_empty_reads_are_cached_too(self):
+        cache = ocr_cache.OCRCache()
+        key = cache.key(plate_crop(), (0, 0, 160, 40))
+        cache.put(key, (None, 0.0))
+        self.assertEqual(cache.get(key), (None, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
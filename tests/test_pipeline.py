@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import shutil
+import tempfile
+import configparser
+import cv2
+import numpy as np
+import src.pipeline as pipeline
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+test_config['Pipeline'] = {'QueueSize': '2', 'OCRWorkers': '2'}
+test_config['Tracking'] = {'Enabled': 'False'}
+
+
+def write_test_video(path, frame_count):
+    """Writes a small synthetic video, every frame is filled with its own index."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for index in range(frame_count):
+        writer.write(np.full((48, 64, 3), index, dtype=np.uint8))
+    writer.release()
+
+
+class TestBoundedQueue(unittest.TestCase):
+
+    def test_drop_oldest(self):
+        bounded_queue = pipeline.BoundedQueue(2, 'drop_oldest')
+        for item in range(4):
+            self.assertTrue(bounded_queue.put(item))
+        self.assertEqual([bounded_queue.get(), bounded_queue.get()], [2, 3])
+        self.assertEqual(bounded_queue.dropped, 2)
+
+    def test_keep_every_nth(self):
+        bounded_queue = pipeline.BoundedQueue(1, 'keep_every_nth', keep_every_n=3)
+        self.assertTrue(bounded_queue.put('kept'))
+        self.assertFalse(bounded_queue.put('dropped1'))
+        self.assertFalse(bounded_queue.put('dropped2'))
+        self.assertEqual(bounded_queue.dropped, 2)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            pipeline.BoundedQueue(1, 'drop_newest')
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, 'test.avi')
+        write_test_video(self.video_path, 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_video_file_runs_through_all_stages(self):
+        processor = MagicMock(batch_size=4, max_batch_wait=0.01)
+        processor.roi_for_source.return_value = None
+        # Every frame holds one car, every car reads as one plate
+        processor.detect.side_effect = lambda frames, roi=None: [[(0, 0, 10, 10)] for _ in frames]
+        processor.read_plates.side_effect = lambda frames, coords, timestamps=None: [
+            [{'plate_number': f"P{int(frame[0, 0, 0])}"}] for frame in frames]
+        mock_db_conn = MagicMock()
+        mock_db_conn.insert_plate_data.return_value = 1
+        seen_frames, stored, detected = [], [], []
+
+        streaming_pipeline = pipeline.StreamingPipeline(processor, self.video_path, test_config,
+                                                        db_factory=lambda: mock_db_conn,
+                                                        on_frame=seen_frames.append, on_plate=stored.append,
+                                                        on_detect=detected.append)
+        stats = streaming_pipeline.run()
+
+        self.assertEqual(stats['frames_decoded'], 10)
+        self.assertEqual(stats['frames_dropped'], 0) # Files use backpressure, not dropping
+        self.assertEqual(stats['frames_persisted'], 10)
+        self.assertEqual(len(seen_frames), 10)
+        self.assertEqual(len(stored), 10)
+        self.assertEqual([item.coords for item in detected], [[(0, 0, 10, 10)]] * 10)
+        self.assertEqual(mock_db_conn.insert_plate_data.call_count, 10)
+        mock_db_conn.close.assert_called_once()
+
+    def test_stored_plates_are_sent_to_the_evidence_store(self):
+        processor = MagicMock(batch_size=4, max_batch_wait=0.01)
+        processor.roi_for_source.return_value = None
+        processor.detect.side_effect = lambda frames, roi=None: [[(0, 0, 10, 10)] for _ in frames]
+        processor.read_plates.side_effect = lambda frames, coords, timestamps=None: [
+            [{'plate_number': f"P{int(frame[0, 0, 0])}", 'box': (0, 0, 10, 10)}] for frame in frames]
+        mock_db_conn, evidence_store = MagicMock(), MagicMock()
+
+        pipeline.StreamingPipeline(processor, self.video_path, test_config, db_factory=lambda: mock_db_conn,
+                                   evidence=evidence_store).run()
+
+        self.assertEqual(evidence_store.submit.call_count, 10)
+        plate_data, frame = evidence_store.submit.call_args.args
+        self.assertEqual(plate_data['plate_number'], f"P{int(frame[0, 0, 0])}") # Sent with its own frame
+        self.assertEqual(evidence_store.submit.call_args.kwargs['on_stored'], mock_db_conn.set_image_path)
+        evidence_store.flush.assert_called_once() # Before the writer was closed
+
+    def test_tracking_keeps_frames_in_order(self):
+        tracking_config = configparser.ConfigParser()
+        tracking_config.read_dict({'Pipeline': {'DetectWorkers': '4', 'OCRWorkers': '4'},
+                                   'Tracking': {'Enabled': 'True'}})
+        streaming_pipeline = pipeline.StreamingPipeline(MagicMock(batch_size=1, max_batch_wait=0.0), self.video_path,
+                                                        tracking_config, db_factory=MagicMock())
+        self.assertEqual((streaming_pipeline.detect_stage.workers, streaming_pipeline.ocr_stage.workers), (1, 1))
+
+    def test_missing_source_finishes(self):
+        processor = MagicMock(batch_size=1, max_batch_wait=0.0)
+        streaming_pipeline = pipeline.StreamingPipeline(processor, os.path.join(self.temp_dir, 'missing.avi'),
+                                                        test_config, db_factory=MagicMock())
+        stats = streaming_pipeline.run()
+        self.assertEqual(stats['frames_decoded'], 0)
+        processor.detect.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import datetime
+import os
+import src.database as db
+import src.queries as queries
+
+TEST_DB_PATH = 'test_queries.db'
+BASE_TS = 1722081600 # 2024-07-27 12:00:00 UTC
+
+
+class TestPlateQueries(unittest.TestCase):
+    def setUp(self):
+        self.db_conn = db.DatabaseConnection(TEST_DB_PATH).connect()
+        plates = []
+        for index in range(20):
+            plate_number = ['ABC123', 'ABD456', 'XYZ789', 'AB1234'][index % 4]
+            plates.append({'plate_number': plate_number, 'image_path': 'N/A',
+                           'detection_time': '2024-07-27 12:00:00', 'detection_ts': BASE_TS + index * 60})
+        self.db_conn.insert_many(plates)
+        self.queries = queries.PlateQueries(self.db_conn)
+
+    def tearDown(self):
+        self.db_conn.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(TEST_DB_PATH + suffix):
+                os.remove(TEST_DB_PATH + suffix)
+
+    def test_find_plate(self):
+        plates = self.queries.find_plate('abc 123')
+        self.assertEqual(len(plates), 5)
+        self.assertTrue(all(plate['plate_number'] == 'ABC123' for plate in plates))
+        self.assertEqual(plates[0]['detection_ts'], BASE_TS + 16 * 60) # Newest first
+
+    def test_search_plates(self):
+        self.assertEqual({plate['plate_number'] for plate in self.queries.search_plates('AB*')},
+                         {'ABC123', 'ABD456', 'AB1234'})
+        self.assertEqual({plate['plate_number'] for plate in self.queries.search_plates('AB?4*')},
+                         {'ABD456'})
+        with self.assertRaises(ValueError):
+            self.queries.search_plates("AB'; DROP TABLE license_plates; --")
+
+    def test_search_over_many_partitions(self):
+        self.db_conn.close()
+        os.remove(TEST_DB_PATH)
+        self.db_conn = db.DatabaseConnection(TEST_DB_PATH, partitioning='day').connect()
+        day_ts = int(datetime.datetime(2024, 1, 1, 12).timestamp())
+        plates = [{'plate_number': f"AB{index:04d}", 'image_path': 'N/A', 'detection_time': '',
+                   'detection_ts': day_ts + index * 86400} for index in range(510)] # More than SQLite's 500 terms
+        self.db_conn.insert_many(plates)
+        found = queries.PlateQueries(self.db_conn).search_plates('AB*', limit=20)
+        self.assertEqual([plate['plate_number'] for plate in found], [f"AB{index:04d}" for index in range(20)])
+
+    def test_plates_between_pages(self):
+        first_page = self.queries.plates_between(BASE_TS + 60, BASE_TS + 10 * 60, limit=5)
+        second_page = self.queries.plates_between(BASE_TS + 60, BASE_TS + 10 * 60, limit=5,
+                                                  after=queries.page_key(first_page[-1]))
+        timestamps = [plate['detection_ts'] for plate in first_page + second_page]
+        self.assertEqual(timestamps, [BASE_TS + index * 60 for index in range(1, 10)])
+
+    def test_latest_plates_pages(self):
+        first_page = self.queries.latest_plates(limit=3)
+        second_page = self.queries.latest_plates(limit=3, before=queries.page_key(first_page[-1]))
+        self.assertEqual([plate['id'] for plate in first_page + second_page], [20, 19, 18, 17, 16, 15])
+
+    def test_queries_use_indexes(self):
+        plan = self.queries.explain("SELECT * FROM license_plates WHERE plate_number = ?", ('ABC123',))
+        self.assertTrue(any('idx_license_plates_plate' in step for step in plan))
+        plan = self.queries.explain("SELECT * FROM license_plates WHERE plate_number GLOB ?", ('AB*',))
+        self.assertTrue(any('idx_license_plates_plate' in step for step in plan))
+        plan = self.queries.explain("SELECT * FROM license_plates WHERE detection_ts >= ? AND detection_ts < ?",
+                                    (BASE_TS, BASE_TS + 600))
+        self.assertTrue(any('idx_license_plates_ts' in step for step in plan))
+
+
+class TestPartitionedQueries(unittest.TestCase):
+    def setUp(self):
+        self.db_conn = db.DatabaseConnection(TEST_DB_PATH, partitioning='day').connect()
+        self.day_starts = [int(datetime.datetime(2024, 7, day).timestamp()) for day in (26, 27, 28)]
+        plates = []
+        for day_start in self.day_starts: # Three days, four sightings each, an hour apart
+            for hour in range(4):
+                plates.append({'plate_number': ['ABC123', 'XYZ789'][hour % 2], 'image_path': 'N/A',
+                               'detection_time': '', 'detection_ts': day_start + hour * 3600})
+        self.db_conn.insert_many(plates)
+        self.queries = queries.PlateQueries(self.db_conn)
+
+    def tearDown(self):
+        self.db_conn.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(TEST_DB_PATH + suffix):
+                os.remove(TEST_DB_PATH + suffix)
+
+    def test_find_plate_reads_newest_partition_first(self):
+        plates = self.queries.find_plate('ABC123', limit=3)
+        self.assertEqual([plate['detection_ts'] for plate in plates],
+                         [self.day_starts[2] + 7200, self.day_starts[2], self.day_starts[1] + 7200])
+
+    def test_plates_between_pages_across_partitions(self):
+        start, end = self.day_starts[0] + 3 * 3600, self.day_starts[2] + 3600
+        self.assertEqual(self.queries.tables_between(start, end),
+                         ['license_plates', 'license_plates_20240726', 'license_plates_20240727',
+                          'license_plates_20240728'])
+        self.assertEqual(self.queries.tables_between(self.day_starts[1], self.day_starts[1] + 3600),
+                         ['license_plates', 'license_plates_20240727'])
+        first_page = self.queries.plates_between(start, end, limit=4)
+        second_page = self.queries.plates_between(start, end, limit=4, after=queries.page_key(first_page[-1]))
+        self.assertEqual([plate['detection_ts'] for plate in first_page + second_page],
+                         [self.day_starts[0] + 3 * 3600] + [self.day_starts[1] + hour * 3600 for hour in range(4)]
+                         + [self.day_starts[2]])
+
+    def test_latest_and_search_cover_every_partition(self):
+        first_page = self.queries.latest_plates(limit=5)
+        second_page = self.queries.latest_plates(limit=10, before=queries.page_key(first_page[-1]))
+        self.assertEqual(len(first_page + second_page), 12)
+        self.assertEqual(len({plate['id'] for plate in first_page + second_page}), 12)
+        self.assertEqual(len(self.queries.search_plates('XYZ*')), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
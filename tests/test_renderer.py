@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import queue
+import numpy as np
+import src.renderer as renderer
+
+
+class TestLatestFrame(unittest.TestCase):
+
+    def test_only_the_newest_frame_is_kept(self):
+        latest = renderer.LatestFrame()
+        for frame in ('frame1', 'frame2', 'frame3'):
+            latest.put(frame)
+        self.assertEqual(latest.take(), 'frame3')
+        self.assertIsNone(latest.take())
+        self.assertEqual(latest.dropped, 2)
+
+
+class TestPrepareFrame(unittest.TestCase):
+
+    def test_fit_size_keeps_aspect_and_never_upscales(self):
+        self.assertEqual(renderer.fit_size(1920, 1080, 960, 720), (960, 540))
+        self.assertEqual(renderer.fit_size(640, 360, 960, 720), (640, 360))
+        self.assertEqual(renderer.fit_size(640, 360, 1, 1), (640, 360)) # Widget not laid out yet
+
+    def test_frame_is_downscaled_with_overlays(self):
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        image = renderer.prepare_frame(frame, 960, 540, boxes=[(200, 200, 600, 400)], plates=['AB123CD'])
+        self.assertEqual(image.size, (960, 540))
+        pixels = np.asarray(image)
+        self.assertEqual(tuple(pixels[100, 200]), (0, 255, 0)) # Box edge at half scale, in RGB
+        self.assertEqual(frame.max(), 0) # The pipeline's frame is left untouched
+
+    def test_overlays_expire(self):
+        overlays = renderer.Overlays(max_age=1.0)
+        with patch('src.renderer.time.monotonic', return_value=10.0):
+            overlays.set_boxes([(0, 0, 10, 10)])
+            overlays.add_plates(['AB123CD'])
+        with patch('src.renderer.time.monotonic', return_value=10.5):
+            self.assertEqual(overlays.current(), ([(0, 0, 10, 10)], ['AB123CD']))
+        with patch('src.renderer.time.monotonic', return_value=12.0):
+            self.assertEqual(overlays.current(), ([], ['AB123CD']))
+
+
+class TestFrameRenderer(unittest.TestCase):
+
+    def test_tick_shows_latest_frame_and_reschedules(self):
+        window = MagicMock()
+        frame_renderer = renderer.FrameRenderer(window, MagicMock(), fps=50)
+        frame_renderer.running = True
+        with patch.object(frame_renderer, '_show') as mock_show:
+            frame_renderer.submit('old')
+            frame_renderer.submit('new')
+            frame_renderer._tick()
+            frame_renderer._tick() # Nothing new to draw
+        mock_show.assert_called_once_with('new')
+        window.after.assert_called_with(20, frame_renderer._tick)
+
+    def test_drain_batches_log_lines(self):
+        log_queue = queue.Queue()
+        for index in range(5):
+            log_queue.put(f"line {index}")
+        self.assertEqual(renderer.drain(log_queue, max_items=3), ['line 0', 'line 1', 'line 2'])
+        self.assertEqual(renderer.drain(log_queue), ['line 3', 'line 4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import configparser
+import threading
+import time
+import numpy as np
+import src.scheduler as scheduler
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+test_config['Motion'] = {'Enabled': 'False'}
+test_config['Tracking'] = {'Enabled': 'False'}
+
+tracking_config = configparser.ConfigParser()
+tracking_config['Motion'] = {'Enabled': 'False'}
+tracking_config['Tracking'] = {'Enabled': 'True', 'MaxMissedFrames': '2'}
+
+START_TIME = 1722081600.0
+
+
+def fake_frames(count):
+    def sample_frames(source, stop_event=None, **sampling):
+        for index in range(count):
+            if stop_event is not None and stop_event.is_set():
+                break
+            yield index, np.full((48, 64, 3), index % 256, dtype=np.uint8), START_TIME + index
+    return sample_frames
+
+
+class FakeProcessor:
+    """Reads one plate per frame and takes a fixed time per model call."""
+    batch_size = 1
+    calls = 0
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def warm_up(self):
+        pass
+
+    def roi_for_source(self, source):
+        return None
+
+    def detect(self, frames, roi=None):
+        time.sleep(self.delay)
+        FakeProcessor.calls += 1
+        return [[(0, 0, 10, 10)] for _ in frames]
+
+    def read_plates(self, frames, coords_per_frame, timestamps=None):
+        return [[{'plate_number': f"P{int(frame[0, 0, 0])}", 'detection_time': 'now', 'detection_ts': timestamp}]
+                for frame, timestamp in zip(frames, timestamps)]
+
+
+class FakeTrackingProcessor(FakeProcessor):
+    """One car in view for frames 0-11, and a second one from frame 15 to the end of the video."""
+    def detect(self, frames, roi=None):
+        time.sleep(self.delay)
+        coords_per_frame = []
+        for frame in frames:
+            index = int(frame[0, 0, 0])
+            coords_per_frame.append([(0, 0, 10, 10)] if index < 12 else [(30, 30, 50, 50)] if index >= 15 else [])
+        return coords_per_frame
+
+    def read_tracked_plates(self, frames, coords_per_frame, frame_indexes, tracker, timestamps=None):
+        plates_per_frame = []
+        for coords, frame_index in zip(coords_per_frame, frame_indexes):
+            box_tracks, finished = tracker.update(coords, frame_index)
+            for track in box_tracks:
+                track.add_read(f"CAR{track.track_id}", 0.9)
+            plates_per_frame.append([self.build_track_plate_data(track) for track in finished])
+        return plates_per_frame
+
+    def build_track_plate_data(self, track):
+        return {'plate_number': track.voted_plate(), 'detection_time': 'now', 'track_id': track.track_id,
+                'frame': np.zeros((2, 2, 3), dtype=np.uint8)}
+
+
+def make_camera(scheduler_instance, name, due, pass_value=0.0, priority=1.0, target_fps=10.0):
+    camera = scheduler_instance.add_source(name, f"{name}.avi", target_fps, priority)
+    camera.frame, camera.frame_index = np.zeros((2, 2, 3), dtype=np.uint8), 0
+    camera.next_due, camera.pass_value = due, pass_value
+    return camera
+
+
+class TestCameraScheduler(unittest.TestCase):
+
+    def make_scheduler(self, policy='fair', **kwargs):
+        return scheduler.CameraScheduler(FakeProcessor, policy=policy, scheduler_config=test_config,
+                                         db_conn=MagicMock(), **kwargs)
+
+    def test_fair_policy_prefers_the_least_served_camera(self):
+        camera_scheduler = self.make_scheduler()
+        make_camera(camera_scheduler, 'busy', due=0.0, pass_value=5.0)
+        make_camera(camera_scheduler, 'quiet', due=0.0, pass_value=1.0)
+        jobs = camera_scheduler.next_batch()
+        self.assertEqual(jobs[0][0].name, 'quiet')
+
+    def test_deadline_policy_prefers_the_earliest_deadline(self):
+        camera_scheduler = self.make_scheduler(policy='deadline')
+        make_camera(camera_scheduler, 'late', due=0.0, priority=2.0) # deadline 0.05
+        make_camera(camera_scheduler, 'early', due=0.0, priority=4.0) # deadline 0.025
+        self.assertEqual(camera_scheduler.next_batch()[0][0].name, 'early')
+
+    def test_frames_are_not_scheduled_before_they_are_due(self):
+        camera_scheduler = self.make_scheduler()
+        camera = make_camera(camera_scheduler, 'cam', due=time.monotonic() + 0.2)
+        camera_scheduler.cameras['cam'].finished = True
+        start = time.monotonic()
+        self.assertEqual(len(camera_scheduler.next_batch()), 1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertIsNone(camera.frame)
+
+    def test_batch_takes_one_frame_per_camera(self):
+        camera_scheduler = self.make_scheduler()
+        for name in ('a', 'b', 'c'):
+            make_camera(camera_scheduler, name, due=0.0)
+        self.assertEqual(sorted(job[0].name for job in camera_scheduler.next_batch(2)), ['a', 'b'])
+
+    def test_no_cameras_returns_instead_of_waiting(self):
+        camera_scheduler = self.make_scheduler()
+        self.assertIsNone(camera_scheduler.next_batch())
+        self.assertEqual(camera_scheduler.run(), {})
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            self.make_scheduler(policy='random')
+
+    @patch('src.scheduler.video.sample_frames', fake_frames(20))
+    def test_all_file_frames_are_processed_and_stored(self):
+        db_conn = MagicMock()
+        db_conn.insert_plate_data.return_value = None
+        plates = []
+        lock = threading.Lock()
+
+        def on_plate(plate):
+            with lock:
+                plates.append(plate)
+        camera_scheduler = scheduler.CameraScheduler(FakeProcessor, workers=2, scheduler_config=test_config,
+                                                     db_conn=db_conn, on_plate=on_plate)
+        camera_scheduler.add_source('north', 'north.avi', target_fps=0)
+        camera_scheduler.add_source('south', 'south.avi', target_fps=0)
+        stats = camera_scheduler.run()
+        self.assertEqual(stats['north']['frames_processed'], 20)
+        self.assertEqual(stats['south']['frames_processed'], 20)
+        self.assertEqual(db_conn.insert_plate_data.call_count, 40)
+        self.assertEqual({plate['location'] for plate in plates}, {'north', 'south'})
+        # Plates carry the time of their frame, not the time they were processed
+        self.assertEqual(sorted(plate['detection_ts'] - START_TIME for plate in plates if plate['location'] == 'north'),
+                         list(range(20)))
+
+    @patch('src.scheduler.video.sample_frames', fake_frames(20))
+    def test_tracking_stores_one_row_per_vehicle(self):
+        db_conn = MagicMock()
+        db_conn.insert_plate_data.return_value = None
+        plates = []
+        lock = threading.Lock()
+
+        def on_plate(plate):
+            with lock:
+                plates.append(plate)
+        camera_scheduler = scheduler.CameraScheduler(lambda: FakeTrackingProcessor(delay=0.001), workers=2,
+                                                     scheduler_config=tracking_config, db_conn=db_conn,
+                                                     on_plate=on_plate)
+        camera_scheduler.add_source('north', 'north.avi', target_fps=0)
+        camera_scheduler.add_source('south', 'south.avi', target_fps=0)
+        stats = camera_scheduler.run()
+        self.assertEqual(stats['north']['frames_processed'], 20)
+        # Two cars per camera: one leaves the view, the other is still there when the video ends
+        self.assertEqual(db_conn.insert_plate_data.call_count, 4)
+        self.assertEqual(sorted((plate['location'], plate['plate_number']) for plate in plates),
+                         [('north', 'CAR1'), ('north', 'CAR2'), ('south', 'CAR1'), ('south', 'CAR2')])
+        self.assertFalse(any('frame' in plate for plate in plates))
+        self.assertEqual(stats['south']['plates'], 2)
+
+    @patch('src.scheduler.video.sample_frames', fake_frames(1000))
+    def test_shares_follow_priority_under_load(self):
+        camera_scheduler = scheduler.CameraScheduler(lambda: FakeProcessor(delay=0.002), workers=1,
+                                                     scheduler_config=test_config, db_conn=MagicMock())
+        camera_scheduler.add_source('high', 'high.avi', target_fps=0, priority=3)
+        camera_scheduler.add_source('low', 'low.avi', target_fps=0, priority=1)
+        camera_scheduler.start()
+        time.sleep(0.5)
+        camera_scheduler.stop()
+        camera_scheduler.join(5)
+        stats = camera_scheduler.stats()
+        high, low = stats['high']['frames_processed'], stats['low']['frames_processed']
+        self.assertGreater(low, 0) # The low priority camera is not starved
+        self.assertAlmostEqual(high / low, 3.0, delta=0.6)
+
+    @patch('src.scheduler.video.sample_frames', fake_frames(1000))
+    def test_target_fps_limits_a_camera(self):
+        camera_scheduler = scheduler.CameraScheduler(FakeProcessor, workers=1, scheduler_config=test_config,
+                                                     db_conn=MagicMock())
+        camera_scheduler.add_source('slow', 'slow.avi', target_fps=20)
+        camera_scheduler.start()
+        time.sleep(0.5)
+        camera_scheduler.stop()
+        camera_scheduler.join(5)
+        self.assertLessEqual(camera_scheduler.stats()['slow']['frames_processed'], 12)
+
+
+class TestCamerasFromConfig(unittest.TestCase):
+
+    def test_parse(self):
+        cameras_config = configparser.ConfigParser()
+        cameras_config.read_string("[Cameras]\ngate = rtsp://10.0.0.5/stream, 5, 2\nlot = 0, 2.5, 1\n")
+        self.assertEqual(scheduler.cameras_from_config(cameras_config),
+                         [('gate', 'rtsp://10.0.0.5/stream', 5.0, 2.0), ('lot', '0', 2.5, 1.0)])
+
+    def test_invalid_entry(self):
+        cameras_config = configparser.ConfigParser()
+        cameras_config.read_string("[Cameras]\ngate = rtsp://10.0.0.5/stream\n")
+        with self.assertRaises(ValueError):
+            scheduler.cameras_from_config(cameras_config)
+
+
+if __name__ == '__main__':
+    unittest.main()
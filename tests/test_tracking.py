@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+import configparser
+import numpy as np
+import src.alpr
+import src.tracking as tracking
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+
+
+class TestPlateTracker(unittest.TestCase):
+
+    def test_box_iou(self):
+        self.assertEqual(tracking.box_iou((0, 0, 10, 10), (20, 20, 30, 30)), 0.0)
+        self.assertAlmostEqual(tracking.box_iou((0, 0, 10, 10), (5, 0, 15, 10)), 1 / 3)
+
+    def test_moving_box_keeps_its_track(self):
+        tracker = tracking.PlateTracker(iou_threshold=0.3, max_missed=2)
+        first, _ = tracker.update([(0, 0, 100, 40)], 0)
+        second, _ = tracker.update([(10, 0, 110, 40), (300, 0, 400, 40)], 1)
+        self.assertIs(second[0], first[0])
+        self.assertIsNot(second[1], first[0])
+        self.assertEqual(tracker.stats['tracks_started'], 2)
+
+    def test_track_finishes_after_max_missed(self):
+        tracker = tracking.PlateTracker(max_missed=2)
+        tracks, _ = tracker.update([(0, 0, 100, 40)], 0)
+        _, finished = tracker.update([], 2)
+        self.assertEqual(finished, [])
+        _, finished = tracker.update([], 3)
+        self.assertEqual(finished, tracks)
+        self.assertEqual(tracker.tracks, [])
+
+    def test_max_missed_counts_sampled_frames(self):
+        tracker = tracking.PlateTracker(max_missed=5)
+        tracks, _ = tracker.update([(0, 0, 100, 40)], 0)
+        tracker.update([], 6) # Every sixth frame is analysed, the car is missed once
+        second, finished = tracker.update([(5, 0, 105, 40)], 12)
+        self.assertEqual(finished, [])
+        self.assertIs(second[0], tracks[0])
+        _, finished = tracker.update([], 48) # Six analysed frames later
+        self.assertEqual(finished, tracks)
+
+    def test_ocr_only_until_confident(self):
+        tracker = tracking.PlateTracker(min_confidence=0.6, max_reads=3)
+        track = tracker.update([(0, 0, 100, 40)], 0)[0][0]
+        self.assertTrue(tracker.needs_ocr(track))
+        tracker.request_ocr(track)
+        self.assertFalse(tracker.needs_ocr(track)) # Read still pending
+        track.add_read('ABC123', 0.4)
+        self.assertTrue(tracker.needs_ocr(track)) # Low confidence, read again
+        track.add_read('ABC123', 0.9)
+        self.assertFalse(tracker.needs_ocr(track))
+
+    def test_confidence_weighted_vote(self):
+        track = tracking.Track(1, (0, 0, 10, 10), 0)
+        track.add_read('ABC123', 0.5)
+        track.add_read('A8C123', 0.7)
+        track.add_read('ABC123', 0.4)
+        track.add_read(None, 0.0)
+        self.assertEqual(track.voted_plate(), 'ABC123')
+        self.assertEqual(track.attempts, 4)
+
+
+class TestReadTrackedPlates(unittest.TestCase):
+
+    @patch('src.alpr.YOLO')  # Mock yolo
+    @patch('src.alpr.easyocr.Reader')  # Mock EasyOCR
+    def test_one_plate_per_track(self, mock_easyocr_reader, mock_yolo):
+        """A car seen in five frames is read once and reported once, when its track ends."""
+        alpr_processor = src.alpr.ALPRProcessor(test_config)
+        tracker = tracking.PlateTracker(max_missed=1)
+        frames = [np.zeros((100, 200, 3), dtype=np.uint8) for _ in range(7)]
+        coords_per_frame = [[(50 + index, 60, 150 + index, 100)] for index in range(5)] + [[], []]
+        mock_easyocr_reader.return_value.recognize.return_value = [
+            ([[0, 0], [160, 0], [160, 64], [0, 64]], "ABC123", 0.9)
+        ]
+
+        plates_per_frame = alpr_processor.read_tracked_plates(frames, coords_per_frame, range(7), tracker)
+
+        mock_easyocr_reader.return_value.recognize.assert_called_once()
+        self.assertEqual(plates_per_frame[:6], [[]] * 6)
+        self.assertEqual([plate['plate_number'] for plate in plates_per_frame[6]], ['ABC123'])
+        self.assertEqual(tracker.stats['ocr_skipped'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import cv2
+import numpy as np
+import src.video as video
+
+START_TIME = 1722081600.0 # 2024-07-27 12:00:00 UTC
+
+
+class TestSampleFrames(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, 'test.avi')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for index in range(30): # Three seconds at 10 fps
+            writer.write(np.full((48, 64, 3), index * 8, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_every_frame_by_default(self):
+        self.assertEqual([index for index, _ in video.read_frames(self.video_path)], list(range(30)))
+
+    def test_analysis_fps_skips_frames(self):
+        samples = list(video.sample_frames(self.video_path, analysis_fps=2.5, start_time=START_TIME))
+        self.assertEqual([index for index, _, _ in samples], [0, 4, 8, 12, 16, 20, 24, 28])
+        for index, frame, detection_ts in samples:
+            self.assertAlmostEqual(int(frame[0, 0, 0]), index * 8, delta=4) # The frame really is frame index
+            self.assertAlmostEqual(detection_ts, START_TIME + index / 10.0, places=3) # From its position
+
+    def test_keyframe_seek_and_resume(self):
+        samples = list(video.sample_frames(self.video_path, start_frame=5, analysis_fps=1, seek_min_stride=5,
+                                           start_time=START_TIME))
+        self.assertEqual([index for index, _, _ in samples], [5, 15, 25])
+        self.assertAlmostEqual(samples[1][2], START_TIME + 1.5, places=3)
+        self.assertAlmostEqual(int(samples[1][1][0, 0, 0]), 15 * 8, delta=4)
+
+    def test_reduced_resolution(self):
+        _, frame, _ = next(video.sample_frames(self.video_path, max_width=32))
+        self.assertEqual(frame.shape, (24, 32, 3))
+
+    def test_file_timestamps_end_at_modification_time(self):
+        os.utime(self.video_path, (START_TIME + 3, START_TIME + 3)) # Recording ended three seconds in
+        samples = list(video.sample_frames(self.video_path, analysis_fps=1))
+        self.assertAlmostEqual(samples[0][2], START_TIME, places=3)
+
+
+    def test_image_sequence_starts_when_opened(self):
+        for index in range(3):
+            cv2.imwrite(os.path.join(self.temp_dir, f"img_{index:03d}.png"), np.zeros((48, 64, 3), dtype=np.uint8))
+        before = time.time()
+        samples = list(video.sample_frames(os.path.join(self.temp_dir, 'img_%03d.png')))
+        self.assertEqual(len(samples), 3)
+        self.assertGreaterEqual(samples[0][2], before - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import shutil
+import src.watchlist as watchlist
+
+
+class TestWatchlist(unittest.TestCase):
+    def setUp(self):
+        self.watchlist = watchlist.Watchlist(max_distance=1)
+        self.watchlist.add('ABC123', {'reason': 'Stolen'})
+        self.watchlist.add('XYZ789', {'reason': 'Expired registration'})
+
+    def test_normalize_plate(self):
+        self.assertEqual(watchlist.normalize_plate(' ab-c 123 '), 'A8C123')
+        self.assertEqual(watchlist.normalize_plate('OIBS'), watchlist.normalize_plate('0185'))
+
+    def test_exact_and_confusable_matches(self):
+        self.assertEqual(self.watchlist.match('ABC123')[0][1], 0)
+        entry, distance = self.watchlist.match('A8C1Z3')[0] # B/8 and Z/2 confusions
+        self.assertEqual((entry['plate_number'], entry['reason'], distance), ('ABC123', 'Stolen', 0))
+
+    def test_edit_distance_matches(self):
+        self.assertEqual(self.watchlist.match('ABC12')[0][1], 1) # Missing character
+        self.assertEqual(self.watchlist.match('ABX123')[0][1], 1) # Wrong character
+        self.assertEqual(self.watchlist.match('ABC1234')[0][1], 1) # Extra character
+        self.assertEqual(self.watchlist.match('AXC12'), []) # Two edits away
+        self.assertEqual(self.watchlist.match('QRS456'), [])
+
+    def test_check_raises_hit_events(self):
+        hits = []
+        self.watchlist.subscribe(hits.append)
+        plate_data = {'plate_number': 'XYZ78', 'detection_time': '2024-07-27 12:00:00'}
+        self.assertEqual(len(self.watchlist.check(plate_data)), 1)
+        self.watchlist.check({'plate_number': 'QRS456'})
+        self.assertEqual(len(hits), 1)
+        self.assertIs(hits[0].plate_data, plate_data)
+        self.assertEqual(hits[0].entry['reason'], 'Expired registration')
+        self.assertEqual((self.watchlist.checks, self.watchlist.hits), (2, 1))
+
+    def test_edit_distance(self):
+        self.assertEqual(watchlist.edit_distance('ABC', 'ABC', 2), 0)
+        self.assertEqual(watchlist.edit_distance('ABC', 'AXC', 2), 1)
+        self.assertEqual(watchlist.edit_distance('ABC', 'XYZ', 1), 2) # Stops past max_distance
+
+
+class TestWatchlistLoading(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_csv(self):
+        path = os.path.join(self.temp_dir, 'hotlist.csv')
+        with open(path, 'w') as csv_file:
+            csv_file.write("plate_number,reason\nABC123,Stolen\nDEF456,Wanted\n")
+        hotlist = watchlist.Watchlist().load_csv(path)
+        self.assertEqual(len(hotlist), 2)
+        self.assertEqual(hotlist.match('DEF456')[0][0]['reason'], 'Wanted')
+
+    def test_load_csv_skips_bad_rows(self):
+        path = os.path.join(self.temp_dir, 'hotlist.csv')
+        with open(path, 'w') as csv_file:
+            csv_file.write("plate,plate_number,key,reason\n"
+                           "ABC123,old,K1,Stolen\n"
+                           "DEF456,old,K2,Wanted,extra field\n"
+                           ",old,K3,No plate\n"
+                           "--,old,K4,Nothing to match\n")
+        hotlist = watchlist.Watchlist().load_csv(path, plate_column='plate')
+        self.assertEqual(len(hotlist), 2)
+        entry = hotlist.match('DEF456')[0][0]
+        self.assertEqual((entry['plate_number'], entry['key'], entry['reason']), ('DEF456', 'K2', 'Wanted'))
+        self.assertNotIn(None, entry)
+
+    def test_load_csv_without_the_plate_column(self):
+        path = os.path.join(self.temp_dir, 'hotlist.csv')
+        with open(path, 'w') as csv_file:
+            csv_file.write("registration,reason\nABC123,Stolen\n")
+        self.assertEqual(len(watchlist.Watchlist().load_csv(path)), 0)
+
+    def test_load_sqlite(self):
+        path = os.path.join(self.temp_dir, 'hotlist.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE watchlist (plate_number TEXT, reason TEXT)")
+        conn.execute("INSERT INTO watchlist VALUES ('ABC123', 'Stolen')")
+        conn.commit()
+        conn.close()
+        hotlist = watchlist.Watchlist().load_sqlite(path)
+        self.assertEqual(hotlist.match('ABC123')[0][0]['reason'], 'Stolen')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import configparser
+import numpy as np
+import src.tracking as tracking
+import src.workers as workers
+
+# Create a dummy config for testing.
+test_config = configparser.ConfigParser()
+test_config['Workers'] = {'SlotsPerProcess': '2'}
+
+
+class FakeProcessor:
+    """Stands in for ALPRProcessor in the worker processes, reads the frame's fill value as the plate."""
+    def __init__(self, config):
+        self.config = config
+
+    def warm_up(self):
+        pass
+
+    def process_batch(self, frames, db_conn=None, timestamps=None):
+        return [[{'plate_number': f"P{int(frame[0, 0, 0])}", 'shape': frame.shape, 'detection_ts': timestamp}]
+                for frame, timestamp in zip(frames, timestamps or [None] * len(frames))]
+
+
+class TestInferencePool(unittest.TestCase):
+
+    def test_results_in_frame_order(self):
+        frames = [np.full((48, 64, 3), index, dtype=np.uint8) for index in range(12)]
+        with workers.InferencePool(test_config, processes=2,
+                                   factory_path='tests.test_workers:FakeProcessor') as pool:
+            results = list(pool.imap(frames))
+
+        self.assertEqual([plates[0]['plate_number'] for plates in results],
+                         [f"P{index}" for index in range(12)])
+        self.assertEqual(results[0][0]['shape'], (48, 64, 3))
+
+    def test_detection_time_reaches_the_worker(self):
+        frames = [(np.full((48, 64, 3), index, dtype=np.uint8), 1000.0 + index) for index in range(3)]
+        with workers.InferencePool(test_config, processes=1,
+                                   factory_path='tests.test_workers:FakeProcessor') as pool:
+            results = list(pool.imap(frames))
+
+        self.assertEqual([plates[0]['detection_ts'] for plates in results], [1000.0, 1001.0, 1002.0])
+
+    def test_oversized_frame_is_sent_pickled(self):
+        with workers.InferencePool(test_config, processes=1,
+                                   factory_path='tests.test_workers:FakeProcessor') as pool:
+            pool.submit(np.full((10, 10, 3), 1, dtype=np.uint8)) # Sizes the shared memory slots
+            pool.submit(np.full((20, 20, 3), 2, dtype=np.uint8))
+            results = list(pool.results())
+
+        self.assertEqual([plates[0]['plate_number'] for plates in results], ['P1', 'P2'])
+        self.assertEqual(results[1][0]['shape'], (20, 20, 3))
+
+    def test_default_process_count(self):
+        self.assertGreaterEqual(workers.default_process_count(), 1)
+
+
+class TestTrackPlates(unittest.TestCase):
+
+    def test_one_plate_per_vehicle(self):
+        tracker, track_reads, stored = tracking.PlateTracker(max_missed=1), {}, []
+        reads = ['ABC123', 'A8C123', 'ABC123']
+        for frame_index, plate_number in enumerate(reads):
+            plates = [{'plate_number': plate_number, 'box': (frame_index, 0, 100 + frame_index, 40)}]
+            stored += workers.track_plates(tracker, track_reads, plates, frame_index)
+        self.assertEqual(stored, [])
+        stored += workers.track_plates(tracker, track_reads, [], 5) # The car has left
+        self.assertEqual([(plate['plate_number'], plate['track_id']) for plate in stored], [('ABC123', 1)])
+        self.assertEqual(track_reads, {})
+
+
+if __name__ == '__main__':
+    unittest.main()